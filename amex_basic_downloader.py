@@ -7,10 +7,11 @@ from playwright.sync_api import sync_playwright
 import time
 import os
 from dotenv import load_dotenv
-import datetime
 import sys
 import argparse
 
+from download_dialog import EXPORT_EXTENSIONS, download_from_dialog, export_filename
+
 def main(card_name=None):
     # Load environment variables
     env_path = os.path.join(os.path.dirname(__file__), 'config', '.env')
@@ -422,18 +423,7 @@ def main(card_name=None):
                     nonlocal download_started
                     print(f"\n*** Download started: {download.suggested_filename} ***")
                     # Create more informative filename with date and card name
-                    current_date = datetime.datetime.now().strftime("%Y%m%d")
-                    card_identifier = card_name.replace(' ', '_').replace('/', '_').replace('\\', '_') if card_name else "AmexCard"
-                    
-                    filename_parts = download.suggested_filename.split('.')
-                    if len(filename_parts) > 1:
-                        ext = filename_parts[-1]
-                        base_name = '.'.join(filename_parts[:-1])
-                        new_filename = f"{base_name}_{card_identifier}_{current_date}.{ext}"
-                    else:
-                        new_filename = f"{download.suggested_filename}_{card_identifier}_{current_date}"
-                    
-                    download_path = os.path.join(download_dir, new_filename)
+                    download_path = os.path.join(download_dir, export_filename(download.suggested_filename, card_name))
                     download.save_as(download_path)
                     print(f"Saved file to: {download_path}")
                     download_started = True
@@ -441,29 +431,32 @@ def main(card_name=None):
                 # Set up download handler
                 page.on("download", handle_download)
                 
-                # Wait for user to manually click the Download button in the dialog
-                print("\n==============================================================")
-                print("| MANUAL ACTION REQUIRED                                     |")
-                print("==============================================================")
-                print("| Please click the blue Download button in the dialog.        |")
-                print("|                                                            |")
-                print("| Type 'c' when done or wait 30 seconds for auto-continue    |")
-                print("==============================================================")
+                # Set the options and confirm by accessible role; handle_download saves the file.
+                # Only ask for a manual click when the dialog cannot be driven that way.
+                if download_from_dialog(page, 'csv') is None:
+                    # Wait for user to manually click the Download button in the dialog
+                    print("\n==============================================================")
+                    print("| MANUAL ACTION REQUIRED                                     |")
+                    print("==============================================================")
+                    print("| Please click the blue Download button in the dialog.        |")
+                    print("|                                                            |")
+                    print("| Type 'c' when done or wait 30 seconds for auto-continue    |")
+                    print("==============================================================")
                 
-                # Auto-continue after timeout
-                for i in range(30):  # Wait up to 30 seconds
-                    print(f"Continuing in {30-i} seconds... (type 'c' to continue now)")
-                    try:
-                        # Use non-blocking input with a timeout
-                        import select
-                        i, o, e = select.select([sys.stdin], [], [], 1)
-                        if i and sys.stdin.readline().strip().lower() == 'c':
-                            print("Continuing now...")
-                            break
-                    except:
-                        # If select is not supported, just sleep
-                        time.sleep(1)
-                print("Continuing script execution...")
+                    # Auto-continue after timeout
+                    for i in range(30):  # Wait up to 30 seconds
+                        print(f"Continuing in {30-i} seconds... (type 'c' to continue now)")
+                        try:
+                            # Use non-blocking input with a timeout
+                            import select
+                            i, o, e = select.select([sys.stdin], [], [], 1)
+                            if i and sys.stdin.readline().strip().lower() == 'c':
+                                print("Continuing now...")
+                                break
+                        except:
+                            # If select is not supported, just sleep
+                            time.sleep(1)
+                    print("Continuing script execution...")
                 
                 # Wait for download to complete
                 print("\nWaiting for download to complete...")
@@ -499,7 +492,7 @@ def main(card_name=None):
                         recent_files = []
                         for file in os.listdir(downloads_folder):
                             file_path = os.path.join(downloads_folder, file)
-                            if os.path.getmtime(file_path) > recent_time and (file.endswith('.xlsx') or file.endswith('.xls') or 'amex' in file.lower()):
+                            if os.path.getmtime(file_path) > recent_time and (file.lower().endswith(EXPORT_EXTENSIONS) or 'amex' in file.lower()):
                                 recent_files.append(file)
                         
                         if recent_files:
@@ -2,9 +2,10 @@ from playwright.sync_api import sync_playwright
 import time
 import os
 from dotenv import load_dotenv
-import datetime
 import sys
 
+from download_dialog import EXPORT_EXTENSIONS, DownloadDialog, download_from_dialog
+
 def main():
     # Load environment variables
     env_path = os.path.join(os.path.dirname(__file__), 'config', '.env')
@@ -164,17 +165,19 @@ def main():
                 print("\nClicking download button to open dialog...")
                 download_button = page.wait_for_selector("button:has-text('Download')")
                 download_button.click()
-                time.sleep(3)
                 
                 # Now handle the dialog that appears
                 print("\nHandling download dialog...")
                 
-                # Wait for dialog to appear and become stable
-                time.sleep(3)
+                # Wait for the dialog itself rather than a fixed delay
+                try:
+                    DownloadDialog(page).wait()
+                except Exception as e:
+                    print(f"Download dialog not detected by role: {e}")
                 
                 # Take screenshot for debugging
                 page.screenshot(path="dialog_before_click.png")
-                
+
                 # Define download handlers to capture downloads
                 download_started = False
                 
@@ -189,37 +192,55 @@ def main():
                 # Set up download handler
                 page.on("download", handle_download)
                 
-                # Try different selectors for the download button in the dialog
-                print("\nLooking for download button in dialog...")
-                dialog_download_clicked = False
+                # Set every option and confirm by accessible role; handle_download saves the file
+                dialog_download_clicked = download_from_dialog(page, 'csv') is not None
                 
-                # Selectors based on the screenshot and HTML inspection
-                dialog_download_selectors = [
-                    "a[href*='/api/servicing/v1/financials/documents']",
-                    "a[title='Download']",
-                    "[data-test-id='axp-activity-download-footer-download-confirm']",
-                    "span:has-text('Download')",
-                    ".css-zmpgl6",
-                    "a.btnStyle_lajeg_l",
-                    ".modal button:has-text('Download')",
-                    ".modal-footer button:has-text('Download')",
-                    "[role='dialog'] button:has-text('Download')",
-                    "[role='dialog'] a:has-text('Download')"
-                ]
-                
-                for selector in dialog_download_selectors:
+                if not dialog_download_clicked:
+                    # Prefer the CSV export: it stream-parses much faster than xlsx downstream
                     try:
-                        print(f"Trying selector: {selector}")
-                        button = page.wait_for_selector(selector, timeout=3000)
-                        if button:
-                            print(f"Found dialog download button with selector: {selector}")
-                            button.click()
-                            print("Clicked dialog download button")
-                            dialog_download_clicked = True
-                            time.sleep(5)  # Wait for download to start
-                            break
+                        csv_radio = page.query_selector("input[type='radio'][id*='csv' i], input[type='radio'][value*='csv' i]")
+                        if csv_radio:
+                            if not csv_radio.is_checked():
+                                csv_radio.click()
+                                print("Selected CSV format")
+                            else:
+                                print("CSV already selected")
+                        else:
+                            page.click("text='CSV'", timeout=3000)
+                            print("Clicked CSV option by text")
                     except Exception as e:
-                        print(f"Failed with selector {selector}: {e}")
+                        print(f"Could not select CSV format, keeping the default: {e}")
+                    
+                    # Try different selectors for the download button in the dialog
+                    print("\nLooking for download button in dialog...")
+                
+                    # Selectors based on the screenshot and HTML inspection
+                    dialog_download_selectors = [
+                        "a[href*='/api/servicing/v1/financials/documents']",
+                        "a[title='Download']",
+                        "[data-test-id='axp-activity-download-footer-download-confirm']",
+                        "span:has-text('Download')",
+                        ".css-zmpgl6",
+                        "a.btnStyle_lajeg_l",
+                        ".modal button:has-text('Download')",
+                        ".modal-footer button:has-text('Download')",
+                        "[role='dialog'] button:has-text('Download')",
+                        "[role='dialog'] a:has-text('Download')"
+                    ]
+                
+                    for selector in dialog_download_selectors:
+                        try:
+                            print(f"Trying selector: {selector}")
+                            button = page.wait_for_selector(selector, timeout=3000)
+                            if button:
+                                print(f"Found dialog download button with selector: {selector}")
+                                button.click()
+                                print("Clicked dialog download button")
+                                dialog_download_clicked = True
+                                time.sleep(5)  # Wait for download to start
+                                break
+                        except Exception as e:
+                            print(f"Failed with selector {selector}: {e}")
                 
                 # If no selector worked, try coordinates based on the screenshot
                 if not dialog_download_clicked:
@@ -258,7 +279,7 @@ def main():
                         recent_files = []
                         for file in os.listdir(downloads_folder):
                             file_path = os.path.join(downloads_folder, file)
-                            if os.path.getmtime(file_path) > recent_time and (file.endswith('.xlsx') or file.endswith('.xls') or 'amex' in file.lower()):
+                            if os.path.getmtime(file_path) > recent_time and (file.lower().endswith(EXPORT_EXTENSIONS) or 'amex' in file.lower()):
                                 recent_files.append(file)
                         
                         if recent_files:
@@ -6,7 +6,29 @@ import datetime
 import sys
 import argparse
 
-def main(card_name=None):
+from button_locator import ButtonLocator, capture_template, locate_on_page
+from download_dialog import EXPORT_EXTENSIONS, DownloadDialog, download_formats, export_filename, parse_formats
+from navigation_cache import NavigationCache, account_key_from_url, goto_cached
+from card_registry import CardRegistry, UnknownCardError, card_label, discover_cards, select_card
+from sync_window import fill_date_range, ingest_downloads, search_window
+
+# Last-resort position of the Download button when no template match is available
+FALLBACK_BUTTON_POSITION = (800, 564)
+
+def main(card_name=None, formats=None, refresh_cards=False, full=False):
+    # Reject unknown cards before spending a login on them
+    registry = CardRegistry()
+    card_id, card_entry = None, None
+    if card_name and registry.cards and not refresh_cards:
+        try:
+            card_id, card_entry = registry.resolve(card_name)
+        except UnknownCardError as e:
+            print(f"\nError: {e}")
+            print("Run with --refresh-cards if the card was added to the account recently.")
+            return
+        # Folder and file names follow the display name, not whatever was typed
+        card_name = card_label(card_id, card_entry)
+    
     # Load environment variables
     env_path = os.path.join(os.path.dirname(__file__), 'config', '.env')
     load_dotenv(env_path)
@@ -152,61 +174,65 @@ def main(card_name=None):
                     
                     # Select card based on parameter or default to Gold Card
                     card_to_select = card_name or "American Express Gold Card"
-                    print(f"\nSelecting card: {card_to_select}...")
-                    page.click("[role='combobox']")
-                    time.sleep(3)
-                    try:
-                        page.click(f"text='{card_to_select}'")
-                        print(f"Selected card: {card_to_select}")
-                    except Exception as e:
-                        print(f"Error selecting card '{card_to_select}': {e}")
-                        print("Attempting to find card in dropdown...")
-                        
-                        # Try clicking dropdown and then check available cards
-                        dropdown = page.query_selector("[role='combobox']")
-                        if dropdown:
-                            dropdown.click()
-                            time.sleep(2)
-                            # Get all available card options
-                            card_options = page.query_selector_all("[role='option']")
-                            print(f"Found {len(card_options)} card options")
-                            
-                            # Print available cards
-                            available_cards = []
-                            for option in card_options:
-                                card_text = option.inner_text()
-                                available_cards.append(card_text)
-                            
-                            if available_cards:
-                                print(f"Available cards: {available_cards}")
-                                # Try to find a partial match
-                                for option in card_options:
-                                    card_text = option.inner_text()
-                                    if card_name.lower() in card_text.lower():
-                                        print(f"Found partial match: {card_text}")
-                                        option.click()
-                                        print(f"Selected card: {card_text}")
-                                        break
-                            else:
-                                print("No card options found in dropdown")
-                                # Just select the first card
-                                if card_options:
-                                    first_card = card_options[0].inner_text()
-                                    card_options[0].click()
-                                    print(f"Selected first available card: {first_card}")
+                    if card_entry is None:
+                        # Read the dropdown once into the registry on the first run (or when asked)
+                        try:
+                            if refresh_cards or not registry.cards:
+                                discover_cards(page, registry)
+                            card_id, card_entry = registry.resolve(card_to_select)
+                        except UnknownCardError as e:
+                            print(f"\nError: {e}")
+                            return
+                        except Exception as e:
+                            print(f"Could not read the card dropdown: {e}")
+                    if card_entry:
+                        card_to_select = card_entry['name']
+                    # Two cards of one product share a display name; links and marks go by registry key
+                    cache_key = card_id or card_to_select
+                    
+                    # A cached card-scoped link selects the card and opens the search page in one goto
+                    nav_cache = NavigationCache()
+                    if not goto_cached(page, nav_cache, cache_key, 'search'):
+                        print(f"\nSelecting card: {card_to_select}...")
+                        if card_entry:
+                            card_confirmed = select_card(page, card_entry)
                         else:
-                            print("Could not find card dropdown")
-                    time.sleep(5)
+                            # The dropdown could not be read; try the name as shown
+                            page.click("[role='combobox']")
+                            time.sleep(3)
+                            try:
+                                page.click(f"text='{card_to_select}'")
+                                print(f"Selected card: {card_to_select}")
+                                card_confirmed = True
+                            except Exception as e:
+                                print(f"Error selecting card '{card_to_select}': {e}")
+                                card_confirmed = False
+                        if not card_confirmed:
+                            # Never carry on with some other card's statements
+                            print(f"\nError: could not select {card_to_select}; stopping")
+                            return
+                        time.sleep(5)
                     
-                    # Navigate to Statements & Activity
-                    print("\nNavigating to Statements & Activity...")
-                    page.click("span:has-text('Statements & Activity')")
-                    time.sleep(5)
+                        # Navigate to Statements & Activity
+                        print("\nNavigating to Statements & Activity...")
+                        page.click("span:has-text('Statements & Activity')")
+                        time.sleep(5)
+                        if card_confirmed:
+                            nav_cache.remember(cache_key, 'activity', page.url)
                     
-                    # Go to Custom Date Range
-                    print("\nNavigating to Custom Date Range...")
-                    page.click("a[href='/activity/search']")
-                    time.sleep(5)
+                        # Go to Custom Date Range
+                        print("\nNavigating to Custom Date Range...")
+                        page.click("a[href='/activity/search']")
+                        time.sleep(5)
+                        if card_confirmed and nav_cache.remember(cache_key, 'search', page.url) and card_id:
+                            registry.set_account_key(card_id, account_key_from_url(page.url))
+                    
+                    # Search only from the card's high-water mark, unless a full download was asked for
+                    window = None if full else search_window(cache_key, download_dir)
+                    if window:
+                        fill_date_range(page, *window)
+                    else:
+                        print("\nNo stored transactions for this card; searching the default range")
                     
                     # Click search button (3rd one)
                     print("\nClicking search button...")
@@ -272,115 +298,136 @@ def main(card_name=None):
                     # Now handle the dialog that appears
                     print("\nHandling download dialog...")
                     
-                    # Wait for dialog to appear and become stable
-                    time.sleep(3)
+                    # Wait for the dialog itself rather than a fixed delay
+                    try:
+                        DownloadDialog(page).wait()
+                    except Exception as e:
+                        print(f"Download dialog not detected by role: {e}")
                     
                     # Take screenshot for debugging
                     screenshots_dir = os.path.join(os.path.dirname(__file__), 'screenshots')
                     os.makedirs(screenshots_dir, exist_ok=True)
                     page.screenshot(path=os.path.join(screenshots_dir, "dialog_before_click.png"))
-                    
+
                     # Define download handlers to capture downloads
                     download_started = False
+                    saved_paths = []
                     
                     def handle_download(download):
                         nonlocal download_started
                         print(f"\n*** Download started: {download.suggested_filename} ***")
                         # Create more informative filename with date and card name
-                        current_date = datetime.datetime.now().strftime("%Y%m%d")
-                        card_identifier = card_name.replace(' ', '_').replace('/', '_').replace('\\', '_') if card_name else "AmexCard"
-                        
-                        filename_parts = download.suggested_filename.split('.')
-                        if len(filename_parts) > 1:
-                            ext = filename_parts[-1]
-                            base_name = '.'.join(filename_parts[:-1])
-                            new_filename = f"{base_name}_{card_identifier}_{current_date}.{ext}"
-                        else:
-                            new_filename = f"{download.suggested_filename}_{card_identifier}_{current_date}"
-                        
-                        download_path = os.path.join(download_dir, new_filename)
+                        download_path = os.path.join(download_dir, export_filename(download.suggested_filename, card_name))
                         download.save_as(download_path)
                         print(f"Saved file to: {download_path}")
+                        saved_paths.append(download_path)
                         download_started = True
                     
                     # Set up download handler
                     page.on("download", handle_download)
                     
-                    # Try different selectors for the download button in the dialog
-                    print("\nLooking for download button in dialog...")
-                    dialog_download_clicked = False
+                    # Set every option and confirm by accessible role, one format after
+                    # another in the same dialog; handle_download saves each file
+                    formats = formats or ['csv']
+                    fetched = download_formats(page, formats)
+                    dialog_download_clicked = bool(fetched)
+                    if dialog_download_clicked and len(fetched) < len(formats):
+                        print(f"Could not fetch: {', '.join(f for f in formats if f not in fetched)}")
                     
-                    # Take a screenshot of the dialog
-                    dialog_screenshot = os.path.join(screenshots_dir, "download_dialog.png")
-                    page.screenshot(path=dialog_screenshot)
-                    print(f"Took screenshot of dialog: {dialog_screenshot}")
+                    if not dialog_download_clicked:
+                        if len(formats) > 1:
+                            print(f"Falling back to a single {formats[0].upper()} download")
+                        # First requested format; CSV by default as it stream-parses much faster than xlsx downstream
+                        file_format = formats[0]
+                        format_label = {'excel': 'Excel'}.get(file_format, file_format.upper())
+                        try:
+                            format_radio = page.query_selector(f"input[type='radio'][id*='{file_format}' i], input[type='radio'][value*='{file_format}' i]")
+                            if format_radio:
+                                if not format_radio.is_checked():
+                                    format_radio.click()
+                                    print(f"Selected {format_label} format")
+                                else:
+                                    print(f"{format_label} already selected")
+                            else:
+                                page.click(f"text='{format_label}'", timeout=3000)
+                                print(f"Clicked {format_label} option by text")
+                        except Exception as e:
+                            print(f"Could not select {format_label} format, keeping the default: {e}")
+                        
+                        # Try different selectors for the download button in the dialog
+                        print("\nLooking for download button in dialog...")
+                    
+                        # Take a screenshot of the dialog
+                        dialog_screenshot = os.path.join(screenshots_dir, "download_dialog.png")
+                        page.screenshot(path=dialog_screenshot)
+                        print(f"Took screenshot of dialog: {dialog_screenshot}")
                     
-                    # Expand selectors with more options
-                    dialog_download_selectors = [
-                        # API links
-                        "a[href*='/api/servicing/v1/financials/documents']",
-                        "a[href*='download']",
-                        "a[href*='statements']",
-                        "a[href*='activity']",
+                        # Expand selectors with more options
+                        dialog_download_selectors = [
+                            # API links
+                            "a[href*='/api/servicing/v1/financials/documents']",
+                            "a[href*='download']",
+                            "a[href*='statements']",
+                            "a[href*='activity']",
                         
-                        # By attributes
-                        "a[title='Download']",
-                        "button[title='Download']",
-                        "[data-test-id='axp-activity-download-footer-download-confirm']",
-                        "[data-test-id*='download']",
-                        "[data-testid*='download']",
+                            # By attributes
+                            "a[title='Download']",
+                            "button[title='Download']",
+                            "[data-test-id='axp-activity-download-footer-download-confirm']",
+                            "[data-test-id*='download']",
+                            "[data-testid*='download']",
                         
-                        # By text content
-                        "span:has-text('Download')",
-                        "div:has-text('Download')",
-                        "button:has-text('Download')",
-                        "a:has-text('Download')",
+                            # By text content
+                            "span:has-text('Download')",
+                            "div:has-text('Download')",
+                            "button:has-text('Download')",
+                            "a:has-text('Download')",
                         
-                        # By CSS classes
-                        ".css-zmpgl6",
-                        "a.btnStyle_lajeg_l",
-                        "[class*='download']",
-                        "[class*='btn']",
+                            # By CSS classes
+                            ".css-zmpgl6",
+                            "a.btnStyle_lajeg_l",
+                            "[class*='download']",
+                            "[class*='btn']",
                         
-                        # By container
-                        ".modal button:has-text('Download')",
-                        ".modal-footer button:has-text('Download')",
-                        "[role='dialog'] button:has-text('Download')",
-                        "[role='dialog'] a:has-text('Download')",
-                        "[role='dialog'] span:has-text('Download')",
-                        "[role='dialog'] .download",
+                            # By container
+                            ".modal button:has-text('Download')",
+                            ".modal-footer button:has-text('Download')",
+                            "[role='dialog'] button:has-text('Download')",
+                            "[role='dialog'] a:has-text('Download')",
+                            "[role='dialog'] span:has-text('Download')",
+                            "[role='dialog'] .download",
                         
-                        # Generic buttons that might be the download button
-                        "[role='dialog'] button",
-                        ".modal-footer button",
-                        ".modal button"
-                    ]
+                            # Generic buttons that might be the download button
+                            "[role='dialog'] button",
+                            ".modal-footer button",
+                            ".modal button"
+                        ]
                     
-                    # Try all selectors
-                    for selector in dialog_download_selectors:
-                        try:
-                            print(f"Trying selector: {selector}")
-                            elements = page.query_selector_all(selector)
-                            print(f"Found {len(elements)} elements matching {selector}")
+                        # Try all selectors
+                        for selector in dialog_download_selectors:
+                            try:
+                                print(f"Trying selector: {selector}")
+                                elements = page.query_selector_all(selector)
+                                print(f"Found {len(elements)} elements matching {selector}")
                             
-                            # Try each element found
-                            for i, element in enumerate(elements):
-                                try:
-                                    # Check if it's visible
-                                    if element.is_visible():
-                                        print(f"Element {i} is visible. Attempting to click...")
-                                        element.click()
-                                        print(f"Clicked element {i} with selector: {selector}")
-                                        dialog_download_clicked = True
-                                        time.sleep(5)  # Wait for download to start
-                                        break
-                                except Exception as e:
-                                    print(f"Failed to click element {i}: {e}")
+                                # Try each element found
+                                for i, element in enumerate(elements):
+                                    try:
+                                        # Check if it's visible
+                                        if element.is_visible():
+                                            print(f"Element {i} is visible. Attempting to click...")
+                                            element.click()
+                                            print(f"Clicked element {i} with selector: {selector}")
+                                            dialog_download_clicked = True
+                                            time.sleep(5)  # Wait for download to start
+                                            break
+                                    except Exception as e:
+                                        print(f"Failed to click element {i}: {e}")
                             
-                            if dialog_download_clicked:
-                                break
-                        except Exception as e:
-                            print(f"Failed with selector {selector}: {e}")
+                                if dialog_download_clicked:
+                                    break
+                            except Exception as e:
+                                print(f"Failed with selector {selector}: {e}")
                     
                     # If no selector worked, try specific approaches for the download dialog button
                     if not dialog_download_clicked:
@@ -389,6 +436,8 @@ def main(card_name=None):
                         # Take another screenshot to help with debugging
                         page.screenshot(path=os.path.join(screenshots_dir, "before_special_approaches.png"))
                         
+                        button_locator = ButtonLocator()
+                        
                         # Try method 1: Looking specifically for the blue button in the dialog
                         # Based on the screenshot, this is most likely to work
                         try:
@@ -400,9 +449,14 @@ def main(card_name=None):
                             # Try the right-most button which is typically the confirmation button
                             if len(modal_buttons) >= 2:
                                 print("Clicking the right-most button (likely the Download button)")
+                                # Remember what the button looks like, but only keep it if it starts a download
+                                button_image = modal_buttons[-1].screenshot() if button_locator.template is None else None
                                 modal_buttons[-1].click()
                                 print("Clicked the right-most button in the dialog")
-                                time.sleep(5)  # Wait to see if download starts
+                                # Playwright only delivers the download event while it is waiting
+                                page.wait_for_timeout(5000)
+                                if download_started and button_image:
+                                    capture_template(button_image, button_locator)
                             elif len(modal_buttons) == 1:
                                 print("Only one button found, clicking it")
                                 modal_buttons[0].click()
@@ -410,16 +464,23 @@ def main(card_name=None):
                         except Exception as e:
                             print(f"Failed to click modal button: {e}")
                         
-                        # Try method 2: Direct coordinates for the blue Download button
-                        # Based on the exact coordinates from screenshot
+                        # Try method 2: Locate the blue Download button by template matching
+                        # (cached per resolution, so repeat runs only verify one patch)
+                        button_position = None
                         if not download_started:
                             try:
-                                print("Trying exact coordinates for blue Download button...")
-                                # These coordinates are for the blue Download button in the bottom right of the dialog
-                                # Based on the screenshot you provided
-                                page.mouse.click(800, 564)  # Adjusted based on the screenshot
-                                print("Clicked at coordinates for blue Download button")
-                                time.sleep(5)  # Wait to see if download starts
+                                print("Locating the blue Download button by template matching...")
+                                button_position = locate_on_page(page, button_locator)
+                                if button_position:
+                                    page.mouse.click(*button_position)
+                                    print(f"Clicked Download button found at ({button_position[0]:.0f}, {button_position[1]:.0f})")
+                                    page.wait_for_timeout(5000)  # Wait to see if download starts
+                                    if not download_started:
+                                        print("The matched spot did not start a download; dropping the template")
+                                        button_locator.discard_template()
+                                        button_position = None
+                                else:
+                                    print("No template match for the Download button")
                             except Exception as e:
                                 print(f"Failed to click at Download button coordinates: {e}")
                         
@@ -450,7 +511,7 @@ def main(card_name=None):
                         if not download_started:
                             print("Trying a grid around the Download button area...")
                             # Create a grid of coordinates centered on the Download button
-                            center_x, center_y = 800, 564  # From the screenshot
+                            center_x, center_y = button_position or FALLBACK_BUTTON_POSITION
                             for x_offset in [-20, 0, 20]:
                                 for y_offset in [-10, 0, 10]:
                                     try:
@@ -484,8 +545,15 @@ def main(card_name=None):
                         print("\nDownload completed successfully!")
                         print(f"Summary:")
                         print(f"- Card: {card_name or 'American Express Gold Card'}")
+                        print(f"- Formats: {', '.join(fetched or formats[:1])}")
                         print(f"- Download location: {download_dir}")
                         
+                        # Store the new rows so the next run starts from the latest date
+                        try:
+                            ingest_downloads(saved_paths, mark_key=cache_key)
+                        except Exception as e:
+                            print(f"Could not ingest the download: {e}")
+                        
                         # Write a summary to a log file
                         log_dir = os.path.join(os.path.dirname(__file__), 'logs')
                         os.makedirs(log_dir, exist_ok=True)
@@ -539,7 +607,7 @@ def main(card_name=None):
                             recent_files = []
                             for file in os.listdir(downloads_folder):
                                 file_path = os.path.join(downloads_folder, file)
-                                if os.path.getmtime(file_path) > recent_time and (file.endswith('.xlsx') or file.endswith('.xls') or 'amex' in file.lower()):
+                                if os.path.getmtime(file_path) > recent_time and (file.lower().endswith(EXPORT_EXTENSIONS) or 'amex' in file.lower()):
                                     recent_files.append(file)
                             
                             if recent_files:
@@ -577,6 +645,13 @@ def main(card_name=None):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Download American Express statements')
     parser.add_argument('--card', type=str, help='Card name to select (e.g., "American Express Gold Card", "Platinum Card")')
+    parser.add_argument('--formats', type=parse_formats, default=['csv'],
+                        help='Comma-separated export formats fetched from one dialog session: '
+                             'csv, excel, qfx, qbo, pdf (default: csv)')
+    parser.add_argument('--refresh-cards', action='store_true',
+                        help='Re-read the cards in the account dropdown into card_registry.json')
+    parser.add_argument('--full', action='store_true',
+                        help="Search the site's default range instead of starting from the last stored transaction")
     args = parser.parse_args()
     
-    main(card_name=args.card)
\ No newline at end of file
+    main(card_name=args.card, formats=args.formats, refresh_cards=args.refresh_cards, full=args.full)
\ No newline at end of file
@@ -11,7 +11,13 @@ from dotenv import load_dotenv
 import datetime
 import argparse
 
-def main():
+from download_dialog import EXPORT_EXTENSIONS, DownloadDialog, download_from_dialog, export_filename
+from navigation_cache import NavigationCache, goto_cached
+from sync_window import fill_date_range, ingest_downloads, search_window
+
+PLATINUM_CARD = "Platinum Card"
+
+def main(full=False):
     # Load environment variables
     env_path = os.path.join(os.path.dirname(__file__), 'config', '.env')
     load_dotenv(env_path)
@@ -155,220 +161,225 @@ def main():
                     with open(icloud_path, 'w') as f:
                         pass
                     
-                    # Select Platinum Card
-                    print("\nSelecting Platinum Card...")
+                    # A cached card-scoped link selects the card and opens the search page in one
+                    # goto, skipping the menus and the "Page Not Found" recovery below
+                    nav_cache = NavigationCache()
+                    if not goto_cached(page, nav_cache, PLATINUM_CARD, 'search'):
+                        # Only links reached with the Platinum Card selected are cached
+                        card_confirmed = False
+                        
+                        # Select Platinum Card
+                        print("\nSelecting Platinum Card...")
                     
-                    # Check if we're already on the dashboard
-                    try:
-                        current_card = page.query_selector(".card-name")
-                        if current_card:
-                            card_text = current_card.inner_text()
-                            print(f"Current card displayed: {card_text}")
+                        # Check if we're already on the dashboard
+                        try:
+                            current_card = page.query_selector(".card-name")
+                            if current_card:
+                                card_text = current_card.inner_text()
+                                print(f"Current card displayed: {card_text}")
                             
-                            if "platinum" in card_text.lower():
-                                print("Already on Platinum Card - no need to select it")
-                                card_selected = True
+                                if "platinum" in card_text.lower():
+                                    print("Already on Platinum Card - no need to select it")
+                                    card_selected = True
+                                    card_confirmed = True
+                                else:
+                                    print("Different card selected, need to change to Platinum Card")
+                                    # Click the dropdown to change cards
+                                    page.click("[role='combobox']")
+                                    time.sleep(3)
                             else:
-                                print("Different card selected, need to change to Platinum Card")
-                                # Click the dropdown to change cards
+                                # No card displayed yet, click the dropdown
                                 page.click("[role='combobox']")
                                 time.sleep(3)
-                        else:
-                            # No card displayed yet, click the dropdown
-                            page.click("[role='combobox']")
-                            time.sleep(3)
-                    except Exception as e:
-                        print(f"Error checking current card: {e}")
-                        # Try to click the dropdown anyway
-                        try:
-                            page.click("[role='combobox']")
-                            time.sleep(3)
-                        except:
-                            print("Could not click card dropdown")
-                    
-                    # Try different selectors for Platinum Card
-                    platinum_selectors = [
-                        "text='Platinum Card'", 
-                        "text='The Platinum Card'",
-                        "text='Platinum Card®'",
-                        "text='American Express Platinum Card'",
-                        "text=Platinum",
-                        "[alt='Platinum Card']",
-                        "[alt*='Platinum']"
-                    ]
-                    
-                    card_selected = False
-                    for selector in platinum_selectors:
-                        try:
-                            print(f"Trying to select card with: {selector}")
-                            card = page.wait_for_selector(selector, timeout=3000)
-                            if card:
-                                card.click()
-                                print(f"Selected card with: {selector}")
-                                card_selected = True
-                                break
                         except Exception as e:
-                            print(f"Failed to select with {selector}: {e}")
+                            print(f"Error checking current card: {e}")
+                            # Try to click the dropdown anyway
+                            try:
+                                page.click("[role='combobox']")
+                                time.sleep(3)
+                            except:
+                                print("Could not click card dropdown")
+                    
+                        # Try different selectors for Platinum Card
+                        platinum_selectors = [
+                            "text='Platinum Card'", 
+                            "text='The Platinum Card'",
+                            "text='Platinum Card®'",
+                            "text='American Express Platinum Card'",
+                            "text=Platinum",
+                            "[alt='Platinum Card']",
+                            "[alt*='Platinum']"
+                        ]
                     
-                    if not card_selected:
-                        print("Could not find Platinum Card by text. Trying to list and select available cards...")
-                        # Take a screenshot of available cards
-                        page.screenshot(path=os.path.join(screenshots_dir, "available_cards.png"))
+                        card_selected = False
+                        for selector in platinum_selectors:
+                            try:
+                                print(f"Trying to select card with: {selector}")
+                                card = page.wait_for_selector(selector, timeout=3000)
+                                if card:
+                                    card.click()
+                                    print(f"Selected card with: {selector}")
+                                    card_selected = True
+                                    card_confirmed = True
+                                    break
+                            except Exception as e:
+                                print(f"Failed to select with {selector}: {e}")
+                    
+                        if not card_selected:
+                            print("Could not find Platinum Card by text. Trying to list and select available cards...")
+                            # Take a screenshot of available cards
+                            page.screenshot(path=os.path.join(screenshots_dir, "available_cards.png"))
                         
-                        # Try to get all available options
-                        try:
-                            options = page.query_selector_all("[role='option']")
-                            print(f"Found {len(options)} card options")
+                            # Try to get all available options
+                            try:
+                                options = page.query_selector_all("[role='option']")
+                                print(f"Found {len(options)} card options")
                             
-                            for i, option in enumerate(options):
-                                try:
-                                    text = option.inner_text()
-                                    print(f"Card option {i}: {text}")
-                                    if "platinum" in text.lower():
-                                        print(f"Found Platinum Card at index {i}")
-                                        option.click()
-                                        card_selected = True
-                                        break
-                                except Exception as e:
-                                    print(f"Error reading option {i}: {e}")
+                                for i, option in enumerate(options):
+                                    try:
+                                        text = option.inner_text()
+                                        print(f"Card option {i}: {text}")
+                                        if "platinum" in text.lower():
+                                            print(f"Found Platinum Card at index {i}")
+                                            option.click()
+                                            card_selected = True
+                                            card_confirmed = True
+                                            break
+                                    except Exception as e:
+                                        print(f"Error reading option {i}: {e}")
                             
-                            # If no Platinum Card, just click the first card
-                            if not card_selected and len(options) > 0:
-                                print("Platinum Card not found. Clicking first available card.")
-                                options[0].click()
-                                card_selected = True
+                                # If no Platinum Card, just click the first card
+                                if not card_selected and len(options) > 0:
+                                    print("Platinum Card not found. Clicking first available card.")
+                                    options[0].click()
+                                    card_selected = True
+                            except Exception as e:
+                                print(f"Error getting card options: {e}")
+                    
+                        time.sleep(5)
+                    
+                        # Navigate to Statements & Activity
+                        print("\nNavigating to Statements & Activity...")
+                        try:
+                            # Look for Statements & Activity in the main navigation
+                            statements_link = page.wait_for_selector("span:has-text('Statements & Activity'), a:has-text('Statements & Activity')", timeout=5000)
+                            if statements_link:
+                                statements_link.click()
+                                print("Clicked Statements & Activity link")
+                                time.sleep(5)
+                                if card_confirmed:
+                                    nav_cache.remember(PLATINUM_CARD, 'activity', page.url)
+                            else:
+                                print("Could not find Statements & Activity link")
                         except Exception as e:
-                            print(f"Error getting card options: {e}")
-                    
-                    time.sleep(5)
-                    
-                    # Navigate to Statements & Activity
-                    print("\nNavigating to Statements & Activity...")
-                    try:
-                        # Look for Statements & Activity in the main navigation
-                        statements_link = page.wait_for_selector("span:has-text('Statements & Activity'), a:has-text('Statements & Activity')", timeout=5000)
-                        if statements_link:
-                            statements_link.click()
-                            print("Clicked Statements & Activity link")
-                            time.sleep(5)
-                        else:
-                            print("Could not find Statements & Activity link")
-                    except Exception as e:
-                        print(f"Error finding Statements & Activity link: {e}")
-                        # Check if we're already on the statements page
-                        if "statement" in page.url.lower() or "activity" in page.url.lower():
-                            print("Already on Statements & Activity page")
-                        else:
-                            print("Attempting to navigate directly to activity search")
-                            page.goto("https://www.americanexpress.com/en-us/account/activity/search", wait_until='networkidle', timeout=30000)
+                            print(f"Error finding Statements & Activity link: {e}")
+                            # Check if we're already on the statements page
+                            if "statement" in page.url.lower() or "activity" in page.url.lower():
+                                print("Already on Statements & Activity page")
+                            else:
+                                print("Attempting to navigate directly to activity search")
+                                page.goto("https://www.americanexpress.com/en-us/account/activity/search", wait_until='networkidle', timeout=30000)
                     
-                    time.sleep(5)
+                        time.sleep(5)
                     
-                    # Take screenshot of the current page
-                    page.screenshot(path=os.path.join(screenshots_dir, "before_search_page.png"))
+                        # Take screenshot of the current page
+                        page.screenshot(path=os.path.join(screenshots_dir, "before_search_page.png"))
                     
-                    # Go to Custom Date Range
-                    print("\nNavigating to Custom Date Range...")
-                    try:
-                        # Try direct navigation first if we're not already on the search page
-                        if "/activity/search" not in page.url:
-                            search_link = page.wait_for_selector("a[href='/activity/search']", timeout=5000)
-                            if search_link:
-                                search_link.click()
-                                print("Clicked Custom Date Range link")
-                                time.sleep(5)
-                            else:
-                                print("Custom Date Range link not found, trying direct navigation")
-                                page.goto("https://www.americanexpress.com/en-us/account/activity/search", wait_until='networkidle', timeout=30000)
-                        else:
-                            print("Already on Custom Date Range page")
-                    except Exception as e:
-                        print(f"Error navigating to Custom Date Range: {e}")
-                        # Try direct navigation
+                        # Go to Custom Date Range
+                        print("\nNavigating to Custom Date Range...")
                         try:
-                            page.goto("https://www.americanexpress.com/en-us/account/activity/search", wait_until='networkidle', timeout=30000)
+                            # Try direct navigation first if we're not already on the search page
+                            if "/activity/search" not in page.url:
+                                search_link = page.wait_for_selector("a[href='/activity/search']", timeout=5000)
+                                if search_link:
+                                    search_link.click()
+                                    print("Clicked Custom Date Range link")
+                                    time.sleep(5)
+                                else:
+                                    print("Custom Date Range link not found, trying direct navigation")
+                                    page.goto("https://www.americanexpress.com/en-us/account/activity/search", wait_until='networkidle', timeout=30000)
+                            else:
+                                print("Already on Custom Date Range page")
                         except Exception as e:
-                            print(f"Direct navigation to search page failed: {e}")
+                            print(f"Error navigating to Custom Date Range: {e}")
+                            # Try direct navigation
+                            try:
+                                page.goto("https://www.americanexpress.com/en-us/account/activity/search", wait_until='networkidle', timeout=30000)
+                            except Exception as e:
+                                print(f"Direct navigation to search page failed: {e}")
                     
-                    time.sleep(5)
+                        time.sleep(5)
                     
-                    # Take screenshot of the search page
-                    page.screenshot(path=os.path.join(screenshots_dir, "search_page.png"))
+                        # Take screenshot of the search page
+                        page.screenshot(path=os.path.join(screenshots_dir, "search_page.png"))
                     
-                    # Check if we got a "Page Not Found" error
-                    if page.query_selector("text='Page Not Found'"):
-                        print("Page Not Found error encountered. Trying alternative approach...")
+                        # Check if we got a "Page Not Found" error
+                        page_not_found = page.query_selector("text='Page Not Found'")
+                        if card_confirmed and not page_not_found and "/activity/search" in page.url:
+                            nav_cache.remember(PLATINUM_CARD, 'search', page.url)
+                        if page_not_found:
+                            print("Page Not Found error encountered. Trying alternative approach...")
                         
-                        # Go back to the main account page
-                        try:
-                            page.click("text='Go back to the previous page'")
-                            time.sleep(3)
-                        except:
+                            # Go back to the main account page
                             try:
-                                page.click("text='Go to American Express Homepage'")
+                                page.click("text='Go back to the previous page'")
                                 time.sleep(3)
-                                
-                                # If we went to homepage, we need to log back in
+                            except:
                                 try:
-                                    page.click("text='Log In'")
+                                    page.click("text='Go to American Express Homepage'")
                                     time.sleep(3)
-                                    page.fill("#eliloUserID", amex_username)
-                                    page.fill("#eliloPassword", amex_password)
-                                    page.click("#loginSubmit")
-                                    time.sleep(10)
-                                except Exception as e:
-                                    print(f"Error logging back in: {e}")
-                            except:
-                                # As a last resort, go directly to the account home
-                                page.goto("https://www.americanexpress.com/en-us/account/home", wait_until='networkidle', timeout=30000)
-                                time.sleep(5)
+                                
+                                    # If we went to homepage, we need to log back in
+                                    try:
+                                        page.click("text='Log In'")
+                                        time.sleep(3)
+                                        page.fill("#eliloUserID", amex_username)
+                                        page.fill("#eliloPassword", amex_password)
+                                        page.click("#loginSubmit")
+                                        time.sleep(10)
+                                    except Exception as e:
+                                        print(f"Error logging back in: {e}")
+                                except:
+                                    # As a last resort, go directly to the account home
+                                    page.goto("https://www.americanexpress.com/en-us/account/home", wait_until='networkidle', timeout=30000)
+                                    time.sleep(5)
                         
-                        # Now try to go to statements page using a different approach
-                        try:
-                            print("Trying to go to Statements directly...")
-                            page.goto("https://www.americanexpress.com/en-us/account/statements", wait_until='networkidle', timeout=30000)
-                            time.sleep(5)
+                            # Now try to go to statements page using a different approach
+                            try:
+                                print("Trying to go to Statements directly...")
+                                page.goto("https://www.americanexpress.com/en-us/account/statements", wait_until='networkidle', timeout=30000)
+                                time.sleep(5)
                             
-                            # Take screenshot of where we landed
-                            page.screenshot(path=os.path.join(screenshots_dir, "statements_direct_navigation.png"))
+                                # Take screenshot of where we landed
+                                page.screenshot(path=os.path.join(screenshots_dir, "statements_direct_navigation.png"))
                             
-                            # Look for a way to download transactions
-                            download_links = page.query_selector_all("a:has-text('Download'), button:has-text('Download')")
-                            if download_links and len(download_links) > 0:
-                                print(f"Found {len(download_links)} download links")
-                                download_links[0].click()
-                                print("Clicked first download link")
-                                time.sleep(5)
-                            else:
-                                print("No download links found on statements page")
-                                # Try the main activity page instead
-                                page.goto("https://www.americanexpress.com/en-us/account/activity", wait_until='networkidle', timeout=30000)
-                                time.sleep(5)
+                                # Look for a way to download transactions
+                                download_links = page.query_selector_all("a:has-text('Download'), button:has-text('Download')")
+                                if download_links and len(download_links) > 0:
+                                    print(f"Found {len(download_links)} download links")
+                                    download_links[0].click()
+                                    print("Clicked first download link")
+                                    time.sleep(5)
+                                else:
+                                    print("No download links found on statements page")
+                                    # Try the main activity page instead
+                                    page.goto("https://www.americanexpress.com/en-us/account/activity", wait_until='networkidle', timeout=30000)
+                                    time.sleep(5)
                                 
-                                # Take screenshot of activity page
-                                page.screenshot(path=os.path.join(screenshots_dir, "activity_page.png"))
-                        except Exception as e:
-                            print(f"Error with alternative navigation: {e}")
+                                    # Take screenshot of activity page
+                                    page.screenshot(path=os.path.join(screenshots_dir, "activity_page.png"))
+                            except Exception as e:
+                                print(f"Error with alternative navigation: {e}")
                     
                     # Click search button
                     print("\nClicking search button...")
                     try:
-                        # First, check if there's a date range picker and set it if needed
-                        try:
-                            start_date = page.query_selector("input[placeholder='MM/DD/YYYY'], input[aria-label*='Start Date']")
-                            end_date = page.query_selector("input[placeholder='MM/DD/YYYY']:nth-of-type(2), input[aria-label*='End Date']")
-                            
-                            if start_date and end_date:
-                                print("Found date inputs, setting date range")
-                                # Set to last 30 days
-                                today = datetime.datetime.now()
-                                thirty_days_ago = today - datetime.timedelta(days=30)
-                                
-                                start_date.fill(thirty_days_ago.strftime("%m/%d/%Y"))
-                                end_date.fill(today.strftime("%m/%d/%Y"))
-                                print("Date range set")
-                        except Exception as e:
-                            print(f"Error setting date range: {e}")
+                        # Start from the card's high-water mark; the last 30 days when nothing is stored yet
+                        window = None if full else search_window(PLATINUM_CARD, download_dir)
+                        if not window:
+                            today = datetime.date.today()
+                            window = (today - datetime.timedelta(days=30), today)
+                        fill_date_range(page, *window)
                         
                         # Now click search button
                         search_buttons = page.query_selector_all("button:has-text('Search'), [role='button']:has-text('Search')")
@@ -442,25 +453,16 @@ def main():
                     
                     # Define download handlers to capture downloads
                     download_started = False
+                    saved_paths = []
                     
                     def handle_download(download):
                         nonlocal download_started
                         print(f"\n*** Download started: {download.suggested_filename} ***")
                         # Create more informative filename with date and card name
-                        current_date = datetime.datetime.now().strftime("%Y%m%d")
-                        card_identifier = "Platinum_Card"
-                        
-                        filename_parts = download.suggested_filename.split('.')
-                        if len(filename_parts) > 1:
-                            ext = filename_parts[-1]
-                            base_name = '.'.join(filename_parts[:-1])
-                            new_filename = f"{base_name}_{card_identifier}_{current_date}.{ext}"
-                        else:
-                            new_filename = f"{download.suggested_filename}_{card_identifier}_{current_date}"
-                        
-                        download_path = os.path.join(download_dir, new_filename)
+                        download_path = os.path.join(download_dir, export_filename(download.suggested_filename, PLATINUM_CARD))
                         download.save_as(download_path)
                         print(f"Saved file to: {download_path}")
+                        saved_paths.append(download_path)
                         download_started = True
                     
                     # Set up download handler
@@ -469,85 +471,90 @@ def main():
                     # Now handle the dialog for file type selection
                     print("\nHandling download dialog...")
                     
-                    # Wait for dialog to appear
-                    time.sleep(3)
+                    # Wait for the dialog itself rather than a fixed delay
+                    try:
+                        DownloadDialog(page).wait()
+                    except Exception as e:
+                        print(f"Download dialog not detected by role: {e}")
                     
                     # Take screenshot of dialog for debugging
                     page.screenshot(path=os.path.join(screenshots_dir, "download_dialog.png"))
                     
-                    # PLATINUM CARD SPECIFIC: Select Excel format if needed
-                    try:
-                        print("Checking if Excel option is already selected...")
-                        excel_radio = page.query_selector("input[type='radio'][id*='excel']")
-                        if excel_radio:
-                            print("Found Excel radio button, checking if selected")
-                            if not excel_radio.is_checked():
-                                print("Excel not selected, clicking it")
-                                excel_radio.click()
-                                print("Clicked Excel radio button")
-                            else:
-                                print("Excel already selected")
-                    except Exception as e:
-                        print(f"Error with Excel selection: {e}")
-                        # Try clicking the Excel option by text
+                    # Select Excel and confirm by accessible role; handle_download saves the file
+                    if download_from_dialog(page, 'excel') is None:
+                        # PLATINUM CARD SPECIFIC: Select Excel format if needed
                         try:
-                            page.click("text='Excel'")
-                            print("Clicked Excel option by text")
+                            print("Checking if Excel option is already selected...")
+                            excel_radio = page.query_selector("input[type='radio'][id*='excel']")
+                            if excel_radio:
+                                print("Found Excel radio button, checking if selected")
+                                if not excel_radio.is_checked():
+                                    print("Excel not selected, clicking it")
+                                    excel_radio.click()
+                                    print("Clicked Excel radio button")
+                                else:
+                                    print("Excel already selected")
                         except Exception as e:
-                            print(f"Failed to click Excel by text: {e}")
+                            print(f"Error with Excel selection: {e}")
+                            # Try clicking the Excel option by text
+                            try:
+                                page.click("text='Excel'")
+                                print("Clicked Excel option by text")
+                            except Exception as e:
+                                print(f"Failed to click Excel by text: {e}")
                     
-                    time.sleep(2)
+                        time.sleep(2)
                     
-                    # PLATINUM CARD SPECIFIC: Click the blue Download button
-                    print("\nClicking the blue Download button...")
+                        # PLATINUM CARD SPECIFIC: Click the blue Download button
+                        print("\nClicking the blue Download button...")
                     
-                    # Method 1: Try direct selector for the blue button
-                    try:
-                        blue_button = page.query_selector("button.axp-activity__cta--primary")
-                        if blue_button:
-                            print("Found blue Download button by class")
-                            blue_button.click()
-                            print("Clicked blue Download button")
-                        else:
-                            print("Blue button not found by class")
+                        # Method 1: Try direct selector for the blue button
+                        try:
+                            blue_button = page.query_selector("button.axp-activity__cta--primary")
+                            if blue_button:
+                                print("Found blue Download button by class")
+                                blue_button.click()
+                                print("Clicked blue Download button")
+                            else:
+                                print("Blue button not found by class")
                             
-                            # Try by role and text
-                            buttons = page.query_selector_all("[role='dialog'] button")
-                            print(f"Found {len(buttons)} buttons in dialog")
+                                # Try by role and text
+                                buttons = page.query_selector_all("[role='dialog'] button")
+                                print(f"Found {len(buttons)} buttons in dialog")
                             
-                            for i, button in enumerate(buttons):
-                                try:
-                                    text = button.inner_text()
-                                    print(f"Button {i} text: {text}")
-                                    if "download" in text.lower():
-                                        print(f"Found Download button at index {i}")
-                                        button.click()
-                                        print("Clicked Download button")
-                                        break
-                                except Exception as e:
-                                    print(f"Error checking button {i}: {e}")
+                                for i, button in enumerate(buttons):
+                                    try:
+                                        text = button.inner_text()
+                                        print(f"Button {i} text: {text}")
+                                        if "download" in text.lower():
+                                            print(f"Found Download button at index {i}")
+                                            button.click()
+                                            print("Clicked Download button")
+                                            break
+                                    except Exception as e:
+                                        print(f"Error checking button {i}: {e}")
                             
-                            # If still not found, click the last button (usually the primary action)
-                            if not download_started and len(buttons) > 0:
-                                print("Clicking the last button in the dialog")
-                                buttons[-1].click()
-                                print("Clicked last button")
-                    except Exception as e:
-                        print(f"Error finding blue button: {e}")
+                                # If still not found, click the last button (usually the primary action)
+                                if not download_started and len(buttons) > 0:
+                                    print("Clicking the last button in the dialog")
+                                    buttons[-1].click()
+                                    print("Clicked last button")
+                        except Exception as e:
+                            print(f"Error finding blue button: {e}")
                     
-                    time.sleep(5)
+                        time.sleep(5)
                     
-                    # Method 2: Use exact coordinates from the screenshot
-                    if not download_started:
-                        print("Using exact coordinates for Download button")
-                        try:
-                            # Click on the blue Download button in the bottom right of the dialog
-                            # These coordinates are based on the screenshot
-                            page.mouse.click(800, 564)
-                            print("Clicked at coordinates (800, 564)")
-                            time.sleep(5)
-                        except Exception as e:
-                            print(f"Error clicking at coordinates: {e}")
+                        # Method 2: Use exact coordinates from the screenshot
+                        if not download_started:
+                            print("Using exact coordinates for Download button")
+                            try:
+                                # Click on the blue Download button in the bottom right of the dialog
+                                # These coordinates are based on the screenshot
+                                page.mouse.click(800, 564)
+                                print("Clicked at coordinates (800, 564)")
+                                time.sleep(5)
+                            except Exception as e:
+                                print(f"Error clicking at coordinates: {e}")
                     
                     # Wait for download to complete
                     print("\nWaiting for download to complete...")
@@ -565,6 +572,12 @@ def main():
                         print(f"- Card: Platinum Card")
                         print(f"- Download location: {download_dir}")
                         
+                        # Store the new rows so the next run starts from the latest date
+                        try:
+                            ingest_downloads(saved_paths)
+                        except Exception as e:
+                            print(f"Could not ingest the download: {e}")
+                        
                         # Write a summary to a log file
                         log_file = os.path.join(logs_dir, f"download_log_platinum_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
                         
@@ -614,7 +627,7 @@ def main():
                             recent_files = []
                             for file in os.listdir(downloads_folder):
                                 file_path = os.path.join(downloads_folder, file)
-                                if os.path.getmtime(file_path) > recent_time and (file.endswith('.xlsx') or file.endswith('.xls') or 'amex' in file.lower() or 'platinum' in file.lower()):
+                                if os.path.getmtime(file_path) > recent_time and (file.lower().endswith(EXPORT_EXTENSIONS) or 'amex' in file.lower() or 'platinum' in file.lower()):
                                     recent_files.append(file)
                             
                             if recent_files:
@@ -648,4 +661,9 @@ def main():
             print(f"Error launching browser: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Download American Express Platinum Card transactions')
+    parser.add_argument('--full', action='store_true',
+                        help='Search the last 30 days instead of starting from the last stored transaction')
+    args = parser.parse_args()
+    
+    main(full=args.full)
\ No newline at end of file
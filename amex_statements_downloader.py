@@ -10,7 +10,24 @@ import datetime
 import sys
 import argparse
 
-def main(card_name=None):
+from download_dialog import DownloadDialog, download_from_dialog
+from navigation_cache import NavigationCache, account_key_from_url, goto_cached
+from card_registry import CardRegistry, UnknownCardError, card_label, discover_cards, select_card
+
+def main(card_name=None, refresh_cards=False):
+    # Reject unknown cards before spending a login on them
+    registry = CardRegistry()
+    card_id, card_entry = None, None
+    if card_name and registry.cards and not refresh_cards:
+        try:
+            card_id, card_entry = registry.resolve(card_name)
+        except UnknownCardError as e:
+            print(f"\nError: {e}")
+            print("Run with --refresh-cards if the card was added to the account recently.")
+            return
+        # Folder and file names follow the display name, not whatever was typed
+        card_name = card_label(card_id, card_entry)
+    
     # Load environment variables
     env_path = os.path.join(os.path.dirname(__file__), 'config', '.env')
     load_dotenv(env_path)
@@ -166,70 +183,90 @@ def main(card_name=None):
             
             # Select card based on parameter or default to Gold Card
             card_to_select = card_name or "American Express Gold Card"
-            print(f"\nSelecting card: {card_to_select}...")
-            
-            # Click on card selector dropdown
-            try:
-                page.click("[role='combobox']")
-                time.sleep(3)
-                print("Clicked on card dropdown")
-                
-                # Try to find and select the specified card
+            if card_entry is None:
+                # Read the dropdown once into the registry on the first run (or when asked)
                 try:
-                    card_option = page.wait_for_selector(f"text='{card_to_select}'", timeout=5000)
-                    if card_option:
-                        card_option.click()
-                        print(f"Selected card: {card_to_select}")
-                        time.sleep(5)
+                    if refresh_cards or not registry.cards:
+                        discover_cards(page, registry)
+                    card_id, card_entry = registry.resolve(card_to_select)
+                except UnknownCardError as e:
+                    print(f"\nError: {e}")
+                    return
                 except Exception as e:
-                    print(f"Could not automatically select card: {e}")
-                    print("Please manually select the desired card")
-                    time.sleep(10)  # Give user time to select card manually
-            except Exception as e:
-                print(f"Error clicking card dropdown: {e}")
-                print("If you're already on the correct card, that's fine.")
+                    print(f"Could not read the card dropdown: {e}")
+            if card_entry:
+                card_to_select = card_entry['name']
+            # Two cards of one product share a display name; links go by registry key
+            cache_key = card_id or card_to_select
             
-            # Take a screenshot after card selection
-            page.screenshot(path=os.path.join(screenshots_dir, "after_card_selection.png"))
+            # A cached card-scoped link selects the card and opens its statements in one goto
+            nav_cache = NavigationCache()
+            if not goto_cached(page, nav_cache, cache_key, 'statements'):
+                print(f"\nSelecting card: {card_to_select}...")
+                if card_entry:
+                    card_confirmed = select_card(page, card_entry)
+                else:
+                    # The dropdown could not be read; try the name as shown
+                    try:
+                        page.click("[role='combobox']")
+                        time.sleep(3)
+                        page.click(f"text='{card_to_select}'")
+                        print(f"Selected card: {card_to_select}")
+                        card_confirmed = True
+                    except Exception as e:
+                        print(f"Error selecting card '{card_to_select}': {e}")
+                        card_confirmed = False
+                if not card_confirmed:
+                    # Never carry on with some other card's statements
+                    print(f"\nError: could not select {card_to_select}; stopping")
+                    return
+                time.sleep(5)
             
-            # Navigate to Statements & Activity
-            print("\nNavigating to Statements & Activity...")
-            try:
-                statements_link = page.wait_for_selector("span:has-text('Statements & Activity')", timeout=5000)
-                if statements_link:
-                    statements_link.click()
-                    print("Clicked on Statements & Activity")
-                    time.sleep(5)
-            except Exception as e:
-                print(f"Error clicking Statements & Activity: {e}")
-                print("Attempting alternative navigation")
-                
-                # Try alternative navigation
+                # Take a screenshot after card selection
+                page.screenshot(path=os.path.join(screenshots_dir, "after_card_selection.png"))
+            
+                # Navigate to Statements & Activity
+                print("\nNavigating to Statements & Activity...")
                 try:
-                    page.goto("https://www.americanexpress.com/en-us/account/statements", wait_until='networkidle', timeout=30000)
-                    print("Navigated directly to statements page")
-                    time.sleep(5)
-                except Exception as e2:
-                    print(f"Direct navigation failed: {e2}")
-                    print("Please navigate to Statements & Activity manually")
-                    time.sleep(15)  # Give user time to navigate manually
+                    statements_link = page.wait_for_selector("span:has-text('Statements & Activity')", timeout=5000)
+                    if statements_link:
+                        statements_link.click()
+                        print("Clicked on Statements & Activity")
+                        time.sleep(5)
+                        if card_confirmed:
+                            nav_cache.remember(cache_key, 'activity', page.url)
+                except Exception as e:
+                    print(f"Error clicking Statements & Activity: {e}")
+                    print("Attempting alternative navigation")
+                
+                    # Try alternative navigation
+                    try:
+                        page.goto("https://www.americanexpress.com/en-us/account/statements", wait_until='networkidle', timeout=30000)
+                        print("Navigated directly to statements page")
+                        time.sleep(5)
+                    except Exception as e2:
+                        print(f"Direct navigation failed: {e2}")
+                        print("Please navigate to Statements & Activity manually")
+                        time.sleep(15)  # Give user time to navigate manually
             
-            # Take a screenshot of the Statements & Activity page
-            page.screenshot(path=os.path.join(screenshots_dir, "statements_activity_page.png"))
+                # Take a screenshot of the Statements & Activity page
+                page.screenshot(path=os.path.join(screenshots_dir, "statements_activity_page.png"))
             
-            # NEXT STEP: Click on "Statements and Year End Summaries"
-            print("\nNavigating to Statements and Year End Summaries...")
-            try:
-                # Try to find and click on the "Statements and Year End Summaries" link
-                summaries_link = page.wait_for_selector("text='Statements and Year End Summaries'", timeout=5000)
-                if summaries_link:
-                    summaries_link.click()
-                    print("Clicked on Statements and Year End Summaries")
-                    time.sleep(5)
-            except Exception as e:
-                print(f"Error clicking Statements and Year End Summaries: {e}")
-                print("Please click on Statements and Year End Summaries manually")
-                time.sleep(15)  # Give user time to click manually
+                # NEXT STEP: Click on "Statements and Year End Summaries"
+                print("\nNavigating to Statements and Year End Summaries...")
+                try:
+                    # Try to find and click on the "Statements and Year End Summaries" link
+                    summaries_link = page.wait_for_selector("text='Statements and Year End Summaries'", timeout=5000)
+                    if summaries_link:
+                        summaries_link.click()
+                        print("Clicked on Statements and Year End Summaries")
+                        time.sleep(5)
+                        if card_confirmed and nav_cache.remember(cache_key, 'statements', page.url) and card_id:
+                            registry.set_account_key(card_id, account_key_from_url(page.url))
+                except Exception as e:
+                    print(f"Error clicking Statements and Year End Summaries: {e}")
+                    print("Please click on Statements and Year End Summaries manually")
+                    time.sleep(15)  # Give user time to click manually
             
             # Take a screenshot after navigating to Statements and Year End Summaries
             page.screenshot(path=os.path.join(screenshots_dir, "statements_summaries_page.png"))
@@ -323,64 +360,70 @@ def main(card_name=None):
                             print(f"Clicked download button for {current_date}")
                             
                             # Wait for the file type selection dialog to appear
-                            time.sleep(2)
+                            try:
+                                DownloadDialog(page).wait()
+                            except Exception as e:
+                                print(f"Download dialog not detected by role: {e}")
                             
                             # Take a screenshot of the file type selection dialog
                             dialog_screenshot_path = os.path.join(screenshots_dir, f"file_type_dialog_{download_count+1}.png")
                             page.screenshot(path=dialog_screenshot_path)
                             print(f"Took screenshot of file type dialog: {dialog_screenshot_path}")
                             
-                            # Select CSV option using coordinates
-                            try:
-                                # Based on the dialog screenshot, we'll use coordinates to click the CSV radio button
-                                # The CSV option is typically the 3rd radio button from the top
+                            # Choose CSV with additional details and confirm by accessible role;
+                            # handle_download saves the file
+                            if download_from_dialog(page, 'csv') is None:
+                                # Select CSV option using coordinates
+                                try:
+                                    # Based on the dialog screenshot, we'll use coordinates to click the CSV radio button
+                                    # The CSV option is typically the 3rd radio button from the top
                                 
-                                # Get viewport size to make sure we're within bounds
-                                viewport = page.viewport_size
+                                    # Get viewport size to make sure we're within bounds
+                                    viewport = page.viewport_size
                                 
-                                # Click on the CSV radio button (coordinates from the screenshot)
-                                # These coordinates are for the middle of the CSV radio button
-                                csv_x = viewport['width'] // 2 - 180  # Left side of dialog, aligned with radio buttons
-                                csv_y = viewport['height'] // 2 - 20  # About 3rd option in the dialog
+                                    # Click on the CSV radio button (coordinates from the screenshot)
+                                    # These coordinates are for the middle of the CSV radio button
+                                    csv_x = viewport['width'] // 2 - 180  # Left side of dialog, aligned with radio buttons
+                                    csv_y = viewport['height'] // 2 - 20  # About 3rd option in the dialog
                                 
-                                # Click where the CSV radio button should be
-                                page.mouse.click(csv_x, csv_y)
-                                print(f"Clicked at coordinates ({csv_x}, {csv_y}) for CSV option")
-                                time.sleep(1)
+                                    # Click where the CSV radio button should be
+                                    page.mouse.click(csv_x, csv_y)
+                                    print(f"Clicked at coordinates ({csv_x}, {csv_y}) for CSV option")
+                                    time.sleep(1)
                                 
-                                # Take a screenshot after clicking CSV option
-                                csv_selected_path = os.path.join(screenshots_dir, f"csv_selected_{download_count+1}.png")
-                                page.screenshot(path=csv_selected_path)
-                                print(f"Took screenshot after selecting CSV: {csv_selected_path}")
+                                    # Take a screenshot after clicking CSV option
+                                    csv_selected_path = os.path.join(screenshots_dir, f"csv_selected_{download_count+1}.png")
+                                    page.screenshot(path=csv_selected_path)
+                                    print(f"Took screenshot after selecting CSV: {csv_selected_path}")
                                 
-                                # Next, click the checkbox for including additional transaction details
-                                # This checkbox is typically near the bottom of the dialog
-                                checkbox_x = viewport['width'] // 2 - 150  # Left side of dialog, aligned with checkbox
-                                checkbox_y = viewport['height'] // 2 + 50   # Near the bottom of dialog, above the buttons
+                                    # Next, click the checkbox for including additional transaction details
+                                    # This checkbox is typically near the bottom of the dialog
+                                    checkbox_x = viewport['width'] // 2 - 150  # Left side of dialog, aligned with checkbox
+                                    checkbox_y = viewport['height'] // 2 + 50   # Near the bottom of dialog, above the buttons
                                 
-                                # Click where the checkbox should be
-                                page.mouse.click(checkbox_x, checkbox_y)
-                                print(f"Clicked at coordinates ({checkbox_x}, {checkbox_y}) for including additional details")
-                                time.sleep(1)
+                                    # Click where the checkbox should be
+                                    page.mouse.click(checkbox_x, checkbox_y)
+                                    print(f"Clicked at coordinates ({checkbox_x}, {checkbox_y}) for including additional details")
+                                    time.sleep(1)
                                 
-                                # Take a screenshot after clicking the checkbox
-                                checkbox_selected_path = os.path.join(screenshots_dir, f"checkbox_selected_{download_count+1}.png")
-                                page.screenshot(path=checkbox_selected_path)
-                                print(f"Took screenshot after selecting checkbox: {checkbox_selected_path}")
+                                    # Take a screenshot after clicking the checkbox
+                                    checkbox_selected_path = os.path.join(screenshots_dir, f"checkbox_selected_{download_count+1}.png")
+                                    page.screenshot(path=checkbox_selected_path)
+                                    print(f"Took screenshot after selecting checkbox: {checkbox_selected_path}")
                                 
-                                # Now click the Download button in the dialog
-                                # The Download button is typically in the bottom right of the dialog
-                                download_x = viewport['width'] // 2 + 100  # Right side of dialog
-                                download_y = viewport['height'] // 2 + 100  # Bottom of dialog
+                                    # Now click the Download button in the dialog
+                                    # The Download button is typically in the bottom right of the dialog
+                                    download_x = viewport['width'] // 2 + 100  # Right side of dialog
+                                    download_y = viewport['height'] // 2 + 100  # Bottom of dialog
                                 
-                                # Click where the Download button should be
-                                page.mouse.click(download_x, download_y)
-                                print(f"Clicked at coordinates ({download_x}, {download_y}) for Download button")
-                            except Exception as e:
-                                print(f"Error selecting CSV format: {e}")
+                                    # Click where the Download button should be
+                                    page.mouse.click(download_x, download_y)
+                                    print(f"Clicked at coordinates ({download_x}, {download_y}) for Download button")
+                                except Exception as e:
+                                    print(f"Error selecting CSV format: {e}")
                             
-                            # Wait for download to complete
-                            time.sleep(5)
+                                # Wait for download to complete
+                                time.sleep(5)
                     except Exception as e:
                         print(f"Error processing row: {e}")
                 
@@ -396,64 +439,70 @@ def main(card_name=None):
                             print(f"Clicked download button {i+1}")
                             
                             # Wait for the file type selection dialog to appear
-                            time.sleep(2)
+                            try:
+                                DownloadDialog(page).wait()
+                            except Exception as e:
+                                print(f"Download dialog not detected by role: {e}")
                             
                             # Take a screenshot of the file type selection dialog
                             dialog_screenshot_path = os.path.join(screenshots_dir, f"file_type_dialog_{i+1}.png")
                             page.screenshot(path=dialog_screenshot_path)
                             print(f"Took screenshot of file type dialog: {dialog_screenshot_path}")
                             
-                            # Select CSV option using coordinates
-                            try:
-                                # Based on the dialog screenshot, we'll use coordinates to click the CSV radio button
-                                # The CSV option is typically the 3rd radio button from the top
+                            # Choose CSV with additional details and confirm by accessible role;
+                            # handle_download saves the file
+                            if download_from_dialog(page, 'csv') is None:
+                                # Select CSV option using coordinates
+                                try:
+                                    # Based on the dialog screenshot, we'll use coordinates to click the CSV radio button
+                                    # The CSV option is typically the 3rd radio button from the top
                                 
-                                # Get viewport size to make sure we're within bounds
-                                viewport = page.viewport_size
+                                    # Get viewport size to make sure we're within bounds
+                                    viewport = page.viewport_size
                                 
-                                # Click on the CSV radio button (coordinates from the screenshot)
-                                # These coordinates are for the middle of the CSV radio button
-                                csv_x = viewport['width'] // 2 - 180  # Left side of dialog, aligned with radio buttons
-                                csv_y = viewport['height'] // 2 - 20  # About 3rd option in the dialog
+                                    # Click on the CSV radio button (coordinates from the screenshot)
+                                    # These coordinates are for the middle of the CSV radio button
+                                    csv_x = viewport['width'] // 2 - 180  # Left side of dialog, aligned with radio buttons
+                                    csv_y = viewport['height'] // 2 - 20  # About 3rd option in the dialog
                                 
-                                # Click where the CSV radio button should be
-                                page.mouse.click(csv_x, csv_y)
-                                print(f"Clicked at coordinates ({csv_x}, {csv_y}) for CSV option")
-                                time.sleep(1)
+                                    # Click where the CSV radio button should be
+                                    page.mouse.click(csv_x, csv_y)
+                                    print(f"Clicked at coordinates ({csv_x}, {csv_y}) for CSV option")
+                                    time.sleep(1)
                                 
-                                # Take a screenshot after clicking CSV option
-                                csv_selected_path = os.path.join(screenshots_dir, f"csv_selected_{i+1}.png")
-                                page.screenshot(path=csv_selected_path)
-                                print(f"Took screenshot after selecting CSV: {csv_selected_path}")
+                                    # Take a screenshot after clicking CSV option
+                                    csv_selected_path = os.path.join(screenshots_dir, f"csv_selected_{i+1}.png")
+                                    page.screenshot(path=csv_selected_path)
+                                    print(f"Took screenshot after selecting CSV: {csv_selected_path}")
                                 
-                                # Next, click the checkbox for including additional transaction details
-                                # This checkbox is typically near the bottom of the dialog
-                                checkbox_x = viewport['width'] // 2 - 150  # Left side of dialog, aligned with checkbox
-                                checkbox_y = viewport['height'] // 2 + 50   # Near the bottom of dialog, above the buttons
+                                    # Next, click the checkbox for including additional transaction details
+                                    # This checkbox is typically near the bottom of the dialog
+                                    checkbox_x = viewport['width'] // 2 - 150  # Left side of dialog, aligned with checkbox
+                                    checkbox_y = viewport['height'] // 2 + 50   # Near the bottom of dialog, above the buttons
                                 
-                                # Click where the checkbox should be
-                                page.mouse.click(checkbox_x, checkbox_y)
-                                print(f"Clicked at coordinates ({checkbox_x}, {checkbox_y}) for including additional details")
-                                time.sleep(1)
+                                    # Click where the checkbox should be
+                                    page.mouse.click(checkbox_x, checkbox_y)
+                                    print(f"Clicked at coordinates ({checkbox_x}, {checkbox_y}) for including additional details")
+                                    time.sleep(1)
                                 
-                                # Take a screenshot after clicking the checkbox
-                                checkbox_selected_path = os.path.join(screenshots_dir, f"checkbox_selected_{i+1}.png")
-                                page.screenshot(path=checkbox_selected_path)
-                                print(f"Took screenshot after selecting checkbox: {checkbox_selected_path}")
+                                    # Take a screenshot after clicking the checkbox
+                                    checkbox_selected_path = os.path.join(screenshots_dir, f"checkbox_selected_{i+1}.png")
+                                    page.screenshot(path=checkbox_selected_path)
+                                    print(f"Took screenshot after selecting checkbox: {checkbox_selected_path}")
                                 
-                                # Now click the Download button in the dialog
-                                # The Download button is typically in the bottom right of the dialog
-                                download_x = viewport['width'] // 2 + 100  # Right side of dialog
-                                download_y = viewport['height'] // 2 + 100  # Bottom of dialog
+                                    # Now click the Download button in the dialog
+                                    # The Download button is typically in the bottom right of the dialog
+                                    download_x = viewport['width'] // 2 + 100  # Right side of dialog
+                                    download_y = viewport['height'] // 2 + 100  # Bottom of dialog
                                 
-                                # Click where the Download button should be
-                                page.mouse.click(download_x, download_y)
-                                print(f"Clicked at coordinates ({download_x}, {download_y}) for Download button")
-                            except Exception as e:
-                                print(f"Error selecting CSV format: {e}")
+                                    # Click where the Download button should be
+                                    page.mouse.click(download_x, download_y)
+                                    print(f"Clicked at coordinates ({download_x}, {download_y}) for Download button")
+                                except Exception as e:
+                                    print(f"Error selecting CSV format: {e}")
                             
-                            # Wait for download to complete
-                            time.sleep(5)
+                                # Wait for download to complete
+                                time.sleep(5)
                         except Exception as e:
                             print(f"Error clicking download button {i+1}: {e}")
                 
@@ -523,6 +572,8 @@ def main(card_name=None):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Download American Express statements from Year End Summaries')
     parser.add_argument('--card', type=str, help='Card name to select (e.g., "American Express Gold Card", "Platinum Card")')
+    parser.add_argument('--refresh-cards', action='store_true',
+                        help='Re-read the cards in the account dropdown into card_registry.json')
     args = parser.parse_args()
     
-    main(card_name=args.card)
\ No newline at end of file
+    main(card_name=args.card, refresh_cards=args.refresh_cards)
\ No newline at end of file
@@ -1,141 +1,342 @@
 #!/usr/bin/env python3
 """
 Script to analyze American Express statement data.
+
+pandas, numpy and matplotlib are only imported on the paths that use them.
+With --quick, a small CSV export is summarized by a pure-Python parser so
+a "how much did I spend" check does not pay for those imports at all.
 """
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 import os
-from datetime import datetime
+import sys
+import time
+
+_START_TIME = time.perf_counter()
+
+from charts import breakdown_chart_specs, render_charts
+from anomalies import detect_anomalies, frame_charges
+from categorizer import Categorizer
+from dedup_index import DedupIndex
+from merchant_normalizer import MerchantNormalizer
+from report_engine import REPORT_FORMATS, build_report, write_reports
+import rewards
+from statement_reader import (CATEGORICAL_COLUMNS, STREAM_BATCH_SIZE, cents_to_dollars,
+                              iter_transaction_batches, load_normalized)
+
+# Larger CSVs (or any .xlsx) go through the pandas path even with --quick
+QUICK_PATH_MAX_BYTES = 5 * 1024 * 1024
+
+# Dependencies whose import time --import-profile reports
+HEAVY_MODULES = ('numpy', 'pandas', 'openpyxl', 'matplotlib')
+
 
-def analyze_statement(filepath):
-    """Analyze an AMEX statement Excel file and generate reports."""
-    print(f"Analyzing file: {filepath}")
+def _breakdown(sums, names):
+    """Build a Total_Amount/Transaction_Count frame from {key: [cents, count]}."""
+    import pandas as pd
     
-    # Create a directory for the analysis
-    analysis_dir = os.path.join(os.path.dirname(filepath), 'analysis')
-    os.makedirs(analysis_dir, exist_ok=True)
+    rows = [(list(key) if isinstance(key, tuple) else [key]) + [cents_to_dollars(cents), count]
+            for key, (cents, count) in sums.items()]
+    return pd.DataFrame(rows, columns=names + ['Total_Amount', 'Transaction_Count'])
+
+
+def aggregate_records(batches):
+    """
+    Accumulate spending sums from batches of Transaction records in pure Python.
+    
+    Returns:
+        dict: 'country', 'category' and 'country_category' mapping each key
+              to [cents, count], plus integer-cent totals and the date range
+    """
+    country, category, country_category = {}, {}, {}
+    spent = credits = net = count = 0
+    first_date = last_date = None
     
-    # Load the data
-    df = pd.read_excel(filepath)
+    for batch in batches:
+        for record in batch:
+            cents = record.amount_cents
+            count += 1
+            net += cents
+            first_date = record.date if first_date is None else min(first_date, record.date)
+            last_date = record.date if last_date is None else max(last_date, record.date)
+            if cents < 0:
+                credits -= cents
+                continue
+            if cents == 0:
+                continue
+            spent += cents
+            for sums, key in ((country, record.country),
+                              (category, record.main_category),
+                              (country_category, (record.country, record.main_category))):
+                entry = sums.setdefault(key, [0, 0])
+                entry[0] += cents
+                entry[1] += 1
     
-    # Find actual transaction rows (skip header info)
-    df = df[df['Transaction Details'].str.contains(r'^\d{2}/\d{2}/\d{4}$', na=False)]
+    return {
+        'country': country,
+        'category': category,
+        'country_category': country_category,
+        'spent_cents': spent,
+        'credit_cents': credits,
+        'net_cents': net,
+        'transactions': count,
+        'first_date': first_date,
+        'last_date': last_date,
+    }
+
+
+def summarize_frame(df):
+    """Compute the spending breakdowns and totals from a normalized frame."""
+    # Filter out negative amounts (payments/credits) for spending analysis
+    spending_df = df[df['Amount_Cents'] > 0]
     
-    # Clean the data
-    df.rename(columns={'Transaction Details': 'Date', 
-                      'Business Gold Card / May 06, 2025 to Jun 06, 2025': 'Receipt',
-                      'Unnamed: 2': 'Description',
-                      'Unnamed: 3': 'Amount',
-                      'Unnamed: 4': 'Extended_Details',
-                      'Unnamed: 5': 'Statement_Description',
-                      'Unnamed: 6': 'Address',
-                      'Unnamed: 7': 'City_State',
-                      'Unnamed: 8': 'Zip',
-                      'Unnamed: 9': 'Country',
-                      'Unnamed: 10': 'Reference',
-                      'Unnamed: 11': 'Category'}, inplace=True)
+    # Sums are taken in integer cents and converted once, so totals don't drift
+    def spending_by(keys, names):
+        grouped = spending_df.groupby(keys, observed=True)['Amount_Cents'].agg(['sum', 'count']).reset_index()
+        grouped['sum'] = cents_to_dollars(grouped['sum'])
+        grouped.columns = names + ['Total_Amount', 'Transaction_Count']
+        return grouped
     
-    # Convert date to datetime
-    df['Date'] = pd.to_datetime(df['Date'], format='%m/%d/%Y')
+    frames = {
+        'country': spending_by('Country', ['Country']),
+        'category': spending_by('Main_Category', ['Category']),
+        'country_category': spending_by(['Country', 'Main_Category'], ['Country', 'Category']),
+        'totals': {
+            'total_spent': cents_to_dollars(spending_df['Amount_Cents'].sum()),
+            'total_credits': cents_to_dollars(-df.loc[df['Amount_Cents'] < 0, 'Amount_Cents'].sum()),
+            'net_balance': cents_to_dollars(df['Amount_Cents'].sum()),
+            'transactions': len(df),
+            'first_date': df['Date'].min(),
+            'last_date': df['Date'].max(),
+        },
+    }
+    if 'Merchant' in df.columns:
+        frames['merchant'] = spending_by('Merchant', ['Merchant']).sort_values('Total_Amount', ascending=False)
+    return frames
+
+
+def iter_deduplicated_batches(filepaths, batch_size=STREAM_BATCH_SIZE, info=None, categorizer=None):
+    """
+    Stream Transaction batches from several exports, dropping charges that
+    already appeared in an earlier file of the same run and (with a
+    categorizer) filling in missing categories.
+    """
+    index = DedupIndex.in_memory()
+    normalizer = MerchantNormalizer()
+    assigned = 0
+    for filepath in filepaths:
+        file_info = {}
+        occurrences = {}
+        total = duplicates = 0
+        for batch in iter_transaction_batches(filepath, batch_size, file_info):
+            kept, dropped = index.filter_transactions(batch, os.path.abspath(filepath), occurrences)
+            if categorizer:
+                assigned += categorizer.categorize_transactions(kept, normalizer)
+            total += len(batch)
+            duplicates += dropped
+            if kept:
+                yield kept
+        if len(filepaths) > 1:
+            print(f"{os.path.basename(filepath)}: {duplicates} duplicate(s) of {total} transactions")
+        if info is not None:
+            _merge_info(info, file_info)
+    if categorizer:
+        categorizer.save()
+        print(f"Auto-categorized {assigned} transactions")
+
+
+def _merge_info(info, file_info):
+    """Keep the card name only if every file agrees; the period falls back to the data."""
+    if 'card_name' not in info:
+        info.update(file_info)
+        return
+    if info['card_name'] != file_info.get('card_name'):
+        info['card_name'] = 'All Cards'
+    info['period_start'] = info['period_end'] = None
+
+
+def summarize_stream(filepaths, batch_size=STREAM_BATCH_SIZE):
+    """
+    Compute the same breakdowns as summarize_frame() while streaming the files.
     
-    # Replace NaN in Country with 'N/A'
-    df['Country'] = df['Country'].fillna('N/A')
+    Only the running per-key sums are kept in memory, so this works on
+    multi-year exports that are too large to load at once.
+    """
+    info = {}
+    sums = aggregate_records(iter_deduplicated_batches(filepaths, batch_size, info, Categorizer()))
     
-    # Split the Category field into main category and subcategory
-    df['Main_Category'] = df['Category'].str.split('-').str[0]
-    df['Sub_Category'] = df['Category'].str.split('-').str[1]
+    frames = {
+        'country': _breakdown(sums['country'], ['Country']),
+        'category': _breakdown(sums['category'], ['Category']),
+        'country_category': _breakdown(sums['country_category'], ['Country', 'Category']),
+        'totals': {
+            'total_spent': cents_to_dollars(sums['spent_cents']),
+            'total_credits': cents_to_dollars(sums['credit_cents']),
+            'net_balance': cents_to_dollars(sums['net_cents']),
+            'transactions': sums['transactions'],
+            'first_date': sums['first_date'],
+            'last_date': sums['last_date'],
+        },
+    }
+    return frames, info
+
+
+def load_deduplicated(filepaths):
+    """load_normalized() every file and concatenate them without cross-file duplicates."""
+    import pandas as pd
     
-    # Replace NaN with 'Uncategorized'
-    df['Main_Category'] = df['Main_Category'].fillna('Uncategorized')
-    df['Sub_Category'] = df['Sub_Category'].fillna('Uncategorized')
+    if len(filepaths) == 1:
+        return load_normalized(filepaths[0])
     
-    # Convert Amount to numeric
-    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
+    index = DedupIndex.in_memory()
+    frames = []
+    info = {}
+    for filepath in filepaths:
+        df, file_info = load_normalized(filepath)
+        total = len(df)
+        df, duplicates = index.filter_frame(df, os.path.abspath(filepath))
+        print(f"{os.path.basename(filepath)}: {duplicates} duplicate(s) of {total} transactions")
+        frames.append(df)
+        _merge_info(info, file_info)
     
-    # Filter out negative amounts (payments/credits) for spending analysis
-    spending_df = df[df['Amount'] > 0]
+    # Categoricals with different categories concatenate as objects, so restore them
+    df = pd.concat(frames, ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df, info
+
+
+def quick_summary(filepaths, top=5):
+    """Print totals and top countries/categories for small CSV exports without pandas."""
+    info = {}
+    sums = aggregate_records(iter_deduplicated_batches(filepaths, info=info, categorizer=Categorizer()))
     
-    # Save filtered data to CSV for reference
-    df.to_csv(os.path.join(analysis_dir, 'all_transactions.csv'), index=False)
-    spending_df.to_csv(os.path.join(analysis_dir, 'spending_only.csv'), index=False)
+    card_name = info['card_name'] or 'Card'
+    first_date, last_date = sums['first_date'], sums['last_date']
+    print(f"{card_name}: {sums['transactions']} transactions", end='')
+    if first_date:
+        print(f" from {first_date:%B %d, %Y} to {last_date:%B %d, %Y}", end='')
+    print()
+    print(f"Total Spent: ${sums['spent_cents'] / 100:.2f}")
+    print(f"Total Payments/Credits: ${sums['credit_cents'] / 100:.2f}")
+    print(f"Net Balance: ${sums['net_cents'] / 100:.2f}")
     
-    # Country spending breakdown
-    country_spending = spending_df.groupby('Country')['Amount'].agg(['sum', 'count']).reset_index()
-    country_spending.columns = ['Country', 'Total_Amount', 'Transaction_Count']
-    country_spending.to_csv(os.path.join(analysis_dir, 'country_spending.csv'), index=False)
+    for title, key in (("Top Countries by Spending", 'country'), ("Top Categories by Spending", 'category')):
+        print(f"\n{title}:")
+        ranked = sorted(sums[key].items(), key=lambda item: item[1][0], reverse=True)[:top]
+        for name, (cents, count) in ranked:
+            print(f"  {name}: ${cents / 100:.2f} ({count} transactions)")
+
+
+def can_use_quick_path(filepaths):
+    """The pure-Python path handles CSV exports up to QUICK_PATH_MAX_BYTES in total."""
+    return (all(path.lower().endswith('.csv') for path in filepaths)
+            and sum(os.path.getsize(path) for path in filepaths) <= QUICK_PATH_MAX_BYTES)
+
+
+def print_import_profile():
+    """Print each heavy dependency's cold import time and which ones this run loaded."""
+    import subprocess
     
-    # Category spending breakdown
-    category_spending = spending_df.groupby('Main_Category')['Amount'].agg(['sum', 'count']).reset_index()
-    category_spending.columns = ['Category', 'Total_Amount', 'Transaction_Count'] 
-    category_spending.to_csv(os.path.join(analysis_dir, 'category_spending.csv'), index=False)
+    print(f"\nImport profile (total run time {time.perf_counter() - _START_TIME:.3f}s)")
+    print("Cold import cost, measured in a fresh interpreter:")
+    for module in HEAVY_MODULES:
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True)
+        cumulative_us = None
+        for line in result.stderr.splitlines():
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == module:
+                cumulative_us = int(parts[1])
+        if result.returncode != 0 or cumulative_us is None:
+            print(f"  {module}: not installed")
+        else:
+            print(f"  {module}: {cumulative_us / 1000:.0f} ms")
     
-    # Country and Category combined
-    country_cat_spending = spending_df.groupby(['Country', 'Main_Category'])['Amount'].agg(['sum', 'count']).reset_index()
-    country_cat_spending.columns = ['Country', 'Category', 'Total_Amount', 'Transaction_Count']
-    country_cat_spending.to_csv(os.path.join(analysis_dir, 'country_category_spending.csv'), index=False)
+    loaded = [module for module in HEAVY_MODULES if module in sys.modules]
+    print(f"Loaded by this run: {', '.join(loaded) if loaded else 'none'}")
+
+
+def analyze_statement(filepath, stream=False, batch_size=STREAM_BATCH_SIZE, report_formats=('text',)):
+    """
+    Analyze one or more AMEX statement exports and generate reports.
+    
+    When several files are given, charges that appear in more than one of
+    them (overlapping date ranges) are only counted once.
+    """
+    filepaths = [filepath] if isinstance(filepath, str) else list(filepath)
+    print(f"Analyzing file: {', '.join(filepaths)}")
+    
+    # Create a directory for the analysis
+    analysis_dir = os.path.join(os.path.dirname(filepaths[0]), 'analysis')
+    os.makedirs(analysis_dir, exist_ok=True)
     
-    # Generate visualizations
-    plt.figure(figsize=(10, 6))
-    cs_sorted = country_spending.sort_values('Total_Amount', ascending=False)
-    plt.bar(cs_sorted['Country'], cs_sorted['Total_Amount'], color='skyblue')
-    plt.title('Spending by Country')
-    plt.ylabel('Amount ($)')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig(os.path.join(analysis_dir, 'country_spending.png'))
-    
-    plt.figure(figsize=(10, 6))
-    cat_sorted = category_spending.sort_values('Total_Amount', ascending=False)
-    plt.bar(cat_sorted['Category'], cat_sorted['Total_Amount'], color='lightgreen')
-    plt.title('Spending by Category')
-    plt.ylabel('Amount ($)')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig(os.path.join(analysis_dir, 'category_spending.png'))
-    
-    # Generate text report
-    with open(os.path.join(analysis_dir, 'summary_report.txt'), 'w') as f:
-        f.write("Business Gold Card Transaction Analysis\n")
-        f.write("====================================\n\n")
-        f.write(f"Statement Period: {df['Date'].min().strftime('%B %d, %Y')} to {df['Date'].max().strftime('%B %d, %Y')}\n\n")
-        f.write(f"Total Transactions: {len(df)}\n")
-        f.write(f"Total Spent: ${spending_df['Amount'].sum():.2f}\n")
-        f.write(f"Total Payments/Credits: ${df[df['Amount'] < 0]['Amount'].sum() * -1:.2f}\n")
-        f.write(f"Net Balance: ${df['Amount'].sum():.2f}\n\n")
+    anomalies = None
+    chart_specs = []
+    if stream:
+        # Aggregate batch by batch; per-transaction CSVs and anomalies are not produced
+        frames, info = summarize_stream(filepaths, batch_size)
+    else:
+        # Locate the header row and statement title, then load compact typed columns
+        df, info = load_deduplicated(filepaths)
+        df['Merchant'] = MerchantNormalizer().normalize_series(df['Description'])
+        
+        # Fill in categories the statement left blank from rules and past statements
+        categorizer = Categorizer()
+        df, assigned = categorizer.categorize_frame(df)
+        categorizer.save()
+        print(f"Auto-categorized {assigned} transactions")
+        frames = summarize_frame(df)
         
-        f.write("Spending by Country\n")
-        f.write("-----------------\n")
-        for _, row in cs_sorted.iterrows():
-            f.write(f"{row['Country']}: ${row['Total_Amount']:.2f} ({row['Transaction_Count']} transactions)\n")
+        # Save filtered data to CSV for reference, with amounts back in dollars
+        def with_dollars(frame):
+            return frame.assign(Amount=cents_to_dollars(frame['Amount_Cents'])).drop(columns='Amount_Cents')
         
-        f.write("\nSpending by Category\n")
-        f.write("------------------\n")
-        for _, row in cat_sorted.iterrows():
-            f.write(f"{row['Category']}: ${row['Total_Amount']:.2f} ({row['Transaction_Count']} transactions)\n")
+        with_dollars(df).to_csv(os.path.join(analysis_dir, 'all_transactions.csv'), index=False)
+        with_dollars(df[df['Amount_Cents'] > 0]).to_csv(os.path.join(analysis_dir, 'spending_only.csv'), index=False)
+        frames['merchant'].to_csv(os.path.join(analysis_dir, 'merchant_spending.csv'), index=False)
         
-        f.write("\nDetailed Country/Category Breakdown\n")
-        f.write("--------------------------------\n")
-        cc_sorted = country_cat_spending.sort_values(['Country', 'Total_Amount'], ascending=[True, False])
-        current_country = None
-        for _, row in cc_sorted.iterrows():
-            if current_country != row['Country']:
-                current_country = row['Country']
-                f.write(f"\n{current_country}\n")
-            f.write(f"  {row['Category']}: ${row['Total_Amount']:.2f} ({row['Transaction_Count']} transactions)\n")
+        # Charges and category months far outside their usual range
+        anomalies = detect_anomalies(frame_charges(df, info['card_name'] or 'Card'))
+        anomalies.to_csv(os.path.join(analysis_dir, 'anomalies.csv'), index=False)
+        print(f"Found {len(anomalies)} anomalies")
+        
+        # Points earned under the card's earn table, by month and category
+        scored = rewards.compute_points(rewards.frame_charges(df, info['card_name'] or 'Card'))
+        rewards_rollup = rewards.rollup_points(scored)
+        rewards_rollup.to_csv(os.path.join(analysis_dir, 'rewards_summary.csv'), index=False)
+        chart_specs.append(rewards.rewards_chart_spec(scored, info['card_name'] or 'Card'))
+        print(f"Rewards earned: {int(rewards_rollup['Points'].sum()):,} points")
+    
+    card_name = info['card_name'] or 'Card'
+    
+    country_spending = frames['country']
+    category_spending = frames['category']
+    country_cat_spending = frames['country_category']
+    country_spending.to_csv(os.path.join(analysis_dir, 'country_spending.csv'), index=False)
+    category_spending.to_csv(os.path.join(analysis_dir, 'category_spending.csv'), index=False)
+    country_cat_spending.to_csv(os.path.join(analysis_dir, 'country_category_spending.csv'), index=False)
+    
+    # Compute the report once and render every requested format from it
+    report = build_report(frames, card_name, info['period_start'], info['period_end'], anomalies)
+    write_reports(report, analysis_dir, report_formats)
+    
+    # Generate visualizations (skipped when the aggregated data is unchanged)
+    rendered, skipped = render_charts(breakdown_chart_specs(report) + chart_specs, analysis_dir)
+    if skipped:
+        print(f"Charts unchanged, kept {len(skipped)} existing image(s)")
     
     # Print summary to console
     print("\nAnalysis complete! Files saved to:", analysis_dir)
     print("\nSummary:")
-    print(f"Total Spent: ${spending_df['Amount'].sum():.2f}")
-    print(f"Total Payments/Credits: ${df[df['Amount'] < 0]['Amount'].sum() * -1:.2f}")
-    print(f"Net Balance: ${df['Amount'].sum():.2f}")
+    print(f"Total Spent: ${report['totals']['total_spent']:.2f}")
+    print(f"Total Payments/Credits: ${report['totals']['total_credits']:.2f}")
+    print(f"Net Balance: ${report['totals']['net_balance']:.2f}")
     
     print("\nTop Countries by Spending:")
-    print(cs_sorted.head().to_string(index=False))
+    print(report['country'].head().to_string(index=False))
     
     print("\nTop Categories by Spending:")
-    print(cat_sorted.head().to_string(index=False))
+    print(report['category'].head().to_string(index=False))
     
     return analysis_dir
 
@@ -143,8 +344,30 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Analyze American Express statement data")
-    parser.add_argument("filepath", help="Path to the Excel file containing statement data")
+    parser.add_argument("filepath", nargs="+",
+                        help="Excel or CSV file(s) containing statement data; overlapping charges are counted once")
+    parser.add_argument("--stream", action="store_true",
+                        help="Aggregate an .xlsx export in batches with bounded memory (skips per-transaction CSVs)")
+    parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE,
+                        help="Rows per batch when streaming")
+    parser.add_argument("--report-format", nargs="+", default=["text"], choices=sorted(REPORT_FORMATS),
+                        help="Summary report formats to write (default: text)")
+    parser.add_argument("--quick", action="store_true",
+                        help="Only print totals; small CSV exports skip pandas entirely")
+    parser.add_argument("--import-profile", action="store_true",
+                        help="Print how much time heavy imports cost")
     
     args = parser.parse_args()
+    args.filepath = list(dict.fromkeys(args.filepath))
+    
+    if args.quick and can_use_quick_path(args.filepath):
+        quick_summary(args.filepath)
+    else:
+        if args.quick:
+            print("Quick mode needs a CSV export under "
+                  f"{QUICK_PATH_MAX_BYTES // (1024 * 1024)} MB; running the full analysis")
+        analyze_statement(args.filepath, stream=args.stream, batch_size=args.batch_size,
+                          report_formats=args.report_format)
     
-    analyze_statement(args.filepath)
\ No newline at end of file
+    if args.import_profile:
+        print_import_profile()
\ No newline at end of file
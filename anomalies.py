@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Flag unusual charges and category spikes with rolling robust statistics.
+
+Every charge is compared with the median and MAD of the previous
+WINDOW_CHARGES charges at the same card and merchant; every month's spend
+in a category is compared with the previous WINDOW_MONTHS months of that
+category on the same card. The windows are grouped pandas rolling windows
+over one sorted frame, so the whole multi-card history is handled in a
+single pass without Python loops over groups.
+
+The rolling MAD is the rolling median of each value's distance from the
+median of the window ending at it, which avoids a per-window Python callback.
+"""
+
+# Charges of the same merchant used as the baseline, and how many are needed
+WINDOW_CHARGES = 20
+MIN_CHARGES = 5
+
+# Months of category spend used as the baseline, and how many are needed
+WINDOW_MONTHS = 12
+MIN_MONTHS = 3
+
+# Robust z-score (0.6745 * deviation / MAD) above which a value is flagged
+THRESHOLD = 3.5
+
+# Ignore tiny outliers, and never let MAD fall below this share of the median
+# or this many cents (a zero median would otherwise give absurd scores)
+MIN_CHARGE_EXCESS_CENTS = 2000
+MIN_SPIKE_EXCESS_CENTS = 10000
+MAD_FLOOR_SHARE = 0.05
+MAD_FLOOR_CENTS = 500
+
+ANOMALY_COLUMNS = ['Kind', 'Card', 'Date', 'Merchant', 'Category', 'Amount', 'Baseline', 'Score']
+
+
+def _rolling_median(series, groups, window, min_periods, include_current=False):
+    """Median of the last `window` values within each group, by default excluding the current one."""
+    values = series if include_current else series.groupby(groups, sort=False).shift()
+    rolled = values.groupby(groups, sort=False).rolling(window, min_periods=min_periods).median()
+    return rolled.reset_index(level=0, drop=True).sort_index()
+
+
+def _robust_scores(values, keys, window, min_periods):
+    """(baseline median, robust z-score) of each value against its group's recent history."""
+    import numpy as np
+
+    # One integer code per group keeps the grouped windows cheap
+    groups = values.groupby(keys, sort=False).ngroup()
+    median = _rolling_median(values, groups, window, min_periods)
+    # Distance of every value from the median of the window ending at it;
+    # the MAD is the median of those distances over the previous values
+    deviation = (values - _rolling_median(values, groups, window, 1, include_current=True)).abs()
+    mad = _rolling_median(deviation, groups, window, min_periods)
+    mad = np.maximum(mad, MAD_FLOOR_SHARE * median.abs()).clip(lower=MAD_FLOOR_CENTS)
+    return median, 0.6745 * (values - median) / mad
+
+
+def charge_anomalies(charges):
+    """
+    Charges far above what the same merchant usually costs on the same card.
+
+    Args:
+        charges (DataFrame): card, date, merchant, main_category, amount_cents
+
+    Returns:
+        DataFrame: ANOMALY_COLUMNS rows with Kind 'charge'
+    """
+    import pandas as pd
+
+    df = charges[charges['amount_cents'] > 0].sort_values(['card', 'merchant', 'date'], kind='stable')
+    df = df.reset_index(drop=True)
+    keys = [df['card'], df['merchant']]
+    amounts = df['amount_cents'].astype(float)
+    median, score = _robust_scores(amounts, keys, WINDOW_CHARGES, MIN_CHARGES)
+
+    flagged = (score > THRESHOLD) & (amounts - median >= MIN_CHARGE_EXCESS_CENTS)
+    rows = df[flagged]
+    return pd.DataFrame({
+        'Kind': 'charge',
+        'Card': rows['card'],
+        'Date': rows['date'].dt.strftime('%Y-%m-%d'),
+        'Merchant': rows['merchant'],
+        'Category': rows['main_category'],
+        'Amount': rows['amount_cents'] / 100,
+        'Baseline': (median[flagged] / 100).round(2),
+        'Score': score[flagged].round(1),
+    }, columns=ANOMALY_COLUMNS)
+
+
+def category_spikes(charges):
+    """
+    Months in which a category's spend on a card jumped far above its recent level.
+
+    Months without any spend count as zero so a quiet history stays quiet.
+    Categories whose usual month is zero (annual fees, one-off purchases)
+    have no level to spike from and are left to charge_anomalies().
+
+    Returns:
+        DataFrame: ANOMALY_COLUMNS rows with Kind 'category_spike' (Date is YYYY-MM)
+    """
+    import pandas as pd
+
+    spending = charges[charges['amount_cents'] > 0]
+    if spending.empty:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+
+    months = spending['date'].dt.to_period('M')
+    monthly = spending.groupby(['card', 'main_category', months], observed=True)['amount_cents'].sum()
+    # Fill the month gaps of every card/category with zero spend
+    full_range = pd.period_range(months.min(), months.max(), freq='M')
+    monthly = monthly.unstack(fill_value=0).reindex(columns=full_range, fill_value=0).stack()
+    monthly = monthly.rename('cents').reset_index()
+    monthly.columns = ['card', 'main_category', 'month', 'cents']
+
+    keys = [monthly['card'], monthly['main_category']]
+    amounts = monthly['cents'].astype(float)
+    median, score = _robust_scores(amounts, keys, WINDOW_MONTHS, MIN_MONTHS)
+
+    flagged = (score > THRESHOLD) & (amounts - median >= MIN_SPIKE_EXCESS_CENTS) & (median > 0)
+    rows = monthly[flagged]
+    return pd.DataFrame({
+        'Kind': 'category_spike',
+        'Card': rows['card'],
+        'Date': rows['month'].astype(str),
+        'Merchant': '',
+        'Category': rows['main_category'],
+        'Amount': rows['cents'] / 100,
+        'Baseline': (median[flagged] / 100).round(2),
+        'Score': score[flagged].round(1),
+    }, columns=ANOMALY_COLUMNS)
+
+
+def detect_anomalies(charges):
+    """Outlier charges and category spikes, most unusual first."""
+    import pandas as pd
+
+    if charges.empty:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    charges = charges.assign(date=pd.to_datetime(charges['date']),
+                             merchant=charges['merchant'].astype(object).fillna(''),
+                             main_category=charges['main_category'].astype(object).fillna('Uncategorized'))
+    found = [frame for frame in (charge_anomalies(charges), category_spikes(charges)) if not frame.empty]
+    if not found:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    return pd.concat(found, ignore_index=True).sort_values('Score', ascending=False).reset_index(drop=True)
+
+
+def frame_charges(df, card_name):
+    """Adapt an analyze_statement frame to the columns detect_anomalies() expects."""
+    return df[['Date', 'Merchant', 'Main_Category', 'Amount_Cents']].rename(columns={
+        'Date': 'date', 'Merchant': 'merchant', 'Main_Category': 'main_category', 'Amount_Cents': 'amount_cents',
+    }).assign(card=card_name)
+
+
+def load_charges(conn, card=None):
+    """All stored transactions as a card/date/merchant/main_category/amount_cents frame."""
+    import pandas as pd
+
+    sql = "SELECT card, date, merchant, main_category, amount_cents FROM transactions"
+    params = []
+    if card:
+        sql += " WHERE card = ?"
+        params.append(card)
+    return pd.read_sql_query(sql, conn, params=params, parse_dates=['date'])
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+"""
+Find the blue Download button by template matching instead of fixed coordinates.
+
+A small image of the button (download_button.png) is matched
+against the dialog area of a screenshot with FFT-based normalized
+cross-correlation at a few scales. The position found is cached per screen
+resolution and pixel ratio; later runs compare the template with the single
+patch at the cached spot and only rescan when it no longer matches.
+
+Both are machine-specific, so they are kept with the user's data in
+~/Downloads/AmexStatements/.button_locator rather than in the source tree.
+"""
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+DATA_DIR = os.path.join(os.path.expanduser("~/Downloads/AmexStatements"), '.button_locator')
+DEFAULT_TEMPLATE_PATH = os.path.join(DATA_DIR, 'download_button.png')
+DEFAULT_CACHE_PATH = os.path.join(DATA_DIR, 'button_locations.json')
+
+# Template sizes tried, relative to the captured template
+SCALES = (0.5, 0.75, 1.0, 1.25, 1.5, 2.0)
+
+# Correlation needed to accept a match, and to trust a cached spot
+MATCH_THRESHOLD = 0.8
+VERIFY_THRESHOLD = 0.9
+
+
+def _gray(image):
+    """float32 grayscale array from a PIL image, array or PNG bytes."""
+    if isinstance(image, (bytes, bytearray)):
+        import io
+        image = Image.open(io.BytesIO(image))
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert('L'), dtype=np.float32)
+    pixels = np.asarray(image, dtype=np.float32)
+    return pixels[..., :3].mean(axis=-1) if pixels.ndim == 3 else pixels
+
+
+def _window_sums(values, height, width):
+    """Sum of every height x width window, from one integral image."""
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    integral[1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+    return (integral[height:, width:] - integral[:-height, width:]
+            - integral[height:, :-width] + integral[:-height, :-width])
+
+
+def match_template(image, template):
+    """
+    Normalized cross-correlation of `template` at every position of `image`.
+
+    The correlation itself is one FFT product; the per-window mean and
+    variance of the image come from integral images.
+
+    Returns:
+        tuple: (best score in [-1, 1], x, y of the best top-left corner),
+               or None when the template does not fit or is flat
+    """
+    ih, iw = image.shape
+    th, tw = template.shape
+    if th > ih or tw > iw:
+        return None
+    centered = template - template.mean()
+    template_norm = np.sqrt((centered ** 2).sum())
+    if template_norm == 0:
+        return None
+
+    # Removing the global mean keeps FFT round-off small next to the signal
+    image = image.astype(np.float64) - image.mean()
+    shape = (ih + th - 1, iw + tw - 1)
+    product = np.fft.rfft2(image, shape) * np.fft.rfft2(centered[::-1, ::-1], shape)
+    numerator = np.fft.irfft2(product, shape)[th - 1:ih, tw - 1:iw]
+
+    sums = _window_sums(image, th, tw)
+    squares = _window_sums(image ** 2, th, tw)
+    variance = np.maximum(squares - sums ** 2 / (th * tw), 0)
+    scores = numerator / (np.sqrt(variance) * template_norm + 1e-6)
+    # Nearly flat windows (under one gray level of spread) cannot be the button
+    scores[variance < th * tw] = -1
+
+    y, x = np.unravel_index(np.argmax(scores), scores.shape)
+    return float(scores[y, x]), int(x), int(y)
+
+
+def _resized(template, scale):
+    height, width = template.shape
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return np.asarray(Image.fromarray(template).resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+def patch_score(image, template, x, y):
+    """Correlation of the template with the one patch whose top-left is (x, y)."""
+    th, tw = template.shape
+    patch = image[y:y + th, x:x + tw]
+    if patch.shape != template.shape:
+        return -1.0
+    a = patch - patch.mean()
+    b = template - template.mean()
+    denominator = np.sqrt((a ** 2).sum() * (b ** 2).sum())
+    return float((a * b).sum() / denominator) if denominator else -1.0
+
+
+class ButtonLocator:
+    """Template matcher for the Download button with a per-screen position cache."""
+
+    def __init__(self, template_path=DEFAULT_TEMPLATE_PATH, cache_path=DEFAULT_CACHE_PATH):
+        self.template_path = template_path
+        self.cache_path = cache_path
+        self.template = _gray(Image.open(template_path)) if os.path.exists(template_path) else None
+        try:
+            with open(cache_path) as f:
+                self.cache = json.load(f)
+        except (OSError, ValueError):
+            self.cache = {}
+
+    @staticmethod
+    def screen_key(width, height, pixel_ratio=1.0):
+        return f"{width}x{height}@{pixel_ratio:g}"
+
+    def save_template(self, image, box=None):
+        """
+        Store the button image used for matching.
+
+        Args:
+            image: Screenshot (PIL image, array or PNG bytes) or the button itself
+            box (tuple): (left, top, width, height) of the button in `image`
+        """
+        gray = _gray(image)
+        if box:
+            left, top, width, height = [int(round(v)) for v in box]
+            gray = gray[top:top + height, left:left + width]
+        os.makedirs(os.path.dirname(self.template_path), exist_ok=True)
+        Image.fromarray(gray.astype(np.uint8)).save(self.template_path)
+        self.template = gray
+        # Positions found with the old template are no longer trustworthy
+        self.cache = {}
+        self._save_cache()
+
+    def discard_template(self):
+        """Drop a template whose match did not start a download, so the next good click replaces it."""
+        if os.path.exists(self.template_path):
+            os.remove(self.template_path)
+        self.template = None
+        self.cache = {}
+        self._save_cache()
+
+    def _save_cache(self):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.cache_path, 'w') as f:
+            json.dump(self.cache, f, indent=2, sort_keys=True)
+
+    def locate(self, screenshot, screen_key, region=None):
+        """
+        Find the button's center in `screenshot` pixels.
+
+        Args:
+            screenshot: PIL image, array or PNG bytes
+            screen_key (str): screen_key() of the display the screenshot came from
+            region (tuple): (left, top, width, height) to search, e.g. the dialog box
+
+        Returns:
+            tuple: (x, y, score) of the button center, or None if not found
+        """
+        if self.template is None:
+            return None
+        image = _gray(screenshot)
+
+        cached = self.cache.get(screen_key)
+        if cached:
+            template = _resized(self.template, cached['scale'])
+            score = patch_score(image, template, cached['left'], cached['top'])
+            if score >= VERIFY_THRESHOLD:
+                return cached['x'], cached['y'], score
+
+        left, top = 0, 0
+        if region:
+            left, top, width, height = [int(round(v)) for v in region]
+            left, top = max(left, 0), max(top, 0)
+            image = image[top:top + height, left:left + width]
+
+        best = None
+        for scale in SCALES:
+            template = _resized(self.template, scale)
+            found = match_template(image, template)
+            if found and (best is None or found[0] > best[0]):
+                best = found + (scale, template.shape)
+        if best is None or best[0] < MATCH_THRESHOLD:
+            return None
+
+        score, x, y, scale, (th, tw) = best
+        center_x, center_y = left + x + tw // 2, top + y + th // 2
+        self.cache[screen_key] = {
+            'x': center_x, 'y': center_y, 'left': left + x, 'top': top + y, 'scale': scale, 'score': round(score, 3),
+        }
+        self._save_cache()
+        return center_x, center_y, score
+
+
+def locate_on_page(page, locator=None):
+    """
+    Find the Download button on a Playwright page.
+
+    The search is limited to the open dialog when there is one; the result is
+    in CSS pixels, ready for page.mouse.click().
+
+    Returns:
+        tuple: (x, y) or None
+    """
+    locator = locator or ButtonLocator()
+    if locator.template is None:
+        return None
+    ratio = page.evaluate("window.devicePixelRatio") or 1
+    viewport = page.viewport_size or page.evaluate("({width: window.innerWidth, height: window.innerHeight})")
+    region = None
+    dialog = page.query_selector("[role='dialog']")
+    if dialog:
+        box = dialog.bounding_box()
+        if box:
+            region = tuple(v * ratio for v in (box['x'], box['y'], box['width'], box['height']))
+    found = locator.locate(page.screenshot(), ButtonLocator.screen_key(viewport['width'], viewport['height'], ratio),
+                           region)
+    if not found:
+        return None
+    return found[0] / ratio, found[1] / ratio
+
+
+def capture_template(image, locator=None):
+    """
+    Save a template if none exists yet.
+
+    Args:
+        image: Screenshot of the button, taken before the click that
+               started a download (the dialog may be gone afterwards)
+    """
+    locator = locator or ButtonLocator()
+    if locator.template is None:
+        locator.save_template(image)
+        print(f"Saved Download button template to {locator.template_path}")
+    return locator
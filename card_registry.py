@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+"""
+Registry of the cards on the account, read from the account dropdown.
+
+The first run opens the `[role='combobox']` once, reads every
+`[role='option']` (display name, last digits, account token when the option
+carries one) and stores them under a short key ("american-express-gold-card",
+"platinum-card") in ~/Downloads/AmexStatements/card_registry.json, outside
+the source tree since it holds account tokens. Later runs resolve a
+requested card against the registry before the browser starts, so a
+misspelled name fails at once instead of after a series of selector
+timeouts, and select the card with a single role locator on its name.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.expanduser("~/Downloads/AmexStatements"), 'card_registry.json')
+
+# Milliseconds to wait for the dropdown options
+OPTIONS_TIMEOUT = 5000
+
+# Attributes that may hold an option's account token
+TOKEN_ATTRIBUTES = ('data-account-key', 'data-account-token', 'data-value', 'value')
+
+LAST_DIGITS = re.compile(r'(\d{4,5})\D*$')
+
+
+class UnknownCardError(ValueError):
+    """Raised when a card name matches nothing (or several things) in the registry."""
+
+
+def clean_name(text):
+    """Display name without trademark signs, account digits and extra whitespace."""
+    first_line = (text or '').strip().split('\n')[0]
+    name = re.sub(r'[®™℠]', '', first_line)
+    name = re.sub(r'[\s(•·.x*-]*\d{4,5}\W*$', '', name)
+    return ' '.join(name.split())
+
+
+def card_key(name):
+    """Registry key of a display name: "American Express Gold Card" -> "american-express-gold-card"."""
+    return re.sub(r'[^a-z0-9]+', '-', clean_name(name).lower()).strip('-')
+
+
+def card_label(key, card):
+    """
+    Name a registry card for --card, folders and file names.
+
+    The display name, plus the last digits when another card shares it, so
+    the label resolves back to the same key.
+    """
+    if key != card_key(card['name']) and card.get('last_digits'):
+        return f"{card['name']} {card['last_digits']}"
+    return card['name']
+
+
+class CardRegistry:
+    """Cards discovered in the account dropdown, stored as JSON."""
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.cards = json.load(f)
+        except (OSError, ValueError):
+            self.cards = {}
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.cards, f, indent=2, sort_keys=True)
+
+    def update(self, options):
+        """
+        Replace the registry with freshly discovered dropdown options.
+
+        Args:
+            options (list): Dicts with the option's 'text' and optional 'token'
+
+        Returns:
+            dict: The new {key: card} registry
+        """
+        discovered = datetime.datetime.now().isoformat(timespec='seconds')
+        cards = {}
+        for option in options:
+            name = clean_name(option['text'])
+            if not name:
+                continue
+            digits = LAST_DIGITS.search(option['text'].strip())
+            key = card_key(name)
+            if key in cards and digits:
+                # Two cards of the same product: tell them apart by their digits
+                key = f"{key}-{digits.group(1)}"
+            cards[key] = {
+                'name': name,
+                'last_digits': digits.group(1) if digits else None,
+                'account_key': option.get('token') or self.cards.get(key, {}).get('account_key'),
+                'discovered': discovered,
+            }
+        self.cards = cards
+        self._save()
+        return cards
+
+    def set_account_key(self, key, account_key):
+        """Record a card's account token learned elsewhere (e.g. from a deep link)."""
+        if key in self.cards and account_key and self.cards[key].get('account_key') != account_key:
+            self.cards[key]['account_key'] = account_key
+            self._save()
+
+    def resolve(self, name):
+        """
+        Find a card by key, display name, last digits or a unique part of its name.
+
+        Returns:
+            tuple: (key, card)
+
+        Raises:
+            UnknownCardError: No card, or more than one, matches
+        """
+        wanted = clean_name(name).lower()
+        # The raw slug keeps trailing digits, which tell cards of one product apart
+        raw_key = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+        for key in (raw_key, card_key(name)):
+            if key in self.cards:
+                return key, self.cards[key]
+        for candidates in (
+            [k for k, card in self.cards.items() if card['name'].lower() == wanted],
+            [k for k, card in self.cards.items() if card.get('last_digits') and card['last_digits'] == name.strip().lstrip('-')],
+            [k for k, card in self.cards.items() if wanted and wanted in card['name'].lower()],
+        ):
+            if len(candidates) == 1:
+                return candidates[0], self.cards[candidates[0]]
+            if len(candidates) > 1:
+                raise UnknownCardError(f"'{name}' matches several cards: {', '.join(sorted(candidates))}")
+        raise UnknownCardError(f"Unknown card '{name}'. Known cards: {', '.join(self.describe())}")
+
+    def describe(self):
+        """One "key (Name -12345)" string per card."""
+        return [f"{key} ({card['name']}{' -' + card['last_digits'] if card.get('last_digits') else ''})"
+                for key, card in sorted(self.cards.items())]
+
+
+def discover_cards(page, registry):
+    """
+    Read every option of the account dropdown into the registry.
+
+    Leaves the dropdown closed.
+
+    Returns:
+        dict: The new {key: card} registry
+    """
+    print("Reading cards from the account dropdown...")
+    page.get_by_role('combobox').first.click()
+    options = page.get_by_role('option')
+    options.first.wait_for(state='visible', timeout=OPTIONS_TIMEOUT)
+    found = options.evaluate_all(
+        """(els, attributes) => els.map(el => ({
+            text: el.innerText,
+            token: attributes.map(name => el.getAttribute(name)).find(value => value) || null,
+        }))""",
+        list(TOKEN_ATTRIBUTES),
+    )
+    page.keyboard.press('Escape')
+    cards = registry.update(found)
+    print(f"Found {len(cards)} cards: {', '.join(registry.describe())}")
+    return cards
+
+
+def select_card(page, card):
+    """
+    Pick a registry card in the account dropdown with one direct locator.
+
+    Returns:
+        bool: True if the card's option was clicked
+    """
+    page.get_by_role('combobox').first.click()
+    # Trademark signs were dropped from the stored name; allow them between words
+    name_pattern = r'\W*'.join(re.escape(word) for word in card['name'].split())
+    option = page.get_by_role('option', name=re.compile(rf"^\W*{name_pattern}", re.I))
+    if card.get('last_digits'):
+        option = option.filter(has_text=card['last_digits'])
+    try:
+        option.first.click(timeout=OPTIONS_TIMEOUT)
+    except Exception as e:
+        print(f"Could not select {card['name']}: {e}")
+        page.keyboard.press('Escape')
+        return False
+    print(f"Selected card: {card['name']}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show or check the cards discovered in the account dropdown')
+    parser.add_argument('names', nargs='*', help='Card names to resolve against the registry')
+    args = parser.parse_args()
+
+    registry = CardRegistry()
+    if not registry.cards:
+        print(f"No cards discovered yet; a downloader run fills {registry.path}")
+        return
+    for line in registry.describe():
+        print(line)
+    for name in args.names:
+        try:
+            key, card = registry.resolve(name)
+            print(f"{name} -> {key}")
+        except UnknownCardError as e:
+            print(e)
+
+
+if __name__ == "__main__":
+    main()
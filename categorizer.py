@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Assign categories to transactions the statement left uncategorized.
+
+Everything runs locally. A merchant's category is decided once, in order:
+
+1. the user's history: the category AMEX (or the user, by editing
+   category_history.json) gave this merchant before,
+2. the merchant table in category_rules.json,
+3. the keyword table in category_rules.json, matched as whole words with
+   the same Aho-Corasick matcher the merchant normalizer uses.
+
+Decisions are cached per merchant, so repeat merchants cost one dict lookup.
+Payments and credits (negative amounts) are left alone.
+"""
+import json
+import os
+
+from merchant_normalizer import MerchantNormalizer
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'category_rules.json')
+DEFAULT_HISTORY_PATH = os.path.expanduser("~/Downloads/AmexStatements/category_history.json")
+
+UNCATEGORIZED = 'Uncategorized'
+
+
+def split_category(category):
+    """"Main-Sub" -> (main, sub), matching how statement_reader splits Category."""
+    main_category, _, sub_category = category.partition('-')
+    return main_category or UNCATEGORIZED, sub_category or UNCATEGORIZED
+
+
+class Categorizer:
+    """Merchant -> "Main-Sub" category lookup built from history and rules."""
+
+    def __init__(self, rules_path=DEFAULT_RULES_PATH, history_path=DEFAULT_HISTORY_PATH):
+        """
+        Args:
+            rules_path (str): JSON file with "merchants" and "keywords" tables
+            history_path (str): JSON file of learned {merchant: category};
+                None keeps the history in memory only
+        """
+        with open(rules_path) as f:
+            rules = json.load(f)
+        self.merchant_rules = rules.get('merchants', {})
+        self.keywords = MerchantNormalizer(rules.get('keywords', {}), whole_words=True)
+
+        self.history_path = history_path
+        self.history = {}
+        if history_path and os.path.exists(history_path):
+            with open(history_path) as f:
+                self.history = json.load(f)
+        self._changed = False
+        self._decisions = {}
+        # Date of the charge each merchant's category was learned from in this run
+        self._learned_dates = {}
+
+    def decide(self, merchant):
+        """Return the "Main-Sub" category for a merchant, or None if nothing matches."""
+        try:
+            return self._decisions[merchant]
+        except KeyError:
+            pass
+        category = None
+        if merchant:
+            category = (self.history.get(merchant)
+                        or self.merchant_rules.get(merchant)
+                        or self.keywords.match(merchant.upper()))
+        self._decisions[merchant] = category
+        return category
+
+    def learn(self, merchant, category):
+        """Remember the category a statement gave a merchant."""
+        if merchant and category and self.history.get(merchant) != category:
+            self.history[merchant] = category
+            self._decisions.pop(merchant, None)
+            self._changed = True
+
+    def save(self):
+        """Write the history file if anything new was learned."""
+        if not (self.history_path and self._changed):
+            return
+        directory = os.path.dirname(self.history_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.history_path, 'w') as f:
+            json.dump(self.history, f, indent=2, sort_keys=True)
+        self._changed = False
+
+    def categorize_transactions(self, transactions, normalizer):
+        """
+        Fill in uncategorized statement_reader.Transaction records in place.
+
+        Returns:
+            int: Number of transactions that were given a category
+        """
+        rows = [(normalizer.normalize(t.description), t) for t in transactions]
+        # Learn from each merchant's newest charge; exports list newest rows
+        # first, and later batches or files may hold older charges
+        newest = {}
+        for merchant, t in rows:
+            if t.category and merchant and (merchant not in newest or t.date > newest[merchant].date):
+                newest[merchant] = t
+        for merchant, t in newest.items():
+            if t.date >= self._learned_dates.get(merchant, t.date):
+                self._learned_dates[merchant] = t.date
+                self.learn(merchant, t.category)
+
+        assigned = 0
+        for merchant, t in rows:
+            if t.category or t.amount_cents <= 0:
+                continue
+            category = self.decide(merchant)
+            if category:
+                t.category = category
+                t.main_category, t.sub_category = split_category(category)
+                assigned += 1
+        return assigned
+
+    def categorize_frame(self, df):
+        """
+        Fill in uncategorized rows of a frame that has a Merchant column.
+
+        Learning and deciding happen once per distinct merchant; the results
+        are then broadcast to every row with vectorized lookups.
+
+        Returns:
+            tuple: (DataFrame, number of rows that were given a category)
+        """
+        import pandas as pd
+
+        categorized = df['Category'].notna()
+        known = df.loc[categorized, ['Date', 'Merchant', 'Category']]
+        # The most recent charge's category wins for each merchant; exports
+        # list newest rows first, so order by date rather than by row
+        known = known.sort_values('Date', kind='stable').drop_duplicates('Merchant', keep='last')
+        for merchant, category in known[['Merchant', 'Category']].astype(object).itertuples(index=False):
+            self.learn(merchant, category)
+
+        todo = ~categorized & (df['Amount_Cents'] > 0) & df['Merchant'].notna()
+        merchants = pd.unique(df.loc[todo, 'Merchant'].astype(object))
+        decisions = {merchant: self.decide(merchant) for merchant in merchants}
+        categories = df.loc[todo, 'Merchant'].astype(object).map(decisions)
+        categories = categories[categories.notna()]
+        if categories.empty:
+            return df, 0
+
+        parts = categories.str.split('-', n=1, expand=True).reindex(columns=[0, 1])
+        df = df.copy()
+        for column, values in (('Category', categories),
+                               ('Main_Category', parts[0].fillna(UNCATEGORIZED)),
+                               ('Sub_Category', parts[1].fillna(UNCATEGORIZED))):
+            was_categorical = isinstance(df[column].dtype, pd.CategoricalDtype)
+            df[column] = df[column].astype(object)
+            df.loc[values.index, column] = values
+            if was_categorical:
+                df[column] = df[column].astype('category')
+        return df, len(categories)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the category chosen for merchants")
+    parser.add_argument("merchants", nargs="+", help="Merchant names or raw descriptions")
+    parser.add_argument("--rules", default=DEFAULT_RULES_PATH, help="Category rules JSON file")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH, help="Learned category history file")
+    args = parser.parse_args()
+
+    categorizer = Categorizer(args.rules, args.history)
+    normalizer = MerchantNormalizer()
+    for name in args.merchants:
+        merchant = normalizer.normalize(name)
+        print(f"{name} -> {merchant} -> {categorizer.decide(merchant) or UNCATEGORIZED}")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Headless bar-chart rendering for the spending reports.
+
+matplotlib is only imported inside the worker that draws a chart, and
+always with the Agg backend, so importing this module is cheap and works
+without a display. Each chart's input is hashed; when the hash matches the
+one recorded for the existing PNG the chart is not redrawn. Charts that do
+need drawing are rendered in parallel worker processes.
+"""
+import hashlib
+import json
+import os
+
+# Bump when the drawing code changes so cached PNGs are regenerated
+CHART_VERSION = 1
+
+CACHE_FILENAME = '.chart_cache.json'
+
+
+def bar_chart_spec(filename, labels, values, title, ylabel='Amount ($)', color='skyblue',
+                   horizontal=False, value_suffix=None):
+    """
+    Describe one bar chart; the spec is plain data so it can be hashed and pickled.
+
+    Horizontal charts put `ylabel` on the value axis and, with `value_suffix`,
+    write each value (e.g. "120 pts") at the end of its bar.
+    """
+    spec = {
+        'filename': filename,
+        'labels': [str(label) for label in labels],
+        'values': [round(float(value), 2) for value in values],
+        'title': title,
+        'ylabel': ylabel,
+        'color': color,
+    }
+    # Only non-default options enter the spec, so existing chart hashes stay valid
+    if horizontal:
+        spec['horizontal'] = True
+    if value_suffix:
+        spec['value_suffix'] = value_suffix
+    return spec
+
+
+def breakdown_chart_specs(report):
+    """Country and category spending charts for a report_engine.build_report() result."""
+    return [
+        bar_chart_spec('country_spending.png', report['country']['Country'],
+                       report['country']['Total_Amount'], 'Spending by Country', color='skyblue'),
+        bar_chart_spec('category_spending.png', report['category']['Category'],
+                       report['category']['Total_Amount'], 'Spending by Category', color='lightgreen'),
+    ]
+
+
+def spec_hash(spec):
+    """Content hash of everything that affects the rendered image."""
+    payload = json.dumps({'version': CHART_VERSION, 'spec': spec}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def render_bar_chart(spec, path):
+    """Draw one bar chart to `path` using the Agg backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    # A bare Figure is never registered with pyplot, so nothing accumulates
+    # between charts and the figure is released as soon as we return
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    try:
+        axes = figure.add_subplot()
+        if spec.get('horizontal'):
+            bars = axes.barh(spec['labels'], spec['values'], color=spec['color'])
+            axes.set_xlabel(spec['ylabel'])
+            if spec.get('value_suffix'):
+                axes.bar_label(bars, labels=[f"{value:,.0f} {spec['value_suffix']}" for value in spec['values']],
+                               padding=2, fontweight='bold')
+        else:
+            axes.bar(spec['labels'], spec['values'], color=spec['color'])
+            axes.set_ylabel(spec['ylabel'])
+            axes.tick_params(axis='x', labelrotation=45)
+            for label in axes.get_xticklabels():
+                label.set_horizontalalignment('right')
+        axes.set_title(spec['title'])
+        figure.tight_layout()
+        figure.savefig(path)
+    finally:
+        figure.clear()
+    return path
+
+
+def _load_cache(output_dir):
+    try:
+        with open(os.path.join(output_dir, CACHE_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(output_dir, cache):
+    with open(os.path.join(output_dir, CACHE_FILENAME), 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+def render_charts(specs, output_dir, parallel=True, max_workers=None):
+    """
+    Render the charts whose input changed since the last run.
+
+    Args:
+        specs (list): Chart specs from bar_chart_spec()
+        output_dir (str): Folder to write the PNGs into
+        parallel (bool): Draw independent charts in separate processes
+        max_workers (int): Process pool size (default: one per chart, capped by CPU count)
+
+    Returns:
+        tuple: (list of rendered paths, list of paths skipped as unchanged)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache = _load_cache(output_dir)
+
+    pending = []
+    skipped = []
+    for spec in specs:
+        path = os.path.join(output_dir, spec['filename'])
+        digest = spec_hash(spec)
+        if cache.get(spec['filename']) == digest and os.path.exists(path):
+            skipped.append(path)
+        else:
+            pending.append((spec, path, digest))
+
+    if parallel and len(pending) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = max_workers or min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_bar_chart, spec, path) for spec, path, _ in pending]
+            rendered = [future.result() for future in futures]
+    else:
+        rendered = [render_bar_chart(spec, path) for spec, path, _ in pending]
+
+    if pending:
+        for spec, _, digest in pending:
+            cache[spec['filename']] = digest
+        _save_cache(output_dir, cache)
+
+    return rendered, skipped
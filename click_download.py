@@ -2,61 +2,248 @@
 """
 Focused script to click the Download button in the AMEX dialog.
 This script assumes a browser is already open at the download dialog.
+
+It attaches to that browser when it was started with remote debugging
+(e.g. `chrome --remote-debugging-port=9222`) and works on the tab that
+shows the dialog; otherwise it opens a persistent profile or a fresh browser.
 """
 from playwright.sync_api import sync_playwright
+import argparse
 import time
 import os
 import sys
 
-def click_download_button():
+from download_watcher import DownloadWatcher, START_TIMEOUT
+
+DOWNLOAD_DIR = os.path.expanduser("~/Downloads/AmexStatements")
+ACTIVITY_URL = "https://www.americanexpress.com/en-us/account/activity"
+DEFAULT_CDP_URL = "http://localhost:9222"
+DIALOG_SELECTOR = "[role='dialog']"
+
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--disable-site-isolation-trials'
+]
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36'
+
+# Distance in CSS pixels between hit-test sample points, and targets tried
+HIT_TEST_STEP = 8
+MAX_HIT_TARGETS = 3
+
+# Samples document.elementFromPoint over a region and returns every distinct
+# clickable element found, best Download-button candidate first
+HIT_TEST_JS = """
+({left, top, width, height, step}) => {
+    const CLICKABLE = 'button, a[href], input[type=button], input[type=submit], [role=button], [role=link], [onclick]';
+    const hasPointer = el => getComputedStyle(el).cursor === 'pointer';
+    // Nearest semantic control, else the outermost element of a cursor:pointer run
+    const clickableFor = el => {
+        const control = el.closest(CLICKABLE);
+        if (control || !hasPointer(el)) return control;
+        while (el.parentElement && el.parentElement !== document.body && hasPointer(el.parentElement)) {
+            el = el.parentElement;
+        }
+        return el;
+    };
+
+    const found = new Set();
+    for (let y = top + step / 2; y < top + height; y += step) {
+        for (let x = left + step / 2; x < left + width; x += step) {
+            const el = document.elementFromPoint(x, y);
+            const target = el && clickableFor(el);
+            if (target) found.add(target);
+        }
+    }
+
+    return Array.from(found, el => {
+        const rect = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        const label = (el.getAttribute('aria-label') || el.innerText || el.value || '').trim().slice(0, 80);
+        const role = el.getAttribute('role') || el.tagName.toLowerCase();
+        const [r, g, b, a = 1] = (style.backgroundColor.match(/[\d.]+/g) || []).map(Number);
+        const blue = a > 0 && b > 150 && b > r + 60 && b >= g;
+
+        let score = 0;
+        if (/download/i.test(label)) score += 4;
+        if (/cancel|close|back/i.test(label)) score -= 4;
+        if (role === 'button' || el.type === 'submit') score += 2;
+        if (blue) score += 3;
+        if (el.disabled || el.getAttribute('aria-disabled') === 'true') score -= 5;
+        return {x: rect.left + rect.width / 2, y: rect.top + rect.height / 2,
+                label, role, background: style.backgroundColor, score};
+    }).sort((first, second) => second.score - first.score);
+}
+"""
+
+
+def arm_download(downloads, watcher):
+    """
+    Take the baseline right before a click, so nothing the click starts is missed.
+
+    Returns:
+        int: Number of Playwright download events seen so far
+    """
+    watcher.reset()
+    return len(downloads)
+
+
+def wait_for_download(page, downloads, watcher, armed, timeout=START_TIMEOUT):
+    """
+    Wait until a click starts a download, either as a Playwright download
+    event or as a new file in the download directories.
+
+    Args:
+        armed (int): arm_download() result from before the click; only
+                     events after it count
+
+    Returns:
+        The Playwright Download, the path of the new file, or None
+    """
+    def tick():
+        # Playwright only dispatches events while one of its calls is running
+        page.wait_for_timeout(20)
+        return downloads[-1] if len(downloads) > armed else None
+
+    return watcher.wait_for_start(timeout, tick=tick)
+
+
+def find_click_targets(page, region=None, step=HIT_TEST_STEP):
+    """
+    Hit-test the page in one evaluate call instead of clicking blindly.
+
+    Args:
+        page: Playwright page
+        region (dict): Bounding box (x, y, width, height) to sample; the whole viewport by default
+        step (int): Distance between sample points in CSS pixels
+
+    Returns:
+        list: Dicts with x, y (element center), label, role, background and
+              score, best candidate first
+    """
+    if region is None:
+        viewport = page.viewport_size or page.evaluate("({width: window.innerWidth, height: window.innerHeight})")
+        region = {'x': 0, 'y': 0, **viewport}
+    return page.evaluate(HIT_TEST_JS, {'left': region['x'], 'top': region['y'], 'width': region['width'],
+                                       'height': region['height'], 'step': step})
+
+
+def finish_download(started):
+    """Save a Playwright download into DOWNLOAD_DIR and report where it went."""
+    if isinstance(started, str):
+        print(f"Download started: {started}")
+        return
+    path = os.path.join(DOWNLOAD_DIR, started.suggested_filename)
+    started.save_as(path)
+    print(f"Download saved to {path}")
+
+def open_browser(p, cdp_url=None, user_data_dir=None):
+    """
+    Attach to a running browser, or start one.
+
+    Args:
+        p: Playwright instance
+        cdp_url (str): DevTools endpoint of a running Chromium to attach to
+        user_data_dir (str): Profile directory to launch with when not attaching
+
+    Returns:
+        tuple: (browser contexts, object to close at the end or None when
+               the browser belongs to the user)
+    """
+    if cdp_url:
+        try:
+            browser = p.chromium.connect_over_cdp(cdp_url)
+            print(f"Attached to the running browser at {cdp_url}")
+            return browser.contexts, None
+        except Exception as e:
+            print(f"Could not attach to {cdp_url} ({e}); starting a browser instead")
+
+    if user_data_dir:
+        context = p.chromium.launch_persistent_context(
+            os.path.expanduser(user_data_dir), headless=False, args=LAUNCH_ARGS,
+            viewport={'width': 1920, 'height': 1080}, user_agent=USER_AGENT, accept_downloads=True
+        )
+        print(f"Started a browser with the profile in {user_data_dir}")
+        return [context], context
+
+    browser = p.chromium.launch(headless=False, args=LAUNCH_ARGS)
+    context = browser.new_context(viewport={'width': 1920, 'height': 1080}, user_agent=USER_AGENT)
+    return [context], browser
+
+
+def find_dialog_page(contexts):
+    """
+    Pick the tab to work on.
+
+    Returns:
+        tuple: (page showing the download dialog, True), else (first AMEX
+               page or None, False)
+    """
+    pages = [page for context in contexts for page in context.pages]
+    for page in pages:
+        try:
+            dialog = page.query_selector(DIALOG_SELECTOR)
+            if dialog and dialog.is_visible():
+                return page, True
+        except Exception:
+            # Tabs that are closing or navigating cannot be inspected
+            continue
+    amex_pages = [page for page in pages if 'americanexpress.com' in page.url]
+    return (amex_pages[0] if amex_pages else None), False
+
+
+def click_download_button(cdp_url=DEFAULT_CDP_URL, user_data_dir=None):
     """Try multiple approaches to click the Download button in the dialog."""
     screenshots_dir = os.path.join(os.path.dirname(__file__), 'screenshots')
     os.makedirs(screenshots_dir, exist_ok=True)
     
     with sync_playwright() as p:
-        # Use a new context with a view of the existing page
-        browser = p.chromium.launch(
-            headless=False,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-features=IsolateOrigins,site-per-process',
-                '--disable-site-isolation-trials'
-            ]
-        )
-        
-        context = browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36'
-        )
+        contexts, owner = open_browser(p, cdp_url, user_data_dir)
+        page, has_dialog = find_dialog_page(contexts)
+        if page is None:
+            page = contexts[0].new_page()
+        else:
+            print(f"Using tab: {page.url}")
+            page.bring_to_front()
         
-        page = context.new_page()
+        downloads = []
+        page.on("download", downloads.append)
+        # Files the browser writes outside Playwright (e.g. a manual click) are seen here
+        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        watcher = DownloadWatcher()
         
         try:
-            # Go directly to American Express activity page
-            page.goto("https://www.americanexpress.com/en-us/account/activity", wait_until='networkidle')
-            time.sleep(5)
-            
-            # Take a screenshot of where we are
-            page.screenshot(path=os.path.join(screenshots_dir, "activity_page_start.png"))
-            
-            print("1. FIRST, please navigate to your search results manually.")
-            print("2. Click the first 'Download' button to open the dialog box.")
-            print("3. When the dialog box is open, type 'ready' below:")
-            
-            ready = input("Type 'ready' when the dialog is showing: ")
-            if ready.lower() != 'ready':
-                print("Please type 'ready' when the dialog is showing.")
-                return
+            if not has_dialog:
+                if 'americanexpress.com' not in page.url:
+                    # Go directly to American Express activity page
+                    page.goto(ACTIVITY_URL, wait_until='networkidle')
+                    time.sleep(5)
+                
+                # Take a screenshot of where we are
+                page.screenshot(path=os.path.join(screenshots_dir, "activity_page_start.png"))
+                
+                print("1. FIRST, please navigate to your search results manually.")
+                print("2. Click the first 'Download' button to open the dialog box.")
+                print("3. When the dialog box is open, type 'ready' below:")
+                
+                ready = input("Type 'ready' when the dialog is showing: ")
+                if ready.lower() != 'ready':
+                    print("Please type 'ready' when the dialog is showing.")
+                    return
+            else:
+                print("Download dialog is already open")
             
             # Take a screenshot of the dialog
             page.screenshot(path=os.path.join(screenshots_dir, "dialog_before_click.png"))
             
             print("\nTrying multiple approaches to click the Download button...")
+            print("Each approach stops as soon as a download starts.")
             
             # APPROACH 1: JavaScript click on the blue button
             print("\nApproach 1: Using JavaScript to find and click the blue Download button")
             try:
                 # This JavaScript finds and clicks the blue Download button based on text content and background color
+                armed = arm_download(downloads, watcher)
                 result = page.evaluate("""
                     (() => {
                         // Get all elements with text 'Download'
@@ -116,8 +303,12 @@ def click_download_button():
                 
                 print(f"JavaScript approach result: {result}")
                 if result:
-                    print("JavaScript click seems to have worked")
-                    time.sleep(5)
+                    started = wait_for_download(page, downloads, watcher, armed)
+                    if started:
+                        print("JavaScript click worked")
+                        finish_download(started)
+                        return
+                    print("JavaScript click did not start a download")
             except Exception as e:
                 print(f"JavaScript approach failed: {e}")
             
@@ -145,9 +336,13 @@ def click_download_button():
                     
                     if elements:
                         # Click the last element (usually the primary action)
+                        armed = arm_download(downloads, watcher)
                         elements[-1].click()
                         print(f"Clicked element using selector: {selector}")
-                        time.sleep(5)
+                        started = wait_for_download(page, downloads, watcher, armed)
+                        if started:
+                            finish_download(started)
+                            return
                         # Take a screenshot after click
                         page.screenshot(path=os.path.join(screenshots_dir, f"after_click_{selector.replace(':', '_').replace('[', '').replace(']', '')}.png"))
                 except Exception as e:
@@ -169,8 +364,12 @@ def click_download_button():
                         bottom_right_y = box['y'] + box['height'] - 30  # 30px from bottom edge
                         
                         print(f"Clicking at bottom right: ({bottom_right_x}, {bottom_right_y})")
+                        armed = arm_download(downloads, watcher)
                         page.mouse.click(bottom_right_x, bottom_right_y)
-                        time.sleep(5)
+                        started = wait_for_download(page, downloads, watcher, armed)
+                        if started:
+                            finish_download(started)
+                            return
                         
                         # Take screenshot after click
                         page.screenshot(path=os.path.join(screenshots_dir, "after_bottom_right_click.png"))
@@ -179,54 +378,38 @@ def click_download_button():
             except Exception as e:
                 print(f"Error with coordinate approach: {e}")
             
-            # APPROACH 4: Grid of clicks across the bottom of the screen
-            print("\nApproach 4: Grid of clicks across bottom of screen")
-            
-            # Create a grid of points along the bottom of the viewport where action buttons often are
-            width = page.viewport_size['width']
-            height = page.viewport_size['height']
-            
-            # Focus on the bottom right quadrant
-            start_x = width // 2
-            end_x = width - 50
-            start_y = height - 200
-            end_y = height - 50
-            
-            grid_points = []
-            for x in range(start_x, end_x, 100):  # Every 100 pixels horizontally
-                for y in range(start_y, end_y, 50):  # Every 50 pixels vertically
-                    grid_points.append((x, y))
-            
-            # Add specific points where the Download button is likely to be
-            # These are the most likely positions based on common dialog layouts
-            grid_points = [
-                (800, 564),  # Common position based on screenshot
-                (750, 564),  # Slightly to the left
-                (850, 564),  # Slightly to the right
-                (800, 540),  # Slightly higher
-                (800, 590),  # Slightly lower
-            ] + grid_points
-            
-            for i, (x, y) in enumerate(grid_points):
-                try:
-                    print(f"Clicking at grid point {i+1}/{len(grid_points)}: ({x}, {y})")
+            # APPROACH 4: Hit-test the dialog and click the best clickable elements
+            print("\nApproach 4: Hit-testing the dialog for clickable elements")
+            try:
+                dialog_box = page.query_selector("[role='dialog']")
+                region = dialog_box.bounding_box() if dialog_box else None
+                targets = [t for t in find_click_targets(page, region) if t['score'] > 0]
+                print(f"Found {len(targets)} likely targets")
+                
+                for i, target in enumerate(targets[:MAX_HIT_TARGETS]):
+                    x, y = target['x'], target['y']
+                    print(f"Clicking target {i+1}: '{target['label']}' ({target['role']}, "
+                          f"{target['background']}, score {target['score']}) at ({x:.0f}, {y:.0f})")
+                    armed = arm_download(downloads, watcher)
                     page.mouse.click(x, y)
-                    time.sleep(3)
-                    
-                    # Take screenshot after every 5 clicks
-                    if (i + 1) % 5 == 0:
-                        page.screenshot(path=os.path.join(screenshots_dir, f"after_grid_clicks_{i+1}.png"))
-                except Exception as e:
-                    print(f"Error clicking at ({x}, {y}): {e}")
+                    started = wait_for_download(page, downloads, watcher, armed)
+                    if started:
+                        finish_download(started)
+                        return
+                
+                page.screenshot(path=os.path.join(screenshots_dir, "after_hit_test_clicks.png"))
+            except Exception as e:
+                print(f"Error with hit-test approach: {e}")
             
-            print("\nAll approaches tried. Please check if the download started.")
+            print("\nAll approaches tried and no download started.")
             print("Look in the following locations for downloaded files:")
             print("1. ~/Downloads/AmexStatements/Platinum_Card/")
             print("2. ~/Downloads/ (for any recent Excel files)")
             
             # Keep browser open
             print("\nBrowser will remain open so you can manually complete the download.")
-            input("Press Enter when you're done to close the browser...")
+            if owner:
+                input("Press Enter when you're done to close the browser...")
             
         except Exception as e:
             print(f"Error: {e}")
@@ -234,7 +417,19 @@ def click_download_button():
             page.screenshot(path=os.path.join(screenshots_dir, "click_download_error.png"))
         
         finally:
-            browser.close()
+            watcher.close()
+            # An attached browser is the user's own and stays open
+            if owner:
+                owner.close()
 
 if __name__ == "__main__":
-    click_download_button()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Click the Download button in an open AMEX download dialog')
+    parser.add_argument('--cdp-url', default=DEFAULT_CDP_URL,
+                        help='DevTools endpoint of a running Chrome/Chromium to attach to (default: %(default)s)')
+    parser.add_argument('--user-data-dir',
+                        help='Browser profile to launch with when no running browser can be attached '
+                             '(the profile must not be open in another browser)')
+    parser.add_argument('--launch', action='store_true', help='Always start a new browser instead of attaching')
+    args = parser.parse_args()
+    
+    click_download_button(None if args.launch else args.cdp_url, args.user_data_dir)
\ No newline at end of file
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Cross-statement duplicate detection.
+
+Custom-date-range exports and monthly statements overlap, so the same charge
+can appear in several downloaded files. Every transaction gets a key: its
+Reference when the export has one, and always a composite of date, amount
+and normalized description (numbered per occurrence so two identical
+charges on the same day in one file both survive). A transaction is a
+duplicate when one of its keys was already recorded from a *different*
+file. Keys live in an indexed SQLite table, so checking a new file costs
+one lookup per new row no matter how much history has been indexed.
+"""
+import re
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dedup_keys (
+    key TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    from_reference INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_description(description):
+    """Uppercase and collapse whitespace so formatting differences don't hide duplicates."""
+    return _WHITESPACE.sub(' ', (description or '').upper()).strip()
+
+
+class DedupIndex:
+    """Persistent set of transaction keys, each remembering the file it came from."""
+
+    def __init__(self, conn):
+        """
+        Args:
+            conn (sqlite3.Connection): Where the keys are kept; pass the
+                transaction store to persist them, or sqlite3.connect(':memory:')
+                to dedupe only within one run
+        """
+        self.conn = conn
+        self.conn.executescript(SCHEMA)
+
+    @classmethod
+    def in_memory(cls):
+        return cls(sqlite3.connect(':memory:'))
+
+    def _lookup(self, key):
+        """Return (source, from_reference) for an indexed key, or None."""
+        return self.conn.execute("SELECT source, from_reference FROM dedup_keys WHERE key = ?", (key,)).fetchone()
+
+    def _keys(self, date, cents, description, reference, occurrences):
+        composite = f"{date}|{cents}|{normalize_description(description)}"
+        occurrence = occurrences.get(composite, 0)
+        occurrences[composite] = occurrence + 1
+        composite_key = f"key:{composite}#{occurrence}"
+        reference_key = f"ref:{reference}" if reference else None
+        return reference_key, composite_key
+
+    def _is_duplicate(self, reference_key, composite_key, source):
+        if reference_key:
+            seen = self._lookup(reference_key)
+            if seen:
+                return seen[0] != source
+        seen = self._lookup(composite_key)
+        if not seen or seen[0] == source:
+            return False
+        # Two referenced rows with different References are different charges
+        return not (reference_key and seen[1])
+
+    def filter_records(self, records, source, occurrences=None, update_referenced=False):
+        """
+        Drop records already indexed from another file and index the rest.
+
+        Args:
+            records (iterable): (date, cents, description, reference, item) tuples
+            source (str): Identifier of the file the records came from
+            occurrences (dict): Per-file occurrence counter; pass the same dict
+                for every batch of one file so numbering continues across batches
+            update_referenced (bool): Keep rows whose Reference is already
+                indexed, for stores that upsert by Reference so a newer
+                export can correct the stored row
+
+        New keys are written on the index connection but not committed, so
+        a store can commit them in the same transaction as the rows.
+
+        Returns:
+            tuple: (list of kept items, number of duplicates found); with
+                   update_referenced the count includes the referenced
+                   duplicates that were kept for the upsert
+        """
+        kept = []
+        new_keys = []
+        duplicates = 0
+        if occurrences is None:
+            occurrences = {}
+        for date, cents, description, reference, item in records:
+            reference_key, composite_key = self._keys(date, cents, description, reference, occurrences)
+            if self._is_duplicate(reference_key, composite_key, source):
+                duplicates += 1
+                if not (update_referenced and reference_key and self._lookup(reference_key)):
+                    continue
+            kept.append(item)
+            if reference_key:
+                new_keys.append((reference_key, source, 1))
+            new_keys.append((composite_key, source, 1 if reference_key else 0))
+
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO dedup_keys (key, source, from_reference) VALUES (?, ?, ?)", new_keys
+        )
+        return kept, duplicates
+
+    def filter_transactions(self, transactions, source, occurrences=None, update_referenced=False):
+        """filter_records() for statement_reader.Transaction objects."""
+        return self.filter_records(
+            ((t.date.isoformat(), t.amount_cents, t.description, t.reference, t) for t in transactions),
+            source,
+            occurrences,
+            update_referenced,
+        )
+
+    def filter_frame(self, df, source):
+        """
+        filter_records() for a load_normalized() DataFrame.
+
+        Returns:
+            tuple: (DataFrame without duplicates, number of duplicates dropped)
+        """
+        references = df['Reference'] if 'Reference' in df.columns else [None] * len(df)
+        records = zip(
+            df['Date'].dt.strftime('%Y-%m-%d'),
+            df['Amount_Cents'].tolist(),
+            df['Description'].astype(object).where(df['Description'].notna(), None),
+            (r if isinstance(r, str) and r else None for r in references),
+            range(len(df)),
+        )
+        kept, duplicates = self.filter_records(records, source)
+        return df.iloc[kept].reset_index(drop=True), duplicates
+
+    def forget_source(self, source):
+        """Remove every key recorded for `source` (e.g. before re-indexing a replaced file)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM dedup_keys WHERE source = ?", (source,))
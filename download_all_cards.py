@@ -8,6 +8,8 @@ import time
 import os
 from datetime import datetime
 
+from card_registry import CardRegistry, UnknownCardError, card_label
+
 # List of commonly used Amex card names
 DEFAULT_CARD_NAMES = [
     "American Express Gold Card", 
@@ -19,13 +21,15 @@ DEFAULT_CARD_NAMES = [
     "Business Gold Card"
 ]
 
-def download_for_card(card_name, wait_time=60):
+def download_for_card(card_name, wait_time=60, formats=None, full=False):
     """
     Run the downloader script for a specific card.
     
     Args:
         card_name (str): The name of the card to download statements for
         wait_time (int): Time to wait in seconds between card runs
+        formats (str): Comma-separated export formats, passed through as --formats
+        full (bool): Search the default range instead of from the last stored transaction
     """
     print(f"\n{'='*50}")
     print(f"Starting download for: {card_name}")
@@ -37,6 +41,10 @@ def download_for_card(card_name, wait_time=60):
     
     # Run the downloader script with the specified card
     cmd = ["python", "amex_gold_downloader_modified.py", "--card", card_name]
+    if formats:
+        cmd += ["--formats", formats]
+    if full:
+        cmd.append("--full")
     print(f"Running command: {' '.join(cmd)}")
     
     try:
@@ -65,11 +73,29 @@ def main():
     parser = argparse.ArgumentParser(description='Download statements for multiple Amex cards')
     parser.add_argument('--cards', nargs='+', help='List of card names to download statements for')
     parser.add_argument('--wait', type=int, default=60, help='Wait time in seconds between card downloads')
+    parser.add_argument('--formats', help='Comma-separated export formats per card, e.g. excel,qfx (default: csv)')
+    parser.add_argument('--full', action='store_true',
+                        help="Search each card's default range instead of starting from its last stored transaction")
     
     args = parser.parse_args()
     
-    # Use provided cards or default list
-    cards_to_process = args.cards if args.cards else DEFAULT_CARD_NAMES
+    # Use provided cards, the discovered cards, or the default list
+    registry = CardRegistry()
+    if args.cards and registry.cards:
+        # Check every name before the first login rather than one timeout per card
+        try:
+            for card in args.cards:
+                registry.resolve(card)
+        except UnknownCardError as e:
+            print(f"Error: {e}")
+            return
+    if args.cards:
+        cards_to_process = args.cards
+    elif registry.cards:
+        # Display names keep the per-card folders and file names of earlier runs
+        cards_to_process = [card_label(key, card) for key, card in sorted(registry.cards.items())]
+    else:
+        cards_to_process = DEFAULT_CARD_NAMES
     
     # Create logs directory if it doesn't exist
     log_dir = os.path.join(os.path.dirname(__file__), 'logs')
@@ -93,7 +119,7 @@ def main():
     # Process each card
     for i, card in enumerate(cards_to_process, 1):
         print(f"\nProcessing card {i}/{len(cards_to_process)}")
-        download_for_card(card, args.wait)
+        download_for_card(card, args.wait, args.formats, args.full)
     
     # Update log with completion
     with open(log_file, 'a') as f:
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+Drive the AMEX "Download your transactions" dialog by accessibility role.
+
+The format radio buttons, the "include additional transaction details"
+checkbox and the Download button are found with get_by_role() and their
+accessible names, so window size and layout do not matter. Playwright's
+auto-waiting replaces the fixed sleeps between steps, and the confirm click
+returns as soon as page.expect_download() sees the file.
+
+Several formats can be fetched in one session: after each download the
+same dialog is reopened from the page's Download button, without navigating
+or searching again.
+"""
+import argparse
+import datetime
+import os
+import re
+
+# Accessible names of the format options, by format key
+FORMAT_NAMES = {
+    'excel': re.compile(r'excel|xlsx', re.I),
+    'csv': re.compile(r'\bcsv\b', re.I),
+    'qfx': re.compile(r'quicken|qfx', re.I),
+    'qbo': re.compile(r'quickbooks|qbo', re.I),
+    'pdf': re.compile(r'\bpdf\b', re.I),
+}
+FORMAT_ALIASES = {'xlsx': 'excel', 'ofx': 'qfx', 'quicken': 'qfx', 'quickbooks': 'qbo'}
+DETAILS_NAME = re.compile(r'additional.*details', re.I)
+CONFIRM_NAME = re.compile(r'^\s*download\s*$', re.I)
+
+# File extensions of every export format, for spotting a finished download on disk
+EXPORT_EXTENSIONS = ('.csv', '.xlsx', '.xls', '.qfx', '.qbo', '.pdf')
+
+# Milliseconds to wait for the dialog, for each option, and for the download
+DIALOG_TIMEOUT = 10000
+OPTION_TIMEOUT = 3000
+DOWNLOAD_TIMEOUT = 30000
+CLOSE_TIMEOUT = 2000
+
+
+def parse_formats(text):
+    """
+    argparse type for --formats: a comma-separated list of FORMAT_NAMES keys or aliases.
+
+    Returns:
+        list: Format keys in the given order, without repeats
+    """
+    formats = []
+    for name in text.lower().replace(' ', '').split(','):
+        name = FORMAT_ALIASES.get(name, name)
+        if name not in FORMAT_NAMES:
+            raise argparse.ArgumentTypeError(
+                f"unknown format '{name}' (choose from {', '.join(list(FORMAT_NAMES) + list(FORMAT_ALIASES))})")
+        if name not in formats:
+            formats.append(name)
+    return formats
+
+
+def export_filename(suggested_filename, card_name=None, date=None):
+    """
+    Name a downloaded export "<base>_<card>_<YYYYMMDD>.<ext>".
+
+    The extension comes from the site's suggested name, so the formats of one
+    session differ only in it.
+    """
+    date = date or datetime.datetime.now().strftime("%Y%m%d")
+    card_identifier = card_name.replace(' ', '_').replace('/', '_').replace('\\', '_') if card_name else "AmexCard"
+    base_name, ext = os.path.splitext(suggested_filename)
+    return f"{base_name}_{card_identifier}_{date}{ext}"
+
+
+class DownloadDialog:
+    """The open download dialog of a Playwright page."""
+
+    def __init__(self, page, timeout=DIALOG_TIMEOUT):
+        self.page = page
+        self.timeout = timeout
+        # The dialog that holds a Download button; other dialogs (cookie banners) are ignored
+        self.dialog = page.get_by_role('dialog').filter(has=page.get_by_role('button', name=CONFIRM_NAME)).last
+
+    def wait(self):
+        """Block until the dialog is visible."""
+        self.dialog.wait_for(state='visible', timeout=self.timeout)
+        return self
+
+    def reopen(self):
+        """Open the dialog again from the page's Download button if the last download closed it."""
+        try:
+            self.dialog.wait_for(state='hidden', timeout=CLOSE_TIMEOUT)
+        except Exception:
+            # Still open: keep using it
+            return self
+        self.page.get_by_role('button', name=CONFIRM_NAME).first.click(timeout=OPTION_TIMEOUT)
+        return self.wait()
+
+    def _choose(self, control, name, checked=True):
+        """Set a radio/checkbox, clicking its label when the input itself is hidden by styling."""
+        try:
+            control.set_checked(checked, timeout=OPTION_TIMEOUT)
+        except Exception:
+            if control.count() and control.is_checked() == checked:
+                return
+            self.dialog.get_by_text(name).first.click(timeout=OPTION_TIMEOUT)
+
+    def select_format(self, file_format):
+        """
+        Choose an export format.
+
+        Args:
+            file_format (str): A FORMAT_NAMES key (excel, csv, qfx, qbo, pdf)
+        """
+        name = FORMAT_NAMES[file_format]
+        self._choose(self.dialog.get_by_role('radio', name=name), name)
+
+    def set_details(self, include=True):
+        """Tick or clear "include additional transaction details"; False if the dialog has no such option."""
+        checkbox = self.dialog.get_by_role('checkbox', name=DETAILS_NAME)
+        if not checkbox.count():
+            return False
+        self._choose(checkbox, DETAILS_NAME, include)
+        return True
+
+    def confirm(self, timeout=DOWNLOAD_TIMEOUT):
+        """Click Download and return the Playwright Download once it starts."""
+        with self.page.expect_download(timeout=timeout) as download_info:
+            self.dialog.get_by_role('button', name=CONFIRM_NAME).click(timeout=OPTION_TIMEOUT)
+        return download_info.value
+
+    def download(self, file_format='csv', details=True, timeout=DOWNLOAD_TIMEOUT):
+        """
+        Set every option and confirm in one pass.
+
+        Args:
+            file_format (str): A FORMAT_NAMES key
+            details (bool): Include additional transaction details when offered
+            timeout (int): Milliseconds to wait for the download to start
+
+        Returns:
+            Download: The started Playwright download
+        """
+        self.wait()
+        self.select_format(file_format)
+        if details:
+            self.set_details(True)
+        return self.confirm(timeout)
+
+
+def download_from_dialog(page, file_format='csv', details=True, reopen=False):
+    """
+    Run the dialog driver and report the outcome instead of raising.
+
+    Args:
+        reopen (bool): Reopen the dialog first, for the second and later formats
+
+    Returns:
+        Download or None: None when the dialog could not be driven by role
+    """
+    try:
+        dialog = DownloadDialog(page)
+        if reopen:
+            dialog.reopen()
+        download = dialog.download(file_format, details)
+        print(f"Downloaded {file_format.upper()} via the dialog's accessible controls: {download.suggested_filename}")
+        return download
+    except Exception as e:
+        print(f"Could not drive the download dialog by role ({e}); falling back")
+        return None
+
+
+def download_formats(page, formats, details=True):
+    """
+    Fetch several formats back to back from the dialog that is already open.
+
+    Stops at once if the first format cannot be driven by role, so the
+    caller's fallbacks run without waiting on every format.
+
+    Returns:
+        list: The formats that were downloaded
+    """
+    fetched = []
+    for i, file_format in enumerate(formats):
+        if download_from_dialog(page, file_format, details, reopen=i > 0) is not None:
+            fetched.append(file_format)
+        elif i == 0:
+            break
+    return fetched
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+"""
+Notice new downloads the moment the browser starts writing them.
+
+The watcher records what already exists in ~/Downloads and the statement
+download directories, then reports entries that appear afterwards. On Linux
+it blocks on inotify (through ctypes, no extra package) and wakes within
+milliseconds of the browser creating a file; elsewhere it polls the
+directories every POLL_INTERVAL seconds.
+
+Browsers first write to a temporary name and rename it when the download is
+done: Chrome uses "Unconfirmed 123.crdownload" / "name.xlsx.crdownload",
+Firefox "name.xlsx.part" (next to an empty "name.xlsx" placeholder) and
+Safari a "name.xlsx.download" bundle. Any of those counts as a started
+download; it is complete once a real file with content exists and no
+temporary file of the session is left.
+"""
+import argparse
+import os
+import select
+import struct
+import time
+
+# Suffixes (and Chrome's prefix) of files that are still being downloaded
+PARTIAL_SUFFIXES = ('.crdownload', '.part', '.partial', '.download', '.tmp')
+PARTIAL_PREFIX = 'Unconfirmed '
+
+# Seconds between directory scans when inotify is not available
+POLL_INTERVAL = 0.05
+
+# Seconds to wait for a click to start a download, and for it to finish
+START_TIMEOUT = 5
+COMPLETE_TIMEOUT = 60
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def default_directories():
+    """~/Downloads, the statement download directory and its card folders."""
+    downloads = os.path.expanduser("~/Downloads")
+    statements = os.path.join(downloads, "AmexStatements")
+    directories = [downloads, statements]
+    if os.path.isdir(statements):
+        directories += sorted(entry.path for entry in os.scandir(statements) if entry.is_dir())
+    return [d for d in directories if os.path.isdir(d)]
+
+
+def is_partial(name):
+    """True for the temporary files browsers write while downloading."""
+    name = os.path.basename(name)
+    return name.lower().endswith(PARTIAL_SUFFIXES) or name.startswith(PARTIAL_PREFIX)
+
+
+def _inotify_open(directories):
+    """inotify descriptor watching `directories` plus {wd: directory}, or (None, {}) if unavailable."""
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None, {}
+    if fd < 0:
+        return None, {}
+    watches = {}
+    for directory in directories:
+        wd = libc.inotify_add_watch(fd, os.fsencode(directory), IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE)
+        if wd >= 0:
+            watches[wd] = directory
+    if not watches:
+        os.close(fd)
+        return None, {}
+    return fd, watches
+
+
+class DownloadWatcher:
+    """Report files that appear in the download directories after a baseline."""
+
+    def __init__(self, directories=None, use_inotify=True):
+        self.directories = [d for d in (directories or default_directories()) if os.path.isdir(d)]
+        self._fd, self._watches = _inotify_open(self.directories) if use_inotify else (None, {})
+        self.backend = 'inotify' if self._fd is not None else 'polling'
+        self._seen = {}
+        self._new = []
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def reset(self):
+        """Forget earlier downloads; only files appearing from now on are reported."""
+        self._collect(0)
+        self._seen = {d: set(os.listdir(d)) for d in self.directories}
+        self._new = []
+
+    def _add(self, directory, name):
+        seen = self._seen.setdefault(directory, set())
+        # Hidden files are browser scratch files (".org.chromium.*", ".DS_Store")
+        if name in seen or name.startswith('.'):
+            return
+        seen.add(name)
+        self._new.append(os.path.join(directory, name))
+
+    def _collect(self, timeout):
+        """Wait up to `timeout` seconds for directory changes and record new entries."""
+        if self._fd is None:
+            for directory in self.directories:
+                before = len(self._new)
+                for name in os.listdir(directory):
+                    self._add(directory, name)
+                if len(self._new) > before:
+                    timeout = 0
+            if timeout > 0:
+                time.sleep(min(timeout, POLL_INTERVAL))
+            return
+
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, _mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if wd in self._watches and name:
+                    self._add(self._watches[wd], os.fsdecode(name))
+
+    def started(self):
+        """Path of the first new file (partial or final), or None."""
+        return self._new[0] if self._new else None
+
+    def completed(self):
+        """Path of a finished download, or None while any temporary file is still there."""
+        if any(is_partial(path) and os.path.exists(path) for path in self._new):
+            return None
+        for path in self._new:
+            if not is_partial(path) and os.path.isfile(path) and os.path.getsize(path) > 0:
+                return path
+        return None
+
+    def _wait(self, check, timeout, tick):
+        deadline = time.monotonic() + timeout
+        while True:
+            found = check() or (tick() if tick else None)
+            remaining = deadline - time.monotonic()
+            if found or remaining <= 0:
+                return found
+            # With a tick the caller needs control back regularly
+            self._collect(min(remaining, POLL_INTERVAL) if tick else remaining)
+
+    def wait_for_start(self, timeout=START_TIMEOUT, tick=None):
+        """
+        Wait until a download starts.
+
+        Args:
+            timeout (float): Seconds to wait
+            tick (callable): Called between checks, e.g. to let Playwright
+                             dispatch events; a truthy return value counts as
+                             a started download and is returned
+
+        Returns:
+            str: Path of the new file (or tick's value), None on timeout
+        """
+        return self._wait(self.started, timeout, tick)
+
+    def wait_for_complete(self, timeout=COMPLETE_TIMEOUT, tick=None):
+        """Wait until a started download is finished; same arguments as wait_for_start()."""
+        return self._wait(self.completed, timeout, tick)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the next download in the download directories')
+    parser.add_argument('directories', nargs='*', help='Directories to watch (default: ~/Downloads and AmexStatements)')
+    parser.add_argument('--timeout', type=float, default=COMPLETE_TIMEOUT, help='Seconds to wait')
+    args = parser.parse_args()
+
+    with DownloadWatcher(args.directories or None) as watcher:
+        print(f"Watching {', '.join(watcher.directories)} ({watcher.backend})")
+        start = time.perf_counter()
+        path = watcher.wait_for_start(args.timeout)
+        if not path:
+            print("No download started")
+            return
+        print(f"Download started after {time.perf_counter() - start:.3f}s: {path}")
+        path = watcher.wait_for_complete(args.timeout)
+        print(f"Download finished: {path}" if path else "Download did not finish in time")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,166 @@ import pyautogui
 import time
 import os
 
+import numpy as np
+
+from button_locator import ButtonLocator
+from download_watcher import DownloadWatcher
+
+# Color range for the blue button (RGB)
+BLUE_MIN = np.array([0, 90, 180], dtype=np.uint8)
+BLUE_MAX = np.array([60, 140, 255], dtype=np.uint8)
+
+# Regions smaller than this (in screenshot pixels) are icons or text, not buttons
+MIN_BUTTON_AREA = 400
+
+# Buttons are wider than tall; this width/height ratio scores best
+BUTTON_ASPECT = 3.5
+
+
+def blue_mask(pixels):
+    """Boolean mask of blue pixels for an (H, W, 3+) uint8 screenshot array."""
+    mask = np.ones(pixels.shape[:2], dtype=bool)
+    for channel in range(3):
+        values = pixels[..., channel]
+        mask &= (values >= BLUE_MIN[channel]) & (values <= BLUE_MAX[channel])
+    return mask
+
+
+def blue_runs(pixels):
+    """
+    Horizontal runs of blue pixels as (row, start, end) arrays, end exclusive.
+
+    Light dialogs have few dark-red-channel pixels, so rows without any are
+    dropped with one cheap test before the full color check.
+    """
+    red = pixels[..., 0]
+    candidate_rows = np.flatnonzero(((red >= BLUE_MIN[0]) & (red <= BLUE_MAX[0])).any(axis=1))
+    if len(candidate_rows) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+
+    mask = blue_mask(pixels[candidate_rows])
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return candidate_rows[rows], starts, ends
+
+
+def label_runs(rows, starts, ends):
+    """
+    Group horizontal runs into 4-connected regions.
+
+    Runs on adjacent rows that overlap belong to the same region; only the
+    (few) blue runs are visited, never individual pixels.
+
+    Returns:
+        tuple: (region index for every run, number of regions)
+    """
+    parent = list(range(len(rows)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Runs come out sorted by row then start, so each row is a contiguous slice
+    present, first = np.unique(rows, return_index=True)
+    bounds = list(first) + [len(rows)]
+    for k in range(1, len(present)):
+        if present[k] != present[k - 1] + 1:
+            continue
+        # Both rows are sorted and non-overlapping: merge them like two sorted lists
+        i, j = bounds[k], bounds[k - 1]
+        while i < bounds[k + 1] and j < bounds[k]:
+            if starts[j] < ends[i] and starts[i] < ends[j]:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+            # The run that ends first cannot overlap anything further along the other row
+            if ends[i] <= ends[j]:
+                i += 1
+            else:
+                j += 1
+
+    roots = np.array([find(i) for i in range(len(rows))], dtype=np.int64)
+    _, regions = np.unique(roots, return_inverse=True)
+    return regions, int(regions.max() + 1) if len(rows) else 0
+
+
+def find_button_candidates(image, min_area=MIN_BUTTON_AREA):
+    """
+    Find blue, button-shaped regions in a screenshot.
+
+    Args:
+        image: PIL image or (H, W, 3+) uint8 array
+        min_area (int): Smallest region (in pixels) worth considering
+
+    Returns:
+        list: (x, y, area, width, height, score, left, top) tuples with
+              exact centroids and the bounding box's top-left corner, best
+              candidate first; score favours large, solid regions whose
+              aspect ratio is close to BUTTON_ASPECT
+    """
+    rows, starts, ends = blue_runs(np.asarray(image))
+    regions, count = label_runs(rows, starts, ends)
+    if count == 0:
+        return []
+
+    # Per-region area, centroid and bounding box from the runs alone
+    lengths = ends - starts
+    area = np.bincount(regions, weights=lengths, minlength=count)
+    # Sum of x over a run is length * (start + end - 1) / 2
+    sum_x = np.bincount(regions, weights=lengths * (starts + ends - 1) / 2, minlength=count)
+    sum_y = np.bincount(regions, weights=lengths * rows, minlength=count)
+    min_x = np.full(count, np.iinfo(np.int64).max)
+    max_x = np.zeros(count, dtype=np.int64)
+    min_y = np.full(count, np.iinfo(np.int64).max)
+    max_y = np.zeros(count, dtype=np.int64)
+    np.minimum.at(min_x, regions, starts)
+    np.maximum.at(max_x, regions, ends)
+    np.minimum.at(min_y, regions, rows)
+    np.maximum.at(max_y, regions, rows + 1)
+
+    candidates = []
+    for region in np.nonzero(area >= min_area)[0]:
+        width = int(max_x[region] - min_x[region])
+        height = int(max_y[region] - min_y[region])
+        fill = area[region] / (width * height)
+        # 1.0 at the ideal aspect ratio, falling off on a log scale
+        aspect_score = 1 / (1 + abs(np.log(width / height / BUTTON_ASPECT)))
+        score = float(area[region] * fill * aspect_score)
+        candidates.append((int(round(sum_x[region] / area[region])), int(round(sum_y[region] / area[region])),
+                           int(area[region]), width, height, score, int(min_x[region]), int(min_y[region])))
+
+    candidates.sort(key=lambda c: c[5], reverse=True)
+    return candidates
+
+
+def click_and_wait(watcher, x, y):
+    """
+    Click at (x, y) and wait for a new file in the download directories.
+
+    Returns:
+        bool: True if a download started
+    """
+    watcher.reset()
+    pyautogui.moveTo(x, y, duration=1)
+    pyautogui.click()
+    print(f"Clicked at ({x}, {y})")
+
+    path = watcher.wait_for_start()
+    if not path:
+        print("No download started")
+        return False
+    print(f"Great! Download started: {os.path.basename(path)}")
+    finished = watcher.wait_for_complete()
+    print(f"Saved to {finished}" if finished else "Download is still in progress")
+    return True
+
+
 def find_blue_button():
     # Create screenshots directory
     screenshots_dir = os.path.join(os.path.dirname(__file__), 'screenshots')
@@ -27,99 +187,74 @@ def find_blue_button():
     screen.save(screen_path)
     print(f"Screenshot saved to {screen_path}")
     
-    print("\nAnalyzing screenshot for blue buttons...")
+    # Notices the browser's .crdownload/.part file as soon as a click works
+    watcher = DownloadWatcher()
+    print(f"Watching {', '.join(watcher.directories)} for new downloads ({watcher.backend})")
     
-    # Define the color range for the blue button (RGB)
-    blue_min = (0, 90, 180)  # Minimum RGB values for blue
-    blue_max = (60, 140, 255)  # Maximum RGB values for blue
+    print("\nAnalyzing screenshot for blue buttons...")
     
     # Get screen dimensions
     width, height = screen.size
     
-    # Initialize variables to store blue areas
-    blue_areas = []
-    
-    # Scan the screen for blue pixels and identify blue areas
-    for y in range(0, height, 10):  # Skip every 10 pixels for speed
-        for x in range(0, width, 10):  # Skip every 10 pixels for speed
-            pixel = screen.getpixel((x, y))
-            
-            # Check if pixel is in the blue range
-            if (blue_min[0] <= pixel[0] <= blue_max[0] and
-                blue_min[1] <= pixel[1] <= blue_max[1] and
-                blue_min[2] <= pixel[2] <= blue_max[2]):
-                
-                # Found a blue pixel, check surrounding area
-                area_size = 0
-                for dy in range(max(0, y-20), min(height, y+20)):
-                    for dx in range(max(0, x-20), min(width, x+20)):
-                        try:
-                            p = screen.getpixel((dx, dy))
-                            if (blue_min[0] <= p[0] <= blue_max[0] and
-                                blue_min[1] <= p[1] <= blue_max[1] and
-                                blue_min[2] <= p[2] <= blue_max[2]):
-                                area_size += 1
-                        except:
-                            pass
-                
-                # If we found a substantial blue area, add it to our list
-                if area_size > 50:  # Arbitrary threshold
-                    blue_areas.append((x, y, area_size))
+    start = time.perf_counter()
+    candidates = find_button_candidates(screen)
+    print(f"Analysis took {(time.perf_counter() - start) * 1000:.0f} ms")
+    
+    # On HiDPI screens the screenshot has more pixels than pyautogui's coordinates
+    scale_x = width / pyautogui.size()[0]
+    scale_y = height / pyautogui.size()[1]
+    blue_areas = [(int(x / scale_x), int(y / scale_y), area, (left, top, w, h))
+                  for x, y, area, w, h, _, left, top in candidates]
     
     print(f"Found {len(blue_areas)} potential blue button areas")
     
+    # A stored template of the button beats color guessing; the spot is
+    # cached per resolution, so repeat runs only check one patch
+    locator = ButtonLocator()
+    screen_key = ButtonLocator.screen_key(width, height, scale_x)
+    dialog_region = (width * 0.15, height * 0.15, width * 0.7, height * 0.7)
+    located = locator.locate(screen, screen_key, dialog_region)
+    if located:
+        print(f"Template match at ({located[0]}, {located[1]}), score {located[2]:.2f}")
+        blue_areas.insert(0, (int(located[0] / scale_x), int(located[1] / scale_y), 0, None))
+    
     if blue_areas:
-        # Sort by area size (largest first)
-        blue_areas.sort(key=lambda a: a[2], reverse=True)
-        
+        # Already ranked by size, solidity and button-like shape
         print("\nTop 5 potential button locations:")
-        for i, (x, y, size) in enumerate(blue_areas[:5]):
+        for i, (x, y, size, _) in enumerate(blue_areas[:5]):
             print(f"{i+1}. Position: ({x}, {y}), Size: {size}")
         
-        print("\nWill attempt to click the buttons in order from largest to smallest.")
-        print("After each click, check if the download started.")
+        print("\nWill attempt to click the buttons in order from most to least button-like.")
+        print("Moving on to the next one whenever no download starts.")
         
-        for i, (x, y, size) in enumerate(blue_areas[:5]):
-            input(f"\nPress Enter to click potential button {i+1} at ({x}, {y})...")
-            
-            # Move to and click the position
-            pyautogui.moveTo(x, y, duration=1)
-            pyautogui.click()
-            
-            print(f"Clicked at ({x}, {y})")
-            
-            # Ask if the download started
-            result = input("Did the download start? (y/n): ")
-            if result.lower() == 'y':
-                print("Great! Download started successfully.")
+        for i, (x, y, size, box) in enumerate(blue_areas[:5]):
+            print(f"\nClicking potential button {i+1} at ({x}, {y})...")
+            if click_and_wait(watcher, x, y):
+                if box and locator.template is None:
+                    # Keep this button as the template for future runs
+                    locator.save_template(screen, box)
+                    print(f"Saved button template to {locator.template_path}")
                 return
+            if box is None:
+                # The template matched something that is not the button; let the next good click replace it
+                print("Template match did not start a download; dropping the template")
+                locator.discard_template()
     else:
         print("No blue areas found. Trying common button locations.")
     
-    # If no blue areas found or none worked, try common positions
+    # If no blue areas found or none worked, try positions relative to the screen
+    # (screenshot pixels, scaled to pyautogui's coordinates like the matches above)
     common_positions = [
-        (800, 564),  # Common position based on previous runs
-        (700, 564),  # Slightly to the left
-        (900, 564),  # Slightly to the right
-        (650, 450),  # Different area on screen
         (width//2, height//2 + 100),  # Below center of screen
+        (width * 2//3, height//2 + 100),  # Lower right of a centered dialog
         (width - 100, height - 100)  # Bottom right corner
     ]
+    common_positions = [(int(x / scale_x), int(y / scale_y)) for x, y in common_positions]
     
     print("\nTrying common button positions:")
     for i, (x, y) in enumerate(common_positions):
-        input(f"\nPress Enter to click common position {i+1} at ({x}, {y})...")
-        
-        # Move to and click the position
-        pyautogui.moveTo(x, y, duration=1)
-        pyautogui.click()
-        
-        print(f"Clicked at ({x}, {y})")
-        
-        # Ask if the download started
-        result = input("Did the download start? (y/n): ")
-        if result.lower() == 'y':
-            print("Great! Download started successfully.")
+        print(f"\nClicking common position {i+1} at ({x}, {y})...")
+        if click_and_wait(watcher, x, y):
             return
     
     print("\nCould not find the download button automatically.")
@@ -134,16 +269,7 @@ def find_blue_button():
         x = int(input("Enter X coordinate: "))
         y = int(input("Enter Y coordinate: "))
         
-        # Move to and click the position
-        pyautogui.moveTo(x, y, duration=1)
-        pyautogui.click()
-        
-        print(f"Clicked at ({x}, {y})")
-        
-        # Ask if the download started
-        result = input("Did the download start? (y/n): ")
-        if result.lower() == 'y':
-            print("Great! Download started successfully.")
+        if click_and_wait(watcher, x, y):
             return
     except:
         print("Invalid coordinates")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Map raw statement descriptions to canonical merchant names.
+
+Rules live in merchant_rules.json ({"Merchant": ["PATTERN", ...]}) and can
+be edited freely. All patterns are compiled into one Aho-Corasick automaton,
+so a description is matched against every rule in a single pass over its
+characters; the longest pattern that starts on a word boundary wins.
+Results are memoized, and normalize_series() only normalizes each distinct
+description once, so whole columns with millions of rows stay cheap.
+"""
+import json
+import os
+import re
+from functools import lru_cache
+
+from dedup_index import normalize_description
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'merchant_rules.json')
+
+# Distinct descriptions remembered per normalizer
+CACHE_SIZE = 65536
+
+# Store numbers, phone numbers and reference codes that vary between charges
+_NOISE_TOKENS = re.compile(r'(?:^|\s)(?:#\s?)?\S*\d{3,}\S*')
+_PROCESSOR_PREFIX = re.compile(r'^(?:SQ|TST|SP|PAYPAL|PY|DD|GOOGLE|IC)\s?\*\s?')
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """Read {merchant: [patterns]} from a JSON rules file."""
+    with open(path) as f:
+        rules = json.load(f)
+    if not isinstance(rules, dict):
+        raise ValueError(f"{path}: expected an object mapping merchant names to pattern lists")
+    return {merchant: [patterns] if isinstance(patterns, str) else list(patterns)
+            for merchant, patterns in rules.items()}
+
+
+class MerchantNormalizer:
+    """Aho-Corasick matcher over the merchant rules with a bounded memo cache."""
+
+    def __init__(self, rules=None, cache_size=CACHE_SIZE, whole_words=False):
+        """
+        Args:
+            rules (dict or str): {merchant: [patterns]}, or a rules file path
+                (default: merchant_rules.json next to this script)
+            cache_size (int): Distinct descriptions to memoize
+            whole_words (bool): Patterns must also end on a word boundary
+                (for short keywords such as "BAR" or "INN")
+        """
+        if rules is None or isinstance(rules, str):
+            rules = load_rules(rules or DEFAULT_RULES_PATH)
+        self.whole_words = whole_words
+        self._build(rules)
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _build(self, rules):
+        # goto[state] maps a character to the next state; outputs[state]
+        # lists (pattern length, merchant) for every pattern ending there
+        goto = [{}]
+        outputs = [[]]
+        for merchant, patterns in rules.items():
+            for pattern in patterns:
+                pattern = normalize_description(pattern)
+                if not pattern:
+                    continue
+                state = 0
+                for char in pattern:
+                    if char not in goto[state]:
+                        goto.append({})
+                        outputs.append([])
+                        goto[state][char] = len(goto) - 1
+                    state = goto[state][char]
+                outputs[state].append((len(pattern), merchant))
+
+        # Breadth-first pass to add failure links and inherit their outputs
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, child in goto[state].items():
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(char, 0)
+                outputs[child] = outputs[child] + outputs[fail[child]]
+                queue.append(child)
+
+        for state_outputs in outputs:
+            state_outputs.sort(key=lambda output: -output[0])
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+
+    def match(self, text):
+        """Return the merchant of the longest rule found in normalized `text`, or None."""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        best = None
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, merchant in outputs[state]:
+                start = end - length + 1
+                # Patterns must start a word so "TARGET" doesn't match "STARGET"
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if self.whole_words and end + 1 < len(text) and text[end + 1].isalnum():
+                    continue
+                if best is None or length > best[0]:
+                    best = (length, merchant)
+                break
+        return best[1] if best else None
+
+    def _normalize(self, description):
+        text = normalize_description(description)
+        if not text:
+            return None
+        merchant = self.match(text)
+        if merchant:
+            return merchant
+        # No rule: drop processor prefixes and varying numbers so the same
+        # shop at least groups with itself
+        cleaned = _NOISE_TOKENS.sub(' ', _PROCESSOR_PREFIX.sub('', text))
+        return ' '.join(cleaned.split()) or text
+
+    def normalize_series(self, series):
+        """
+        Normalize a whole pandas column, computing each distinct value once.
+
+        Returns:
+            pandas.Series: Categorical merchant names aligned with `series`
+        """
+        import numpy as np
+        import pandas as pd
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Categoricals already hold each distinct description once
+            codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=True)
+        merchants = np.array([self.normalize(value) for value in uniques] + [None], dtype=object)
+        # Code -1 (missing description) picks the trailing None
+        return pd.Series(pd.Categorical(merchants[codes]), index=series.index, name='Merchant')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the canonical merchant for descriptions")
+    parser.add_argument("descriptions", nargs="+", help="Raw statement descriptions")
+    parser.add_argument("--rules", default=DEFAULT_RULES_PATH, help="Merchant rules JSON file")
+    args = parser.parse_args()
+
+    normalizer = MerchantNormalizer(args.rules)
+    for description in args.descriptions:
+        print(f"{description} -> {normalizer.normalize(description)}")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Remember each card's deep links so later runs skip the menu clicks.
+
+After a card is picked in the account dropdown, the site's pages carry the
+card's account token in the URL (`?account_key=...`). The first run records
+those card-scoped URLs (activity, search, statements) in
+~/Downloads/AmexStatements/navigation_cache.json; the tokens identify the
+accounts, so the file lives next to the statements, not in the source tree.
+Later runs open the URLs with a single goto. A deep link that lands on
+"Page Not Found", the login page or another card's page is forgotten, and
+the caller falls back to clicking through the menus, which records fresh
+URLs.
+"""
+import datetime
+import json
+import os
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~/Downloads/AmexStatements"), 'navigation_cache.json')
+ACCOUNT_KEY_PARAM = 'account_key'
+
+# Milliseconds allowed for a cached page to load
+GOTO_TIMEOUT = 30000
+
+
+def account_key_from_url(url):
+    """The card's account token in a site URL, or None."""
+    values = parse_qs(urlparse(url or '').query).get(ACCOUNT_KEY_PARAM)
+    return values[0] if values else None
+
+
+class NavigationCache:
+    """Per-card account token and deep links, stored as JSON."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.cards = json.load(f)
+        except (OSError, ValueError):
+            self.cards = {}
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.cards, f, indent=2, sort_keys=True)
+
+    def url(self, card_name, page_name):
+        """Cached URL of `page_name` (activity, search, statements) for a card, or None."""
+        return self.cards.get(card_name, {}).get('urls', {}).get(page_name)
+
+    def remember(self, card_name, page_name, url):
+        """
+        Record the URL a card's page was reached at.
+
+        Only card-scoped URLs are kept: without an account token the link
+        would open whichever card the site shows by default.
+
+        Returns:
+            bool: True if the URL was stored
+        """
+        account_key = account_key_from_url(url)
+        if not card_name or not account_key:
+            return False
+        entry = self.cards.setdefault(card_name, {'urls': {}})
+        if entry.get('account_key') != account_key:
+            # A new token makes the card's other links stale
+            entry['urls'] = {}
+        entry['account_key'] = account_key
+        entry['urls'][page_name] = url
+        entry['updated'] = datetime.datetime.now().isoformat(timespec='seconds')
+        self._save()
+        return True
+
+    def forget(self, card_name):
+        if self.cards.pop(card_name, None) is not None:
+            self._save()
+
+
+def deep_link_failed(page, account_key=None):
+    """True when a deep link did not land on the expected card's page."""
+    if '/login' in page.url:
+        return True
+    if account_key and account_key_from_url(page.url) not in (None, account_key):
+        return True
+    return page.query_selector("text='Page Not Found'") is not None
+
+
+def goto_cached(page, cache, card_name, page_name):
+    """
+    Open a card's cached deep link in one goto.
+
+    Returns:
+        bool: True if the page opened; False if nothing was cached or the
+              link failed (it is then forgotten)
+    """
+    url = cache.url(card_name, page_name)
+    if not url:
+        return False
+    print(f"Opening cached {page_name} page for {card_name}...")
+    try:
+        page.goto(url, wait_until='networkidle', timeout=GOTO_TIMEOUT)
+        if not deep_link_failed(page, account_key_from_url(url)):
+            return True
+        print(f"Cached {page_name} link for {card_name} no longer works; rediscovering it")
+    except Exception as e:
+        print(f"Cached {page_name} link for {card_name} failed ({e}); rediscovering it")
+    cache.forget(card_name)
+    return False
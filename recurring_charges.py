@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""
+Find recurring charges (subscriptions, bills) in the transaction store.
+
+Charges are grouped by card and normalized merchant, sorted once by date,
+and the gap to the previous charge of the same group is taken with a
+single grouped diff. Each gap is classified into a cadence window, and a
+group is recurring when most of its gaps fall in the same window and most
+consecutive amounts stay within AMOUNT_TOLERANCE. No pairwise comparison of
+charges is ever made.
+
+Each run's findings are saved in the store so the next run can report
+subscriptions that are new, changed (amount or cadence) or cancelled.
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recurring_charges (
+    card TEXT NOT NULL,
+    merchant TEXT NOT NULL,
+    cadence TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    first_date TEXT NOT NULL,
+    last_date TEXT NOT NULL,
+    occurrences INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (card, merchant)
+) WITHOUT ROWID;
+"""
+
+# Days between charges accepted for each cadence, and how many matching
+# gaps are needed before a merchant counts as recurring
+CADENCES = {
+    'weekly': (6, 8, 3),
+    'monthly': (26, 35, 2),
+    'quarterly': (85, 97, 2),
+    'annual': (350, 380, 1),
+}
+
+# Consecutive charges may differ by this fraction (price changes, usage-based bills)
+AMOUNT_TOLERANCE = 0.25
+
+# Share of a merchant's gaps (and amounts) that must fit the cadence
+MIN_MATCH_SHARE = 0.6
+
+# A subscription is cancelled when no charge arrived this long after the cadence window
+CANCEL_GRACE_DAYS = 10
+
+
+def load_charges(conn, card=None):
+    """Positive charges from the store as a card/merchant/date/amount_cents frame."""
+    import pandas as pd
+
+    sql = "SELECT card, merchant, date, amount_cents FROM transactions WHERE amount_cents > 0 AND merchant IS NOT NULL"
+    params = []
+    if card:
+        sql += " AND card = ?"
+        params.append(card)
+    return pd.read_sql_query(sql, conn, params=params, parse_dates=['date'])
+
+
+def detect_recurring(charges):
+    """
+    Detect recurring merchants in a frame of charges.
+
+    Args:
+        charges (DataFrame): card, merchant, date and amount_cents columns
+
+    Returns:
+        DataFrame: one row per recurring card/merchant with cadence,
+                   amount_cents (latest), typical_cents (median), first_date,
+                   last_date, occurrences, next_expected and status
+    """
+    import numpy as np
+    import pandas as pd
+
+    columns = ['card', 'merchant', 'cadence', 'amount_cents', 'typical_cents', 'first_date',
+               'last_date', 'occurrences', 'next_expected', 'status']
+    if charges.empty:
+        return pd.DataFrame(columns=columns)
+
+    df = charges.sort_values(['card', 'merchant', 'date'], kind='stable').reset_index(drop=True)
+    groups = df.groupby(['card', 'merchant'], sort=False)
+    df['gap'] = groups['date'].diff().dt.days
+    previous = groups['amount_cents'].shift()
+    df['amount_ok'] = (df['amount_cents'] - previous).abs() <= AMOUNT_TOLERANCE * previous
+
+    names = list(CADENCES)
+    df['cadence'] = np.select(
+        [df['gap'].between(low, high) for low, high, _ in CADENCES.values()], names, default='')
+
+    # Count gaps per group, then gaps per group and cadence; keep each group's best cadence
+    gap_counts = df[df['gap'].notna()].groupby(['card', 'merchant']).size().rename('gaps')
+    matched = df[df['cadence'] != '']
+    by_cadence = (matched.groupby(['card', 'merchant', 'cadence'])
+                  .agg(matches=('gap', 'size'), amounts_ok=('amount_ok', 'sum'), median_gap=('gap', 'median'))
+                  .reset_index()
+                  .sort_values('matches', ascending=False, kind='stable')
+                  .drop_duplicates(['card', 'merchant']))
+    by_cadence = by_cadence.join(gap_counts, on=['card', 'merchant'])
+
+    min_matches = by_cadence['cadence'].map({name: spec[2] for name, spec in CADENCES.items()})
+    recurring = by_cadence[
+        (by_cadence['matches'] >= min_matches)
+        & (by_cadence['matches'] >= MIN_MATCH_SHARE * by_cadence['gaps'])
+        & (by_cadence['amounts_ok'] >= MIN_MATCH_SHARE * by_cadence['matches'])
+    ]
+    if recurring.empty:
+        return pd.DataFrame(columns=columns)
+
+    summary = groups.agg(
+        amount_cents=('amount_cents', 'last'),
+        typical_cents=('amount_cents', 'median'),
+        first_date=('date', 'min'),
+        last_date=('date', 'max'),
+        occurrences=('date', 'size'),
+    )
+    result = recurring.join(summary, on=['card', 'merchant']).reset_index(drop=True)
+    result['typical_cents'] = result['typical_cents'].round().astype('int64')
+    result['next_expected'] = result['last_date'] + pd.to_timedelta(result['median_gap'], unit='D')
+
+    # Statements lag, so "now" is the newest charge on the same card
+    as_of = result['card'].map(df.groupby('card')['date'].max())
+    deadline = result['cadence'].map({name: spec[1] for name, spec in CADENCES.items()}) + CANCEL_GRACE_DAYS
+    overdue = (as_of - result['last_date']).dt.days > deadline
+    result['status'] = np.where(overdue, 'cancelled', 'active')
+
+    return result[columns].sort_values(['card', 'merchant']).reset_index(drop=True)
+
+
+def compare_runs(conn, current, card=None):
+    """
+    Compare a detect_recurring() result with the previous run and save it.
+
+    With `card`, only that card's saved subscriptions are compared and replaced.
+
+    Returns:
+        DataFrame: `current` plus a 'change' column: new, changed, cancelled
+                   or '' (unchanged); subscriptions that vanished entirely
+                   are appended as cancelled
+    """
+    import pandas as pd
+
+    conn.executescript(SCHEMA)
+    where_sql, params = ("WHERE card = ?", [card]) if card else ("", [])
+    previous = pd.read_sql_query(f"SELECT * FROM recurring_charges {where_sql}", conn,
+                                 params=params, parse_dates=['first_date', 'last_date'])
+
+    merged = current.merge(previous, on=['card', 'merchant'], how='outer',
+                           suffixes=('', '_before'), indicator=True)
+    was_active = merged['status_before'] == 'active'
+    amount_moved = ((merged['amount_cents'] - merged['amount_cents_before']).abs()
+                    > AMOUNT_TOLERANCE * merged['amount_cents_before'])
+
+    merged['change'] = ''
+    merged.loc[(merged['_merge'] == 'left_only') & (merged['status'] == 'active'), 'change'] = 'new'
+    both = merged['_merge'] == 'both'
+    merged.loc[both & (~was_active) & (merged['status'] == 'active'), 'change'] = 'new'
+    merged.loc[both & was_active & ((merged['cadence'] != merged['cadence_before']) | amount_moved), 'change'] = 'changed'
+    merged.loc[both & was_active & (merged['status'] == 'cancelled'), 'change'] = 'cancelled'
+
+    # Merchants that no longer look recurring at all keep their last known details
+    gone = (merged['_merge'] == 'right_only') & was_active
+    for column in ['cadence', 'amount_cents', 'first_date', 'last_date', 'occurrences']:
+        merged[column] = merged[column].where(~gone, merged[f'{column}_before'])
+    merged.loc[gone, 'status'] = 'cancelled'
+    merged.loc[gone, 'change'] = 'cancelled'
+
+    result = merged[(merged['_merge'] != 'right_only') | gone][list(current.columns) + ['change']]
+    result = result.reset_index(drop=True)
+    result[['amount_cents', 'occurrences']] = result[['amount_cents', 'occurrences']].astype('int64')
+
+    rows = [
+        (r.card, r.merchant, r.cadence, int(r.amount_cents), r.first_date.date().isoformat(),
+         r.last_date.date().isoformat(), int(r.occurrences), r.status)
+        for r in result.itertuples(index=False)
+    ]
+    with conn:
+        conn.execute(f"DELETE FROM recurring_charges {where_sql}", params)
+        conn.executemany("INSERT INTO recurring_charges VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return result
+
+
+def print_recurring(result):
+    """Print recurring charges grouped by status, with monthly-equivalent totals."""
+    if result.empty:
+        print("No recurring charges found")
+        return
+
+    per_month = {'weekly': 52 / 12, 'monthly': 1, 'quarterly': 1 / 3, 'annual': 1 / 12}
+    for status in ('active', 'cancelled'):
+        rows = result[result['status'] == status]
+        if rows.empty:
+            continue
+        print(f"\n{status.title()} recurring charges")
+        print('-' * len(f"{status.title()} recurring charges"))
+        for r in rows.itertuples(index=False):
+            flag = f"  [{r.change}]" if getattr(r, 'change', '') else ''
+            print(f"{r.card} | {r.merchant}: ${r.amount_cents / 100:.2f} {r.cadence}, "
+                  f"{r.occurrences} charges since {r.first_date:%Y-%m-%d}, last {r.last_date:%Y-%m-%d}{flag}")
+        if status == 'active':
+            monthly = sum(r.amount_cents * per_month[r.cadence] for r in rows.itertuples(index=False))
+            print(f"\nActive recurring spend: about ${monthly / 100:.2f} per month")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+"""
+Render spending summaries as text, JSON, Markdown or HTML.
+
+All figures are computed once by build_report() from the breakdown frames
+produced by analyze_statement.summarize_frame(), summarize_stream() or
+transaction_store.rollup_frames(). Each renderer only formats that result,
+using column-wise string operations instead of per-row loops. numpy is
+imported by the renderers so importing this module stays cheap.
+"""
+import html
+import json
+import os
+
+REPORT_FORMATS = {
+    'text': 'summary_report.txt',
+    'json': 'summary_report.json',
+    'markdown': 'summary_report.md',
+    'html': 'summary_report.html',
+}
+
+
+def build_report(frames, card_name='Card', period_start=None, period_end=None, anomalies=None):
+    """
+    Collect everything the renderers need into one result dict.
+
+    Args:
+        frames (dict): 'country', 'category', 'country_category' frames with
+                       Total_Amount/Transaction_Count and a 'totals' dict
+        card_name (str): Card shown in the report title
+        period_start: Start of the statement period (date-like or str)
+        period_end: End of the statement period (date-like or str)
+        anomalies (DataFrame): Optional anomalies.detect_anomalies() result
+
+    Returns:
+        dict: title, period, totals and the three breakdowns sorted for display
+    """
+    totals = frames['totals']
+    period_start = period_start if period_start is not None else totals.get('first_date')
+    period_end = period_end if period_end is not None else totals.get('last_date')
+
+    report = {
+        'title': f"{card_name} Transaction Analysis",
+        'card_name': card_name,
+        'period_start': _format_date(period_start),
+        'period_end': _format_date(period_end),
+        'totals': {
+            'transactions': int(totals['transactions']),
+            'total_spent': float(totals['total_spent']),
+            'total_credits': float(totals['total_credits']),
+            'net_balance': float(totals['net_balance']),
+        },
+        'country': frames['country'].sort_values('Total_Amount', ascending=False).reset_index(drop=True),
+        'category': frames['category'].sort_values('Total_Amount', ascending=False).reset_index(drop=True),
+        'country_category': frames['country_category'].sort_values(
+            ['Country', 'Total_Amount'], ascending=[True, False]).reset_index(drop=True),
+    }
+    if anomalies is not None:
+        report['anomalies'] = anomalies.reset_index(drop=True)
+    return report
+
+
+def _format_date(value):
+    if value is None:
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%B %d, %Y')
+    return str(value)
+
+
+# Columns rendered as 2-decimal dollar amounts in tables
+MONEY_COLUMNS = ('Total_Amount', 'Amount', 'Baseline')
+
+
+def _money(series):
+    """Format a numeric column as 2-decimal strings in one vectorized call."""
+    import numpy as np
+
+    return np.char.mod('%.2f', series.to_numpy(dtype=float)).astype(object)
+
+
+def _counts(series):
+    return series.astype('int64').astype(str).to_numpy(dtype=object)
+
+
+def _labels(series):
+    return series.astype(str).to_numpy(dtype=object)
+
+
+def _lines(labels, frame, indent=''):
+    """"<label>: $<amount> (<n> transactions)" for every row of the frame."""
+    import numpy as np
+
+    if frame.empty:
+        return np.array([], dtype=object)
+    return indent + labels + ': $' + _money(frame['Total_Amount']) + ' (' + _counts(frame['Transaction_Count']) + ' transactions)\n'
+
+
+def render_text(report):
+    """Render the plain-text summary_report.txt layout."""
+    import numpy as np
+
+    totals = report['totals']
+    cc = report['country_category']
+
+    parts = [
+        f"{report['title']}\n",
+        f"{'=' * len(report['title'])}\n\n",
+        f"Statement Period: {report['period_start']} to {report['period_end']}\n\n",
+        f"Total Transactions: {totals['transactions']}\n",
+        f"Total Spent: ${totals['total_spent']:.2f}\n",
+        f"Total Payments/Credits: ${totals['total_credits']:.2f}\n",
+        f"Net Balance: ${totals['net_balance']:.2f}\n\n",
+        "Spending by Country\n",
+        "-----------------\n",
+        ''.join(_lines(_labels(report['country']['Country']), report['country'])),
+        "\nSpending by Category\n",
+        "------------------\n",
+        ''.join(_lines(_labels(report['category']['Category']), report['category'])),
+        "\nDetailed Country/Category Breakdown\n",
+        "--------------------------------\n",
+    ]
+
+    if not cc.empty:
+        # A country heading precedes the first row of each country group
+        countries = _labels(cc['Country'])
+        new_group = (cc['Country'] != cc['Country'].shift()).to_numpy()
+        headings = np.where(new_group, '\n' + countries + '\n', '').astype(object)
+        parts.append(''.join(headings + _lines(_labels(cc['Category']), cc, '  ')))
+
+    anomalies = report.get('anomalies')
+    if anomalies is not None and not anomalies.empty:
+        parts.append(_anomaly_text(anomalies))
+
+    return ''.join(parts)
+
+
+def _anomaly_text(anomalies):
+    """"<date> <card> | <what>: $<amount> (usual $<baseline>, score <n>)" for every anomaly."""
+    import numpy as np
+
+    labels = np.where(anomalies['Kind'] == 'charge',
+                      _labels(anomalies['Merchant']),
+                      _labels(anomalies['Category']) + ' spending').astype(object)
+    lines = (_labels(anomalies['Date']) + ' ' + _labels(anomalies['Card']) + ' | ' + labels
+             + ': $' + _money(anomalies['Amount']) + ' (usual $' + _money(anomalies['Baseline'])
+             + ', score ' + _labels(anomalies['Score']) + ')\n')
+    return "\nAnomalies\n---------\n" + ''.join(lines)
+
+
+def render_json(report):
+    """Render the report as a JSON document."""
+    payload = {
+        'title': report['title'],
+        'card_name': report['card_name'],
+        'period_start': report['period_start'],
+        'period_end': report['period_end'],
+        'totals': report['totals'],
+        'country': report['country'].to_dict(orient='records'),
+        'category': report['category'].to_dict(orient='records'),
+        'country_category': report['country_category'].to_dict(orient='records'),
+    }
+    if 'anomalies' in report:
+        payload['anomalies'] = report['anomalies'].to_dict(orient='records')
+    return json.dumps(payload, indent=2, default=str)
+
+
+def _markdown_table(frame):
+    header = '| ' + ' | '.join(frame.columns) + ' |\n'
+    divider = '|' + '|'.join(['---'] * len(frame.columns)) + '|\n'
+    if frame.empty:
+        return header + divider
+    cells = [(_money(frame[c]) if c in MONEY_COLUMNS else _labels(frame[c])) for c in frame.columns]
+    rows = '| ' + cells[0]
+    for column in cells[1:]:
+        rows = rows + ' | ' + column
+    return header + divider + ''.join(rows + ' |\n')
+
+
+def render_markdown(report):
+    """Render the report as Markdown tables."""
+    totals = report['totals']
+    return (
+        f"# {report['title']}\n\n"
+        f"Statement Period: {report['period_start']} to {report['period_end']}\n\n"
+        f"- Total Transactions: {totals['transactions']}\n"
+        f"- Total Spent: ${totals['total_spent']:.2f}\n"
+        f"- Total Payments/Credits: ${totals['total_credits']:.2f}\n"
+        f"- Net Balance: ${totals['net_balance']:.2f}\n\n"
+        f"## Spending by Country\n\n{_markdown_table(report['country'])}\n"
+        f"## Spending by Category\n\n{_markdown_table(report['category'])}\n"
+        f"## Detailed Country/Category Breakdown\n\n{_markdown_table(report['country_category'])}"
+        + (f"\n## Anomalies\n\n{_markdown_table(report['anomalies'])}" if 'anomalies' in report else "")
+    )
+
+
+def _escape(values):
+    """HTML-escape a column of strings with numpy's vectorized replace."""
+    import numpy as np
+
+    escaped = np.asarray(values, dtype=str)
+    for char, entity in (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;')):
+        escaped = np.char.replace(escaped, char, entity)
+    return escaped.astype(object)
+
+
+def _html_table(frame):
+    header = '<tr>' + ''.join(f'<th>{html.escape(c)}</th>' for c in frame.columns) + '</tr>\n'
+    if frame.empty:
+        return f'<table>\n{header}</table>\n'
+    cells = [(_money(frame[c]) if c in MONEY_COLUMNS else _escape(_labels(frame[c]))) for c in frame.columns]
+    rows = '<tr>'
+    for column in cells:
+        rows = rows + '<td>' + column + '</td>'
+    return f'<table>\n{header}' + ''.join(rows + '</tr>\n') + '</table>\n'
+
+
+def render_html(report):
+    """Render the report as a standalone HTML page."""
+    totals = report['totals']
+    title = html.escape(report['title'])
+    return (
+        f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>{title}</title></head>\n<body>\n"
+        f"<h1>{title}</h1>\n"
+        f"<p>Statement Period: {html.escape(str(report['period_start']))} to {html.escape(str(report['period_end']))}</p>\n"
+        f"<ul>\n"
+        f"<li>Total Transactions: {totals['transactions']}</li>\n"
+        f"<li>Total Spent: ${totals['total_spent']:.2f}</li>\n"
+        f"<li>Total Payments/Credits: ${totals['total_credits']:.2f}</li>\n"
+        f"<li>Net Balance: ${totals['net_balance']:.2f}</li>\n"
+        f"</ul>\n"
+        f"<h2>Spending by Country</h2>\n{_html_table(report['country'])}"
+        f"<h2>Spending by Category</h2>\n{_html_table(report['category'])}"
+        f"<h2>Detailed Country/Category Breakdown</h2>\n{_html_table(report['country_category'])}"
+        + (f"<h2>Anomalies</h2>\n{_html_table(report['anomalies'])}" if 'anomalies' in report else "")
+        + "</body>\n</html>\n"
+    )
+
+
+RENDERERS = {
+    'text': render_text,
+    'json': render_json,
+    'markdown': render_markdown,
+    'html': render_html,
+}
+
+
+def write_reports(report, output_dir, formats=('text',)):
+    """Write the report in each requested format; return the written paths."""
+    paths = []
+    for fmt in formats:
+        path = os.path.join(output_dir, REPORT_FORMATS[fmt])
+        with open(path, 'w') as f:
+            f.write(RENDERERS[fmt](report))
+        paths.append(path)
+    return paths
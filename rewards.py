@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Membership Rewards points earned per transaction, month and category.
+
+Earn rates live in rewards_rules.json, one table per card:
+
+    "Gold Card": {"default": 1,
+                  "categories": {"Restaurant": 4, "Merchandise & Supplies-Groceries": 4},
+                  "merchants": {"Whole Foods": 4},
+                  "point_value_cents": 1.0}
+
+A transaction's multiplier is its merchant's rate if listed, else the rate
+of its full "Main-Sub" category, else of its main category, else the
+default. A card uses the table whose name is the longest one contained in
+the card name ("Personal Gold Card" -> "Gold Card"). Multipliers are looked
+up with column-wise map() calls, one set per card, so the full history is
+scored without touching rows one at a time. Refunds with a category claw
+points back; payments earn nothing.
+"""
+import json
+import os
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rewards_rules.json')
+
+# Rate used for cards without an earn table
+BASE_TABLE = {'default': 1, 'categories': {}, 'merchants': {}, 'point_value_cents': 1.0}
+
+# Bars shown in rewards_summary.png
+CHART_TOP = 15
+
+
+def load_earn_tables(path=DEFAULT_RULES_PATH):
+    """Read {card: earn table} from the rewards rules file."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def earn_table_for(card, tables):
+    """The earn table whose name is the longest match inside `card`."""
+    card_lower = (card or '').lower()
+    matches = [name for name in tables if name.lower() in card_lower]
+    if not matches:
+        return BASE_TABLE
+    return {**BASE_TABLE, **tables[max(matches, key=len)]}
+
+
+def compute_points(charges, tables=None):
+    """
+    Score every transaction.
+
+    Args:
+        charges (DataFrame): card, date, merchant, category, main_category,
+                             country and amount_cents columns
+        tables (dict): Earn tables (default: rewards_rules.json)
+
+    Returns:
+        DataFrame: `charges` plus multiplier, points and value_cents columns
+    """
+    import numpy as np
+    import pandas as pd
+
+    tables = load_earn_tables() if tables is None else tables
+    df = charges.reset_index(drop=True)
+    multiplier = pd.Series(np.nan, index=df.index)
+    point_value = pd.Series(np.nan, index=df.index)
+
+    merchants = df['merchant'].astype(object)
+    categories = df['category'].astype(object)
+    main_categories = df['main_category'].astype(object)
+    for card, rows in df.groupby(df['card'].astype(object), sort=False).groups.items():
+        table = earn_table_for(card, tables)
+        rates = merchants[rows].map(table['merchants'])
+        rates = rates.fillna(categories[rows].map(table['categories']))
+        rates = rates.fillna(main_categories[rows].map(table['categories']))
+        multiplier[rows] = rates.fillna(table['default']).to_numpy(dtype=float)
+        point_value[rows] = table['point_value_cents']
+
+    # Points are whole numbers per transaction; refunds lose what they earned
+    cents = df['amount_cents'].to_numpy()
+    earns = (cents > 0) | categories.notna().to_numpy()
+    points = np.sign(cents) * np.floor(np.abs(cents) * multiplier.to_numpy() / 100)
+    points = np.where(earns, points, 0).astype('int64')
+    return df.assign(multiplier=multiplier, points=points, value_cents=(points * point_value).round(2))
+
+
+def rollup_points(scored):
+    """
+    Points and their value per month and main category.
+
+    Returns:
+        DataFrame: Month, Category, Points, Value ($), Spend ($)
+    """
+    months = scored['date'].dt.strftime('%Y-%m')
+    rollup = (scored.assign(month=months, spend=scored['amount_cents'].clip(lower=0))
+              .groupby(['month', 'main_category'], observed=True)
+              .agg(points=('points', 'sum'), value=('value_cents', 'sum'), spend=('spend', 'sum'))
+              .reset_index())
+    rollup['value'] = (rollup['value'] / 100).round(2)
+    rollup['spend'] = rollup['spend'] / 100
+    rollup.columns = ['Month', 'Category', 'Points', 'Value', 'Spend']
+    return rollup
+
+
+def rewards_chart_spec(scored, card_name):
+    """Horizontal points-by-country-and-category chart (rewards_summary.png)."""
+    from charts import bar_chart_spec
+
+    labels = scored['country'].astype(object).fillna('N/A') + ' - ' + \
+        scored['category'].astype(object).fillna(scored['main_category'].astype(object))
+    points = scored[scored['points'] > 0].groupby(labels)['points'].sum()
+    points = points.sort_values(ascending=False).head(CHART_TOP).sort_index(ascending=False)
+    return bar_chart_spec('rewards_summary.png', points.index, points.values,
+                          f"{card_name} - Rewards Points by Country and Category",
+                          ylabel='Points', color='#5f9fcb', horizontal=True, value_suffix='pts')
+
+
+def print_rewards(rollup):
+    """Print total points plus the per-category and per-month totals."""
+    print(f"Total points: {int(rollup['Points'].sum()):,} (worth about ${rollup['Value'].sum():,.2f})")
+    for key in ('Category', 'Month'):
+        totals = rollup.groupby(key)[['Points', 'Value', 'Spend']].sum()
+        if key == 'Category':
+            totals = totals.sort_values('Points', ascending=False)
+        print(f"\nPoints by {key.lower()}:")
+        for name, row in totals.iterrows():
+            print(f"  {name}: {int(row['Points']):,} pts on ${row['Spend']:,.2f}")
+
+
+def frame_charges(df, card_name):
+    """Adapt an analyze_statement frame to the columns compute_points() expects."""
+    return df[['Date', 'Merchant', 'Category', 'Main_Category', 'Country', 'Amount_Cents']].rename(columns={
+        'Date': 'date', 'Merchant': 'merchant', 'Category': 'category', 'Main_Category': 'main_category',
+        'Country': 'country', 'Amount_Cents': 'amount_cents',
+    }).assign(card=card_name)
+
+
+def load_charges(conn, card=None, since=None, until=None):
+    """Stored transactions with the columns compute_points() expects."""
+    import pandas as pd
+
+    where = []
+    params = []
+    for clause, value in (("card = ?", card), ("date >= ?", since), ("date <= ?", until)):
+        if value:
+            where.append(clause)
+            params.append(value)
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    return pd.read_sql_query(
+        f"SELECT card, date, merchant, category, main_category, country, amount_cents FROM transactions {where_sql}",
+        conn, params=params, parse_dates=['date'],
+    )
@@ -0,0 +1,442 @@
+#!/usr/bin/env python
+"""
+Helpers for locating and loading the transaction table in AMEX exports.
+
+AMEX puts a few banner rows (card name, statement period, account holder)
+above the real header row, and the number of banner rows varies by card and
+export type. Instead of hard-coding column names we sniff the first rows of
+the file, find the header, then load the body in a single typed read.
+
+pandas and openpyxl are imported inside the functions that need them so
+the pure-Python streaming path stays cheap to start.
+"""
+import csv
+import os
+import re
+import sys
+from datetime import datetime
+
+# How many leading rows to inspect when looking for the header
+HEADER_SCAN_ROWS = 40
+
+# Title cell looks like "Business Gold Card / May 06, 2025 to Jun 06, 2025"
+TITLE_PATTERN = re.compile(
+    r'^\s*(?P<card>.+?)\s*/\s*(?P<start>[A-Z][a-z]{2} \d{1,2}, \d{4})\s+to\s+(?P<end>[A-Z][a-z]{2} \d{1,2}, \d{4})\s*$'
+)
+
+# Export header -> column name used throughout the analysis
+COLUMN_MAP = {
+    'Date': 'Date',
+    'Receipt': 'Receipt',
+    'Description': 'Description',
+    'Amount': 'Amount',
+    'Extended Details': 'Extended_Details',
+    'Appears On Your Statement As': 'Statement_Description',
+    'Address': 'Address',
+    'City/State': 'City_State',
+    'Zip Code': 'Zip',
+    'Country': 'Country',
+    'Reference': 'Reference',
+    'Category': 'Category',
+}
+
+# Columns that must be present for a row to count as the header
+REQUIRED_HEADERS = ('Date', 'Description', 'Amount')
+
+# Read everything except the amount as text; dates are parsed afterwards
+TEXT_COLUMNS = [name for name in COLUMN_MAP if name not in ('Date', 'Amount')]
+
+# Default number of records per batch for the streaming reader
+STREAM_BATCH_SIZE = 5000
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ['Description', 'Country', 'City_State', 'Category', 'Main_Category', 'Sub_Category']
+
+
+def _is_excel(filepath):
+    return os.path.splitext(filepath)[1].lower() in ('.xlsx', '.xlsm', '.xls')
+
+
+def _match_title(cells, info):
+    """Fill card_name/period_start/period_end from a banner row if it has the title."""
+    for cell in cells:
+        match = TITLE_PATTERN.match(cell)
+        if match:
+            info['card_name'] = match.group('card')
+            info['period_start'] = datetime.strptime(match.group('start'), '%b %d, %Y')
+            info['period_end'] = datetime.strptime(match.group('end'), '%b %d, %Y')
+            return True
+    return False
+
+
+def _read_leading_rows(filepath, max_rows):
+    """Return the first `max_rows` rows of the file as lists of cell strings."""
+    if _is_excel(filepath):
+        import pandas as pd
+
+        head = pd.read_excel(filepath, header=None, nrows=max_rows, dtype=str)
+        return [['' if pd.isna(v) else str(v).strip() for v in row] for row in head.itertuples(index=False)]
+
+    rows = []
+    with open(filepath, newline='', encoding='utf-8-sig') as f:
+        for i, row in enumerate(csv.reader(f)):
+            if i >= max_rows:
+                break
+            rows.append([cell.strip() for cell in row])
+    return rows
+
+
+def sniff_header(filepath, max_rows=HEADER_SCAN_ROWS):
+    """
+    Find the header row and statement title without loading the whole file.
+
+    Args:
+        filepath (str): Path to an AMEX .xlsx or .csv export
+        max_rows (int): Number of leading rows to inspect
+
+    Returns:
+        dict: header_row (0-based row index), columns (header cells),
+              card_name, period_start and period_end (None when the export
+              has no title banner)
+
+    Raises:
+        ValueError: If no header row is found within `max_rows` rows
+    """
+    rows = _read_leading_rows(filepath, max_rows)
+
+    info = {
+        'header_row': None,
+        'columns': [],
+        'card_name': None,
+        'period_start': None,
+        'period_end': None,
+    }
+
+    for index, row in enumerate(rows):
+        cells = set(row)
+        if all(name in cells for name in REQUIRED_HEADERS):
+            info['header_row'] = index
+            info['columns'] = row
+            break
+
+        # Banner rows above the header may carry the card name and period
+        if info['card_name'] is None:
+            _match_title(row, info)
+
+    if info['header_row'] is None:
+        raise ValueError(f"Could not find a transaction header in the first {max_rows} rows of {filepath}")
+
+    return info
+
+
+def load_statement(filepath, info=None):
+    """
+    Load the transactions of an AMEX export with canonical column names.
+
+    Args:
+        filepath (str): Path to an AMEX .xlsx or .csv export
+        info (dict): Result of sniff_header(), sniffed if not given
+
+    Returns:
+        tuple: (DataFrame of transactions, header info dict)
+    """
+    import pandas as pd
+
+    if info is None:
+        info = sniff_header(filepath)
+
+    present = [name for name in info['columns'] if name in COLUMN_MAP]
+    dtypes = {name: str for name in TEXT_COLUMNS if name in present}
+
+    read_kwargs = {
+        'usecols': present,
+        'dtype': dtypes,
+    }
+    if _is_excel(filepath):
+        df = pd.read_excel(filepath, header=info['header_row'], **read_kwargs)
+    else:
+        # header_row counts blank lines, which read_csv would otherwise skip
+        df = pd.read_csv(filepath, encoding='utf-8-sig', skiprows=info['header_row'], header=0,
+                         skip_blank_lines=False, **read_kwargs)
+
+    df = df.rename(columns=COLUMN_MAP)
+
+    # Text amounts ("$1,234.56") are parsed the same way as _parse_cell_cents
+    if not pd.api.types.is_numeric_dtype(df['Amount']):
+        amounts = df['Amount'].astype(str).str.replace(r'[$,\s]', '', regex=True)
+        df['Amount'] = pd.to_numeric(amounts, errors='coerce')
+
+    # Footer/blank rows have no parseable date; dropping them replaces the
+    # old regex filter over the whole frame
+    df['Date'] = pd.to_datetime(df['Date'], format='%m/%d/%Y', errors='coerce')
+    df = df[df['Date'].notna()].reset_index(drop=True)
+
+    if 'Reference' in df.columns:
+        df['Reference'] = df['Reference'].str.strip("' ")
+
+    return df, info
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def load_normalized(filepath, info=None, verbose=True):
+    """
+    Load an AMEX export into the compact form used by the analysis.
+
+    Amounts become int64 cents in `Amount_Cents` so sums are exact, the
+    Category field is split into Main/Sub once, and repetitive text
+    columns become categoricals.
+
+    Args:
+        filepath (str): Path to an AMEX .xlsx or .csv export
+        info (dict): Result of sniff_header(), sniffed if not given
+        verbose (bool): Print how much memory the compact form saved
+
+    Returns:
+        tuple: (normalized DataFrame, header info dict). The info dict also
+               gets memory_before and memory_after in bytes.
+    """
+    df, info = load_statement(filepath, info)
+    memory_before = _frame_bytes(df)
+
+    # Rows without an amount cannot be aggregated
+    df = df[df['Amount'].notna()].reset_index(drop=True)
+    df['Amount_Cents'] = (df['Amount'] * 100).round().astype('int64')
+    df = df.drop(columns='Amount')
+
+    df['Country'] = df['Country'].fillna('N/A')
+
+    # Split "Main-Sub" once instead of once per output column
+    parts = df['Category'].str.split('-', n=1, expand=True).reindex(columns=[0, 1])
+    df['Main_Category'] = parts[0].fillna('Uncategorized')
+    df['Sub_Category'] = parts[1].fillna('Uncategorized')
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+
+    memory_after = _frame_bytes(df)
+    info['memory_before'] = memory_before
+    info['memory_after'] = memory_after
+
+    if verbose:
+        saved = memory_before - memory_after
+        percent = (saved / memory_before * 100) if memory_before else 0
+        print(f"Loaded {len(df)} transactions: {memory_before / 1024:.1f} KB -> "
+              f"{memory_after / 1024:.1f} KB in memory (saved {percent:.0f}%)")
+
+    return df, info
+
+
+def cents_to_dollars(cents):
+    """Convert an integer-cents scalar or Series to dollars for display."""
+    return cents / 100
+
+
+def _parse_cell_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value.strip(), '%m/%d/%Y').date()
+        except ValueError:
+            return None
+    return None
+
+
+def _parse_cell_cents(value):
+    if value is None or value == '':
+        return None
+    try:
+        return int(round(float(str(value).replace('$', '').replace(',', '')) * 100))
+    except ValueError:
+        return None
+
+
+def _cell_text(value):
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+class Transaction:
+    """
+    One parsed transaction row.
+
+    Slotted so millions of records stay small; amounts are integer cents and
+    country/category strings are interned so repeated values share memory.
+    """
+    __slots__ = ('date', 'amount_cents', 'description', 'country', 'city_state',
+                 'reference', 'category', 'main_category', 'sub_category')
+
+    def __init__(self, date, amount_cents, description=None, country='N/A', city_state=None,
+                 reference=None, category=None, main_category='Uncategorized',
+                 sub_category='Uncategorized'):
+        self.date = date
+        self.amount_cents = amount_cents
+        self.description = description
+        self.country = country
+        self.city_state = city_state
+        self.reference = reference
+        self.category = category
+        self.main_category = main_category
+        self.sub_category = sub_category
+
+    def __repr__(self):
+        return (f"Transaction({self.date.isoformat()}, {self.amount_cents / 100:.2f}, "
+                f"{self.description!r}, {self.main_category!r})")
+
+
+def _iter_records(rows, info, filepath):
+    """Skip the banner and header rows, then yield one Transaction per transaction row."""
+    # Banner rows and header come first; stop scanning at the header
+    positions = None
+    for index, row in enumerate(rows):
+        cells = [_cell_text(v) or '' for v in row]
+        if all(name in cells for name in REQUIRED_HEADERS):
+            positions = {name: cells.index(name) for name in COLUMN_MAP if name in cells}
+            break
+        if info['card_name'] is None:
+            _match_title(cells, info)
+        if index >= HEADER_SCAN_ROWS:
+            break
+
+    if positions is None:
+        raise ValueError(f"Could not find a transaction header in the first {HEADER_SCAN_ROWS} rows of {filepath}")
+
+    def cell(row, name):
+        position = positions.get(name)
+        return row[position] if position is not None and position < len(row) else None
+
+    # Statements repeat the same few dates, countries and categories, so each
+    # distinct value is parsed/split once and the interned result reused
+    dates = {}
+    countries = {}
+    categories = {}
+
+    for row in rows:
+        raw_date = cell(row, 'Date')
+        date = dates.get(raw_date) if isinstance(raw_date, str) else None
+        if date is None:
+            date = _parse_cell_date(raw_date)
+            if date is None:
+                continue
+            if isinstance(raw_date, str):
+                dates[raw_date] = date
+
+        cents = _parse_cell_cents(cell(row, 'Amount'))
+        if cents is None:
+            continue
+
+        raw_country = _cell_text(cell(row, 'Country')) or 'N/A'
+        country = countries.get(raw_country)
+        if country is None:
+            country = countries[raw_country] = sys.intern(raw_country)
+
+        raw_category = _cell_text(cell(row, 'Category'))
+        parts = categories.get(raw_category)
+        if parts is None:
+            main_category, _, sub_category = (raw_category or '').partition('-')
+            parts = categories[raw_category] = (
+                sys.intern(raw_category) if raw_category else None,
+                sys.intern(main_category or 'Uncategorized'),
+                sys.intern(sub_category or 'Uncategorized'),
+            )
+
+        reference = _cell_text(cell(row, 'Reference'))
+
+        yield Transaction(
+            date,
+            cents,
+            _cell_text(cell(row, 'Description')),
+            country,
+            _cell_text(cell(row, 'City/State')),
+            reference.strip("' ") if reference else None,
+            *parts,
+        )
+
+
+def iter_transaction_batches(filepath, batch_size=STREAM_BATCH_SIZE, info=None):
+    """
+    Stream typed transaction records from an export in fixed-size batches.
+
+    .xlsx files are read with openpyxl in read-only mode and .csv files with
+    the csv module, so only one row is materialized at a time; peak memory
+    depends on `batch_size`, not on the file size.
+
+    Args:
+        filepath (str): Path to an AMEX .xlsx or .csv export
+        batch_size (int): Number of records per yielded batch
+        info (dict): Optional dict that is filled with the sniffed card_name,
+                     period_start and period_end while streaming
+
+    Yields:
+        list: Up to `batch_size` Transaction records
+    """
+    if info is None:
+        info = {}
+    info.setdefault('card_name', None)
+    info.setdefault('period_start', None)
+    info.setdefault('period_end', None)
+
+    if _is_excel(filepath):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(filepath, read_only=True, data_only=True)
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        close = workbook.close
+    else:
+        handle = open(filepath, newline='', encoding='utf-8-sig')
+        rows = csv.reader(handle)
+        close = handle.close
+
+    try:
+        batch = []
+        for record in _iter_records(rows, info, filepath):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        close()
+
+
+def iter_transactions(filepath, info=None):
+    """Yield Transaction records one at a time (CSV exports never touch pandas)."""
+    for batch in iter_transaction_batches(filepath, info=info):
+        yield from batch
+
+
+def transactions_to_frame(transactions):
+    """
+    Build the load_normalized() DataFrame from Transaction records.
+
+    Only needed when a pandas operation is required; the streaming callers
+    work on the records directly.
+    """
+    import pandas as pd
+
+    columns = {name: [] for name in ('Date', 'Description', 'City_State', 'Country', 'Reference',
+                                     'Category', 'Main_Category', 'Sub_Category', 'Amount_Cents')}
+    for t in transactions:
+        columns['Date'].append(t.date)
+        columns['Description'].append(t.description)
+        columns['City_State'].append(t.city_state)
+        columns['Country'].append(t.country)
+        columns['Reference'].append(t.reference)
+        columns['Category'].append(t.category)
+        columns['Main_Category'].append(t.main_category)
+        columns['Sub_Category'].append(t.sub_category)
+        columns['Amount_Cents'].append(t.amount_cents)
+
+    df = pd.DataFrame(columns)
+    df['Date'] = pd.to_datetime(df['Date'])
+    df['Amount_Cents'] = df['Amount_Cents'].astype('int64')
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype('category')
+    return df
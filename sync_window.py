@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Search only the days not yet in the transaction store.
+
+Every ingest records the latest stored transaction date per card (the
+high_water_marks table of transaction_store.py). The downloaders start the
+Custom Date Range search SYNC_OVERLAP_DAYS before that mark and end it
+today, so a daily sync fetches a few rows instead of the site's default
+months of history. The overlap picks up charges that post late under an
+earlier date; rows already stored are skipped by the dedup index on ingest.
+Without a mark (first run, or --full) the site's default range is used.
+"""
+import argparse
+import datetime
+import os
+
+# Days searched again before a card's high-water mark
+SYNC_OVERLAP_DAYS = 7
+
+# Date format of the site's range inputs
+INPUT_DATE_FORMAT = "%m/%d/%Y"
+
+# Start and end inputs, in page order
+DATE_INPUT_SELECTOR = ("input[placeholder='MM/DD/YYYY'], input[aria-label*='Start Date' i], "
+                       "input[aria-label*='End Date' i]")
+
+# Milliseconds to wait for the range inputs
+INPUT_TIMEOUT = 5000
+
+
+def search_window(card=None, directory=None, db_path=None, overlap_days=SYNC_OVERLAP_DAYS, today=None):
+    """
+    Date range to search for a card, from its high-water mark to today.
+
+    Args:
+        card (str): Card name or registry key
+        directory (str): The card's download folder, to find its mark when
+                         the store knows the card under another name
+        db_path (str): Transaction store (default: transaction_store's)
+
+    Returns:
+        tuple: (start, end) dates, or None when the card has no mark yet
+    """
+    import transaction_store
+
+    db_path = db_path or transaction_store.DEFAULT_DB_PATH
+    if not os.path.exists(db_path):
+        return None
+    conn = transaction_store.connect(db_path)
+    try:
+        mark = transaction_store.high_water_mark(conn, card, directory)
+    finally:
+        conn.close()
+    if not mark:
+        return None
+    today = today or datetime.date.today()
+    start = datetime.date.fromisoformat(mark) - datetime.timedelta(days=overlap_days)
+    return min(start, today), today
+
+
+def fill_date_range(page, start, end):
+    """
+    Type a range into the Custom Date Range start and end inputs.
+
+    Returns:
+        bool: True if both inputs were found and filled
+    """
+    inputs = page.locator(DATE_INPUT_SELECTOR)
+    try:
+        inputs.first.wait_for(state='visible', timeout=INPUT_TIMEOUT)
+        inputs.nth(0).fill(start.strftime(INPUT_DATE_FORMAT))
+        inputs.nth(1).fill(end.strftime(INPUT_DATE_FORMAT))
+    except Exception as e:
+        print(f"Could not set the date range ({e}); searching the default range")
+        return False
+    print(f"Searching {start.isoformat()} to {end.isoformat()}")
+    return True
+
+
+def ingest_downloads(paths, card=None, db_path=None, mark_key=None):
+    """
+    Ingest freshly downloaded exports so the card's high-water mark moves forward.
+
+    Args:
+        mark_key (str): Also record the mark under this name (the card's
+                        registry key), for cards whose stored name is shared
+
+    Returns:
+        int: Rows upserted
+    """
+    import transaction_store
+
+    paths = [p for p in paths if p.lower().endswith(transaction_store.STATEMENT_EXTENSIONS)]
+    if not paths:
+        return 0
+    conn = transaction_store.connect(db_path or transaction_store.DEFAULT_DB_PATH)
+    try:
+        total = transaction_store.ingest_paths(conn, paths, card=card)
+        if mark_key:
+            files = [os.path.abspath(p) for p in paths]
+            latest = conn.execute(
+                f"SELECT MAX(date) FROM transactions WHERE source_file IN ({', '.join('?' for _ in files)})", files
+            ).fetchone()[0]
+            if latest:
+                with conn:
+                    conn.execute(transaction_store.HIGH_WATER_MARK_SQL,
+                                 (mark_key, latest, datetime.datetime.now().isoformat(timespec='seconds')))
+        mark = transaction_store.high_water_mark(conn, mark_key or card, os.path.dirname(paths[0]))
+    finally:
+        conn.close()
+    print(f"Upserted {total} transactions; stored through {mark}")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the search window the next download will use')
+    parser.add_argument('--card', help='Card name')
+    parser.add_argument('--dir', help='Card download folder')
+    parser.add_argument('--overlap', type=int, default=SYNC_OVERLAP_DAYS, help='Days to search again before the mark')
+    args = parser.parse_args()
+
+    window = search_window(args.card, args.dir, overlap_days=args.overlap)
+    if window:
+        print(f"{window[0].isoformat()} to {window[1].isoformat()}")
+    else:
+        print("No high-water mark yet; the site's default range will be searched")
+
+
+if __name__ == "__main__":
+    main()
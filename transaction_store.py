@@ -0,0 +1,672 @@
+#!/usr/bin/env python
+"""
+Local SQLite warehouse of downloaded AMEX transactions.
+
+Statements for every card are ingested once (upserted by Reference) so
+ad-hoc spend questions can be answered from indexed tables instead of
+re-parsing the raw exports.
+
+Usage:
+    python transaction_store.py ingest [PATH ...]
+    python transaction_store.py query --card "Platinum Card" --since 2025-01-01 --by category
+    python transaction_store.py query --sql "SELECT COUNT(*) FROM transactions"
+    python transaction_store.py report --card "Platinum Card" --since 2024-01
+    python transaction_store.py marks
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from categorizer import Categorizer
+from dedup_index import DedupIndex
+from merchant_normalizer import MerchantNormalizer
+from statement_reader import iter_transaction_batches
+
+DEFAULT_DOWNLOAD_DIR = os.path.expanduser("~/Downloads/AmexStatements")
+DEFAULT_DB_PATH = os.path.join(DEFAULT_DOWNLOAD_DIR, 'transactions.db')
+
+STATEMENT_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    reference TEXT PRIMARY KEY,
+    card TEXT NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT,
+    merchant TEXT,
+    amount_cents INTEGER NOT NULL,
+    country TEXT,
+    city_state TEXT,
+    category TEXT,
+    main_category TEXT,
+    sub_category TEXT,
+    source_file TEXT,
+    ingested_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS idx_transactions_card_date ON transactions (card, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_merchant ON transactions (merchant);
+CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions (main_category, sub_category);
+
+-- Materialized card x month x category x country totals, kept current by
+-- the triggers below so reports never rescan the transactions table
+CREATE TABLE IF NOT EXISTS spend_rollup (
+    card TEXT NOT NULL,
+    month TEXT NOT NULL,
+    main_category TEXT NOT NULL,
+    country TEXT NOT NULL,
+    spend_cents INTEGER NOT NULL DEFAULT 0,
+    spend_count INTEGER NOT NULL DEFAULT 0,
+    credit_cents INTEGER NOT NULL DEFAULT 0,
+    credit_count INTEGER NOT NULL DEFAULT 0,
+    txn_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (card, month, main_category, country)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    card TEXT,
+    row_count INTEGER,
+    ingested_at TEXT
+);
+
+-- Latest transaction date stored per card; the next download starts from it
+CREATE TABLE IF NOT EXISTS high_water_marks (
+    card TEXT PRIMARY KEY,
+    last_date TEXT NOT NULL,
+    updated_at TEXT
+);
+"""
+
+
+def _rollup_delta_sql(row, sign):
+    """SQL adding (sign=+1) or removing (sign=-1) one transaction from spend_rollup."""
+    return f"""
+    INSERT INTO spend_rollup (card, month, main_category, country,
+                              spend_cents, spend_count, credit_cents, credit_count, txn_count)
+    VALUES ({row}.card, substr({row}.date, 1, 7),
+            COALESCE({row}.main_category, 'Uncategorized'), COALESCE({row}.country, 'N/A'),
+            {sign} * MAX({row}.amount_cents, 0), {sign} * ({row}.amount_cents > 0),
+            {sign} * -MIN({row}.amount_cents, 0), {sign} * ({row}.amount_cents < 0), {sign})
+    ON CONFLICT (card, month, main_category, country) DO UPDATE SET
+        spend_cents = spend_cents + excluded.spend_cents,
+        spend_count = spend_count + excluded.spend_count,
+        credit_cents = credit_cents + excluded.credit_cents,
+        credit_count = credit_count + excluded.credit_count,
+        txn_count = txn_count + excluded.txn_count;
+    """
+
+
+_DROP_EMPTY_ROLLUP_SQL = """
+    DELETE FROM spend_rollup
+    WHERE txn_count = 0 AND card = OLD.card AND month = substr(OLD.date, 1, 7)
+      AND main_category = COALESCE(OLD.main_category, 'Uncategorized')
+      AND country = COALESCE(OLD.country, 'N/A');
+"""
+
+# Each insert/update/delete applies only the delta for the affected keys
+ROLLUP_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS spend_rollup_insert AFTER INSERT ON transactions BEGIN
+    {_rollup_delta_sql('NEW', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS spend_rollup_update AFTER UPDATE OF card, date, amount_cents, main_category, country ON transactions BEGIN
+    {_rollup_delta_sql('OLD', -1)}
+    {_rollup_delta_sql('NEW', 1)}
+    {_DROP_EMPTY_ROLLUP_SQL}
+END;
+CREATE TRIGGER IF NOT EXISTS spend_rollup_delete AFTER DELETE ON transactions BEGIN
+    {_rollup_delta_sql('OLD', -1)}
+    {_DROP_EMPTY_ROLLUP_SQL}
+END;
+"""
+
+REBUILD_ROLLUP_SQL = """
+DELETE FROM spend_rollup;
+INSERT INTO spend_rollup (card, month, main_category, country,
+                          spend_cents, spend_count, credit_cents, credit_count, txn_count)
+SELECT card, substr(date, 1, 7), COALESCE(main_category, 'Uncategorized'), COALESCE(country, 'N/A'),
+       SUM(MAX(amount_cents, 0)), SUM(amount_cents > 0),
+       SUM(-MIN(amount_cents, 0)), SUM(amount_cents < 0), COUNT(*)
+FROM transactions
+GROUP BY 1, 2, 3, 4;
+"""
+
+TRANSACTION_COLUMNS = [
+    'reference', 'card', 'date', 'description', 'merchant', 'amount_cents',
+    'country', 'city_state', 'category', 'main_category', 'sub_category',
+    'source_file', 'ingested_at',
+]
+
+UPSERT_SQL = f"""
+INSERT INTO transactions ({', '.join(TRANSACTION_COLUMNS)})
+VALUES ({', '.join('?' for _ in TRANSACTION_COLUMNS)})
+ON CONFLICT(reference) DO UPDATE SET
+    {', '.join(f'{c} = excluded.{c}' for c in TRANSACTION_COLUMNS if c != 'reference')}
+"""
+
+HIGH_WATER_MARK_SQL = """
+INSERT INTO high_water_marks (card, last_date, updated_at) VALUES (?, ?, ?)
+ON CONFLICT(card) DO UPDATE SET
+    last_date = MAX(last_date, excluded.last_date),
+    updated_at = excluded.updated_at
+"""
+
+# Grouping keys accepted by `query --by`
+GROUP_BY_EXPRESSIONS = {
+    'month': "substr(date, 1, 7)",
+    'year': "substr(date, 1, 4)",
+    'card': "card",
+    'merchant': "merchant",
+    'category': "main_category",
+    'subcategory': "main_category || ' / ' || sub_category",
+    'country': "country",
+}
+
+
+def connect(db_path=DEFAULT_DB_PATH):
+    """Open (and if needed create) the transaction store."""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    conn.executescript(ROLLUP_TRIGGERS)
+
+    # Stores created before the rollup existed get it backfilled once
+    has_rollup = conn.execute("SELECT 1 FROM spend_rollup LIMIT 1").fetchone()
+    has_transactions = conn.execute("SELECT 1 FROM transactions LIMIT 1").fetchone()
+    if has_transactions and not has_rollup:
+        rebuild_rollup(conn)
+    # ... and their high-water marks
+    has_marks = conn.execute("SELECT 1 FROM high_water_marks LIMIT 1").fetchone()
+    if has_transactions and not has_marks:
+        with conn:
+            conn.execute(
+                "INSERT INTO high_water_marks (card, last_date, updated_at) "
+                "SELECT card, MAX(date), ? FROM transactions GROUP BY card",
+                (datetime.now().isoformat(timespec='seconds'),),
+            )
+    return conn
+
+
+def rebuild_rollup(conn):
+    """Recompute spend_rollup from scratch (normally maintained by triggers)."""
+    with conn:
+        conn.executescript(REBUILD_ROLLUP_SQL)
+
+
+def high_water_mark(conn, card=None, directory=None):
+    """
+    Latest stored transaction date of a card, as an ISO date string.
+
+    Args:
+        conn (sqlite3.Connection): Open store
+        card (str): Card name as stored
+        directory (str): The card's own download folder; the card of the
+                         files ingested from it is used when `card` has no
+                         mark (the stored name comes from the statement
+                         banner and may differ from the downloader's name)
+
+    Returns:
+        str or None: None when nothing is stored for the card yet, or when
+                     the folder holds files of more than one card
+    """
+    if card:
+        row = conn.execute("SELECT last_date FROM high_water_marks WHERE card = ?", (card,)).fetchone()
+        if row:
+            return row[0]
+    # Only a per-card folder identifies a card; the base folder holds them all
+    if directory and os.path.abspath(directory) != os.path.abspath(DEFAULT_DOWNLOAD_DIR):
+        prefix = os.path.join(os.path.abspath(directory), '')
+        rows = conn.execute(
+            "SELECT card, last_date FROM high_water_marks WHERE card IN "
+            "(SELECT card FROM ingested_files WHERE substr(path, 1, ?) = ?)",
+            (len(prefix), prefix),
+        ).fetchall()
+        # Files of several cards in one folder: any single mark could skip another card's rows
+        if len(rows) == 1:
+            return rows[0][1]
+    return None
+
+
+def card_from_path(filepath):
+    """Guess the card name from the per-card download folder (e.g. Platinum_Card)."""
+    directory = os.path.dirname(os.path.abspath(filepath))
+    if directory == os.path.abspath(DEFAULT_DOWNLOAD_DIR):
+        return 'Unknown Card'
+    return os.path.basename(directory).replace('_', ' ')
+
+
+def find_statement_files(paths):
+    """Expand files and directories into a sorted list of statement exports."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                # Skip our own analysis output folders
+                dirs[:] = [d for d in dirs if d != 'analysis']
+                for name in names:
+                    if name.lower().endswith(STATEMENT_EXTENSIONS) and not name.startswith('~$'):
+                        files.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"Skipping missing path: {path}")
+    return sorted(files)
+
+
+def _fallback_reference(card, date, cents, description, occurrence=0):
+    """Stable key for rows exported without a Reference."""
+    key = f"{card}|{date}|{cents}|{description}"
+    # Later identical charges in one file are numbered; the first keeps its original key
+    if occurrence:
+        key += f"#{occurrence}"
+    return 'sha1:' + hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _fallback_references(transactions, card, occurrences):
+    """
+    Fallback keys of a batch's rows without a Reference, by id() of the record.
+
+    Rows are numbered per file before duplicates are dropped, like the dedup
+    index does, so two identical charges on one day stay two rows.
+
+    Args:
+        occurrences (dict): Per-file counter shared by all batches of the file
+    """
+    keys = {}
+    for t in transactions:
+        if not t.reference:
+            date = t.date.isoformat()
+            composite = (date, t.amount_cents, t.description)
+            occurrence = occurrences.get(composite, 0)
+            occurrences[composite] = occurrence + 1
+            keys[id(t)] = _fallback_reference(card, date, t.amount_cents, t.description, occurrence)
+    return keys
+
+
+def _transaction_rows(transactions, card, source_file, ingested_at, normalizer, fallback_keys):
+    """Yield upsert parameter tuples for a batch of Transaction records."""
+    for t in transactions:
+        date = t.date.isoformat()
+        reference = t.reference or fallback_keys[id(t)]
+        yield (
+            reference, card, date, t.description, normalizer.normalize(t.description), t.amount_cents,
+            t.country, t.city_state, t.category, t.main_category, t.sub_category,
+            source_file, ingested_at,
+        )
+
+
+def ingest_file(conn, filepath, card=None, force=False, normalizer=None, categorizer=None):
+    """
+    Upsert all transactions from one export into the store.
+
+    The file is stream-parsed into Transaction records batch by batch, so
+    ingesting never loads a whole export (or pandas) into memory. Charges
+    without a Reference already ingested from another (overlapping) export
+    are skipped using the dedup index kept in the store; rows with a known
+    Reference are upserted, so a newer export's corrections win.
+
+    Args:
+        conn (sqlite3.Connection): Open store
+        filepath (str): Path to an AMEX .xlsx or .csv export
+        card (str): Card name; taken from the statement banner or the
+                    download folder when not given
+        force (bool): Re-ingest even if the file is unchanged since last time
+        normalizer (MerchantNormalizer): Maps descriptions to the merchant
+                    column (default: rules from merchant_rules.json)
+        categorizer (Categorizer): Fills in missing categories (default:
+                    category_rules.json plus the learned history)
+
+    Returns:
+        tuple: (rows upserted, duplicates found, duplicates updated in place
+               by Reference, which are among both); (0, 0, 0) when the
+               file was skipped
+    """
+    filepath = os.path.abspath(filepath)
+    stat = os.stat(filepath)
+
+    if not force:
+        seen = conn.execute(
+            "SELECT size, mtime FROM ingested_files WHERE path = ?", (filepath,)
+        ).fetchone()
+        if seen and seen[0] == stat.st_size and seen[1] == stat.st_mtime:
+            return 0, 0, 0
+
+    info = {}
+    ingested_at = datetime.now().isoformat(timespec='seconds')
+    normalizer = normalizer or MerchantNormalizer()
+    categorizer = categorizer or Categorizer()
+    index = DedupIndex(conn)
+    occurrences = {}
+    fallback_occurrences = {}
+    count = duplicates = updated = 0
+    latest = None
+    with conn:
+        for batch in iter_transaction_batches(filepath, info=info):
+            # The banner (if any) has been read by the time the first batch arrives
+            card = card or info['card_name'] or card_from_path(filepath)
+            fallback_keys = _fallback_references(batch, card, fallback_occurrences)
+            # Rows with a known Reference go on to the upsert, which updates them in place
+            size = len(batch)
+            batch, found = index.filter_transactions(batch, filepath, occurrences, update_referenced=True)
+            categorizer.categorize_transactions(batch, normalizer)
+            conn.executemany(UPSERT_SQL, _transaction_rows(batch, card, filepath, ingested_at, normalizer,
+                                                           fallback_keys))
+            count += len(batch)
+            duplicates += found
+            updated += found - (size - len(batch))
+            if batch:
+                latest = max(latest or '', max(t.date for t in batch).isoformat())
+        if latest:
+            conn.execute(HIGH_WATER_MARK_SQL, (card, latest, ingested_at))
+        conn.execute(
+            "INSERT OR REPLACE INTO ingested_files (path, size, mtime, card, row_count, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (filepath, stat.st_size, stat.st_mtime, card or info.get('card_name'), count, ingested_at),
+        )
+    categorizer.save()
+    return count, duplicates, updated
+
+
+def ingest_paths(conn, paths, card=None, force=False):
+    """Ingest every statement export found under `paths`; return total rows upserted."""
+    total = 0
+    normalizer = MerchantNormalizer()
+    categorizer = Categorizer()
+    for filepath in find_statement_files(paths):
+        try:
+            count, duplicates, updated = ingest_file(conn, filepath, card=card, force=force,
+                                                     normalizer=normalizer, categorizer=categorizer)
+        except ValueError as e:
+            print(f"Skipping {filepath}: {e}")
+            continue
+        if count or duplicates:
+            print(f"Ingested {count - updated} new transactions from {filepath} "
+                  f"({duplicates - updated} duplicates skipped, {updated} updated by Reference)")
+        total += count
+    return total
+
+
+def normalize_merchants(conn, normalizer=None):
+    """Re-apply the merchant rules to every stored row; return rows changed."""
+    normalizer = normalizer or MerchantNormalizer()
+    descriptions = [row[0] for row in conn.execute("SELECT DISTINCT description FROM transactions")]
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            "UPDATE transactions SET merchant = ? WHERE description IS ? AND merchant IS NOT ?",
+            ((normalizer.normalize(d), d, normalizer.normalize(d)) for d in descriptions),
+        )
+        return conn.total_changes - before
+
+
+def build_query(card=None, since=None, until=None, merchant=None, category=None, by=None, limit=None):
+    """Build the SQL and parameters for the `query` command."""
+    where = []
+    params = []
+    if card:
+        where.append("card = ?")
+        params.append(card)
+    if since:
+        where.append("date >= ?")
+        params.append(since)
+    if until:
+        where.append("date <= ?")
+        params.append(until)
+    if merchant:
+        where.append("merchant LIKE ?")
+        params.append(f"%{merchant}%")
+    if category:
+        where.append("(main_category = ? OR sub_category = ?)")
+        params.extend([category, category])
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    if by:
+        key = GROUP_BY_EXPRESSIONS[by]
+        sql = (f"SELECT {key} AS {by}, COUNT(*) AS transactions, "
+               f"SUM(amount_cents) / 100.0 AS total "
+               f"FROM transactions {where_sql} GROUP BY 1 ORDER BY total DESC")
+    else:
+        sql = (f"SELECT date, card, merchant, main_category, amount_cents / 100.0 AS amount "
+               f"FROM transactions {where_sql} ORDER BY date DESC")
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
+
+
+def _rollup_where(card=None, since=None, until=None):
+    where = []
+    params = []
+    if card:
+        where.append("card = ?")
+        params.append(card)
+    if since:
+        where.append("month >= ?")
+        params.append(since[:7])
+    if until:
+        where.append("month <= ?")
+        params.append(until[:7])
+    return (f"WHERE {' AND '.join(where)}" if where else ""), params
+
+
+def rollup_frames(conn, card=None, since=None, until=None):
+    """
+    Spending breakdowns read from the materialized rollup.
+
+    The cost depends on the number of card/month/category/country keys,
+    not on how many transactions have been ingested.
+
+    Args:
+        conn (sqlite3.Connection): Open store
+        card (str): Only this card
+        since (str): First month to include (YYYY-MM or YYYY-MM-DD)
+        until (str): Last month to include (YYYY-MM or YYYY-MM-DD)
+
+    Returns:
+        dict: 'country', 'category' and 'country_category' DataFrames with
+              Total_Amount and Transaction_Count columns (same shape as the
+              analyze_statement breakdowns), plus 'totals' with
+              total_spent, total_credits, net_balance, transactions,
+              first_month and last_month
+    """
+    import pandas as pd
+
+    where_sql, params = _rollup_where(card, since, until)
+
+    def breakdown(keys, names):
+        frame = pd.read_sql_query(
+            f"SELECT {', '.join(keys)}, SUM(spend_cents) AS cents, SUM(spend_count) AS n "
+            f"FROM spend_rollup {where_sql} GROUP BY {', '.join(keys)} HAVING SUM(spend_count) > 0",
+            conn, params=params,
+        )
+        frame['cents'] = frame['cents'] / 100
+        frame.columns = names + ['Total_Amount', 'Transaction_Count']
+        return frame
+
+    spent, credits, count, first_month, last_month = conn.execute(
+        f"SELECT COALESCE(SUM(spend_cents), 0), COALESCE(SUM(credit_cents), 0), "
+        f"COALESCE(SUM(txn_count), 0), MIN(month), MAX(month) FROM spend_rollup {where_sql}",
+        params,
+    ).fetchone()
+
+    return {
+        'country': breakdown(['country'], ['Country']),
+        'category': breakdown(['main_category'], ['Category']),
+        'country_category': breakdown(['country', 'main_category'], ['Country', 'Category']),
+        'totals': {
+            'total_spent': spent / 100,
+            'total_credits': credits / 100,
+            'net_balance': (spent - credits) / 100,
+            'transactions': count,
+            'first_month': first_month,
+            'last_month': last_month,
+        },
+    }
+
+
+def print_report(frames, card=None, charts_dir=None):
+    """Print a rollup-backed spending summary, optionally saving its charts."""
+    from report_engine import build_report, render_text
+
+    totals = frames['totals']
+    report = build_report(frames, card or 'All Cards', totals['first_month'], totals['last_month'])
+    print(render_text(report))
+
+    if charts_dir:
+        from charts import breakdown_chart_specs, render_charts
+
+        rendered, skipped = render_charts(breakdown_chart_specs(report), charts_dir)
+        print(f"Charts in {charts_dir}: {len(rendered)} rendered, {len(skipped)} unchanged")
+
+
+def print_rows(cursor):
+    """Print query results as an aligned text table."""
+    headers = [d[0] for d in cursor.description]
+    rows = [['' if v is None else (f"{v:.2f}" if isinstance(v, float) else str(v)) for v in row]
+            for row in cursor.fetchall()]
+    widths = [max([len(h)] + [len(r[i]) for r in rows]) for i, h in enumerate(headers)]
+    print('  '.join(h.ljust(w) for h, w in zip(headers, widths)))
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(v.ljust(w) for v, w in zip(row, widths)))
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local warehouse of AMEX transactions')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Path to the SQLite store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='Ingest downloaded statement files')
+    ingest_parser.add_argument('paths', nargs='*', default=[DEFAULT_DOWNLOAD_DIR],
+                               help='Files or folders to ingest (default: ~/Downloads/AmexStatements)')
+    ingest_parser.add_argument('--card', help='Card name to record for these files')
+    ingest_parser.add_argument('--force', action='store_true', help='Re-ingest files even if unchanged')
+
+    query_parser = subparsers.add_parser('query', help='Answer ad-hoc spend questions')
+    query_parser.add_argument('--card', help='Only this card')
+    query_parser.add_argument('--since', help='Start date (YYYY-MM-DD)')
+    query_parser.add_argument('--until', help='End date (YYYY-MM-DD)')
+    query_parser.add_argument('--merchant', help='Merchant name contains this text')
+    query_parser.add_argument('--category', help='Main or sub category')
+    query_parser.add_argument('--by', choices=sorted(GROUP_BY_EXPRESSIONS), help='Group totals by this key')
+    query_parser.add_argument('--limit', type=int, help='Maximum rows to print')
+    query_parser.add_argument('--sql', help='Run a raw SQL statement instead')
+
+    report_parser = subparsers.add_parser('report', help='Spending summary from the rollup tables')
+    report_parser.add_argument('--card', help='Only this card')
+    report_parser.add_argument('--since', help='First month (YYYY-MM)')
+    report_parser.add_argument('--until', help='Last month (YYYY-MM)')
+    report_parser.add_argument('--charts', metavar='DIR', help='Also write spending charts to this folder')
+
+    subparsers.add_parser('rebuild-rollup', help='Recompute the rollup tables from scratch')
+
+    subparsers.add_parser('marks', help='Latest stored transaction date per card')
+
+    recurring_parser = subparsers.add_parser('recurring', help='List subscriptions and other recurring charges')
+    recurring_parser.add_argument('--card', help='Only this card')
+    recurring_parser.add_argument('--csv', metavar='PATH', help='Also save the list as CSV')
+
+    anomalies_parser = subparsers.add_parser('anomalies', help='Unusual charges and category spikes')
+    anomalies_parser.add_argument('--card', help='Only this card')
+    anomalies_parser.add_argument('--csv', metavar='PATH', help='Also save the list as CSV')
+
+    rewards_parser = subparsers.add_parser('rewards', help='Rewards points per month and category')
+    rewards_parser.add_argument('--card', help='Only this card')
+    rewards_parser.add_argument('--since', help='Start date (YYYY-MM-DD)')
+    rewards_parser.add_argument('--until', help='End date (YYYY-MM-DD)')
+    rewards_parser.add_argument('--csv', metavar='PATH', help='Also save the monthly rollup as CSV')
+    rewards_parser.add_argument('--chart', metavar='DIR', help='Also write rewards_summary.png to this folder')
+
+    merchants_parser = subparsers.add_parser('normalize-merchants',
+                                             help='Re-apply merchant rules to stored transactions')
+    merchants_parser.add_argument('--rules', help='Merchant rules JSON file (default: merchant_rules.json)')
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+
+    if args.command == 'ingest':
+        start = time.perf_counter()
+        total = ingest_paths(conn, args.paths, card=args.card, force=args.force)
+        print(f"Upserted {total} transactions in {time.perf_counter() - start:.2f}s")
+        return
+
+    if args.command == 'rebuild-rollup':
+        rebuild_rollup(conn)
+        print("Rollup tables rebuilt")
+        return
+
+    if args.command == 'marks':
+        print_rows(conn.execute("SELECT card, last_date, updated_at FROM high_water_marks ORDER BY card"))
+        return
+
+    if args.command == 'recurring':
+        from recurring_charges import compare_runs, detect_recurring, load_charges, print_recurring
+
+        result = compare_runs(conn, detect_recurring(load_charges(conn, args.card)), args.card)
+        print_recurring(result)
+        if args.csv:
+            result.to_csv(args.csv, index=False)
+        return
+
+    if args.command == 'anomalies':
+        from anomalies import detect_anomalies, load_charges
+
+        result = detect_anomalies(load_charges(conn, args.card))
+        print(result.to_string(index=False) if not result.empty else "No anomalies found")
+        if args.csv:
+            result.to_csv(args.csv, index=False)
+        return
+
+    if args.command == 'rewards':
+        import rewards
+        from charts import render_charts
+
+        scored = rewards.compute_points(rewards.load_charges(conn, args.card, args.since, args.until))
+        rollup = rewards.rollup_points(scored)
+        rewards.print_rewards(rollup)
+        if args.csv:
+            rollup.to_csv(args.csv, index=False)
+        if args.chart:
+            render_charts([rewards.rewards_chart_spec(scored, args.card or 'All Cards')], args.chart)
+            print(f"\nChart saved to {os.path.join(args.chart, 'rewards_summary.png')}")
+        return
+
+    if args.command == 'normalize-merchants':
+        changed = normalize_merchants(conn, MerchantNormalizer(args.rules))
+        print(f"Updated the merchant of {changed} transactions")
+        return
+
+    if args.command == 'report':
+        start = time.perf_counter()
+        print_report(rollup_frames(conn, args.card, args.since, args.until), args.card, args.charts)
+        print(f"\nReport built in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return
+
+    if args.sql:
+        sql, params = args.sql, []
+    else:
+        sql, params = build_query(args.card, args.since, args.until, args.merchant,
+                                  args.category, args.by, args.limit)
+
+    start = time.perf_counter()
+    try:
+        cursor = conn.execute(sql, params)
+    except sqlite3.Error as e:
+        print(f"Query failed: {e}")
+        sys.exit(1)
+    count = print_rows(cursor)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"\n{count} rows in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()